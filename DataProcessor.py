@@ -1,13 +1,24 @@
 import pandas as pd
+import numpy as np
 import os
 import json
 from collections import defaultdict
+from Util.atomic_io import write_json_atomic
+from Util.excel_export import persist_excel
+from Util.name_reconciliation import PlayerNameIndex
+
+# 清洗后数据写出的原始列（解析产生的辅助列只在内存中使用）
+EVENT_COLUMNS = ["start", "end", "code", "text"]
 
 
 def load_and_filter_data(filename, sheet_idx, useful_test):
     """加载Excel文件并筛选有效数据"""
     df = pd.read_excel(filename, sheet_name=sheet_idx)
+    return filter_sheet_data(df, useful_test)
+
 
+def filter_sheet_data(df, useful_test):
+    """筛选单个sheet的原始数据（已读入内存，便于一次读取整个工作簿后逐sheet处理）"""
     # 筛选text列包含目标值的行
     col5 = df.iloc[:, 4].astype(str)
     filtered_df = df.loc[col5.isin(useful_test)].copy()
@@ -34,56 +45,158 @@ def load_and_filter_data(filename, sheet_idx, useful_test):
         new_row = pd.DataFrame([{"start": None, "end": None, "code": target_3, "text": target_4}])
         output_df = pd.concat([new_row, output_df], ignore_index=True)
 
-    return output_df
+    return parse_event_codes(output_df)
+
+
+def classify_codes(categories):
+    """
+    code取值 → 行类型标记（每个取值只解析一次）：stripped / is_possession / possession_team / is_player / is_merge_player
+    批处理在去重后的类别上调用（parse_event_codes），实时事件逐个code调用，两者判定规则一致
+    """
+    cats = pd.Series(categories, dtype=object).astype(str)
+    prefix = cats.str.split("-", n=1).str[0].str.strip()
+    return pd.DataFrame({
+        "stripped": cats.str.strip(),
+        # 控球标识行：「球队 - Possessions」
+        "is_possession": cats.str.contains("- Possessions", regex=False),
+        "possession_team": cats.str.split(" - ", n=1).str[0].str.strip(),
+        # 球员code：「号码 - 姓名」，号码部分含数字
+        "is_player": cats.str.contains("-", regex=False) & prefix.str.contains(r"\d")
+                     & ~cats.str.contains("Possessions", regex=False),
+        # 合并连续球员时的判定（仅要求含'-'且非控球行）
+        "is_merge_player": cats.str.contains("-", regex=False) & ~cats.str.contains("Possessions", regex=False)
+    })
+
+
+def parse_event_codes(output_df):
+    """
+    一次性解析code列，后续各步骤只做整数/类别比较：
+    - code/text 转为pandas类别列
+    - player：球员code（去空格）的类别列，非球员行为NaN；player_id为其整数编号（非球员为-1）
+    - possession_team：控球标识行的球队类别列
+    - is_possession / is_player / is_merge_player：行类型标记
+    """
+    df = output_df.copy()
+    df["code"] = df["code"].astype("category")
+    df["text"] = df["text"].astype("category")
+    cat_codes = df["code"].cat.codes.to_numpy()
+    flags = classify_codes(df["code"].cat.categories)
+    valid = cat_codes >= 0
+
+    def take(column, fill):
+        values = flags[column].to_numpy()
+        result = np.full(len(df), fill, dtype=values.dtype)
+        result[valid] = values[cat_codes[valid]]
+        return result
+
+    df["is_possession"] = take("is_possession", False)
+    df["is_player"] = take("is_player", False)
+    df["is_merge_player"] = take("is_merge_player", False)
+
+    # 球员类别：同一球员（去空格后相同）共享一个整数编号
+    player_names = flags["stripped"].where(flags["is_player"])
+    player_categories = pd.Index(player_names.dropna().unique())
+    cat_to_player = player_categories.get_indexer(player_names.fillna("").to_numpy())
+    cat_to_player[~flags["is_player"].to_numpy()] = -1
+    player_id = np.full(len(df), -1, dtype=np.int32)
+    player_id[valid] = cat_to_player[cat_codes[valid]]
+    df["player_id"] = player_id
+    df["player"] = pd.Categorical.from_codes(player_id, categories=player_categories)
+
+    team_names = flags["possession_team"].where(flags["is_possession"])
+    team_categories = pd.Index(team_names.dropna().unique())
+    cat_to_team = team_categories.get_indexer(team_names.fillna("").to_numpy())
+    cat_to_team[~flags["is_possession"].to_numpy()] = -1
+    team_id = np.full(len(df), -1, dtype=np.int32)
+    team_id[valid] = cat_to_team[cat_codes[valid]]
+    df["possession_team"] = pd.Categorical.from_codes(team_id, categories=team_categories)
+    return df
+
+
+def assign_possession_ids(cleaned_df):
+    """
+    为清洗后数据（含控球标识行）的球员行标注控球段：
+    返回 start/end/接球球员/所属队伍/控球编号 （控球编号在该数据内从0递增）
+    """
+    if "is_possession" not in cleaned_df.columns:
+        cleaned_df = parse_event_codes(cleaned_df)
+    is_possession = cleaned_df["is_possession"].to_numpy()
+    possession_id = np.cumsum(is_possession) - 1
+    team = cleaned_df["possession_team"].astype(object).where(is_possession).ffill()
+    is_player_row = (cleaned_df["is_merge_player"].to_numpy() & cleaned_df["text"].isna().to_numpy()
+                     & (possession_id >= 0))
+    return pd.DataFrame({
+        "start": cleaned_df["start"].to_numpy()[is_player_row],
+        "end": cleaned_df["end"].to_numpy()[is_player_row],
+        "接球球员": cleaned_df["code"].astype(str).str.strip().to_numpy()[is_player_row],
+        "所属队伍": team.to_numpy()[is_player_row],
+        "控球编号": possession_id[is_player_row]
+    })
+
+
+def possession_spans(cleaned_df):
+    """
+    清洗后数据（含控球标识行）各控球段的起止时间，取控球标识行自身的start/end
+    （接球行的end是接球时刻加固定时长，用接球行推算会把控球段拉长）
+    返回 控球编号/所属队伍/start/end，控球编号与assign_possession_ids一致；标识行缺少时间时为NaN
+    """
+    if "is_possession" not in cleaned_df.columns:
+        cleaned_df = parse_event_codes(cleaned_df)
+    is_possession = cleaned_df["is_possession"].to_numpy()
+    return pd.DataFrame({
+        "控球编号": np.arange(is_possession.sum()),
+        "所属队伍": cleaned_df["possession_team"].astype(object).to_numpy()[is_possession],
+        "start": pd.to_numeric(cleaned_df["start"], errors="coerce").to_numpy()[is_possession],
+        "end": pd.to_numeric(cleaned_df["end"], errors="coerce").to_numpy()[is_possession]
+    })
 
 
 def extract_possession_phases(output_df):
     """从筛选后的数据中识别控球阶段"""
-    possession_phases = []
-    current_team = None
-    current_players = []
-    current_start_idx = None
-
-    for idx, row in output_df.iterrows():
-        col3_val = str(row.iloc[2]) if len(row) > 2 else ""
-        # 识别球队
-        if "- Possessions" in col3_val:
-            if current_team:
-                # 保存上一支球队的控球阶段
-                possession_phases.append({
-                    "team": current_team,
-                    "players": current_players.copy(),
-                    "start_idx": current_start_idx,
-                    "end_idx": idx - 1
-                })
-            # 更新当前球队信息
-            current_team = col3_val.split(" - ")[0].strip()
-            current_players = []
-            current_start_idx = idx
-        else:
-            # 提取该控球阶段的球员
-            if current_team and "-" in col3_val and any(c.isdigit() for c in col3_val.split("-")[0].strip()):
-                current_players.append(col3_val.strip())
-
-    # 保存最后一支球队的控球阶段
-    if current_team:
-        possession_phases.append({
-            "team": current_team,
-            "players": current_players.copy(),
-            "start_idx": current_start_idx,
-            "end_idx": len(output_df) - 1
-        })
-
-    return possession_phases
-
-
-def generate_auto_mapping(possession_phases):
-    """根据控球阶段生成球队-球员映射（按球员出现次数匹配球队）"""
-    player_team_counts = defaultdict(lambda: defaultdict(int))
-    # 统计每个球员在各球队的出现次数
+    if "is_possession" not in output_df.columns:
+        output_df = parse_event_codes(output_df)
+
+    possession_rows = np.flatnonzero(output_df["is_possession"].to_numpy())
+    if len(possession_rows) == 0:
+        return []
+
+    # 每行所属的控球阶段序号（第一个控球标识行之前为-1）
+    phase_no = np.cumsum(output_df["is_possession"].to_numpy()) - 1
+    player_mask = output_df["is_player"].to_numpy() & (phase_no >= 0) & ~output_df["is_possession"].to_numpy()
+    players = output_df["player"].astype(object).to_numpy()
+    phase_players = pd.Series(players[player_mask]).groupby(phase_no[player_mask]).agg(list)
+
+    teams = output_df["possession_team"].astype(object).to_numpy()[possession_rows]
+    end_rows = np.append(possession_rows[1:] - 1, len(output_df) - 1)
+    return [
+        {
+            "team": team,
+            "players": phase_players.get(i, []),
+            "start_idx": int(start),
+            "end_idx": int(end)
+        }
+        for i, (team, start, end) in enumerate(zip(teams, possession_rows, end_rows))
+    ]
+
+
+def count_player_teams(possession_phases, player_team_counts=None):
+    """统计每个球员在各球队控球阶段中的出现次数（可在已有计数上累加）"""
+    if player_team_counts is None:
+        player_team_counts = defaultdict(lambda: defaultdict(int))
     for phase in possession_phases:
         for player in phase["players"]:
             player_team_counts[player][phase["team"]] += 1
+    return player_team_counts
+
+
+def generate_auto_mapping(possession_phases, player_team_counts=None):
+    """
+    根据控球阶段生成球队-球员映射（按球员出现次数匹配球队）
+    player_team_counts：已统计好的 球员 → {球队: 次数}（如整个赛季的计数），传入时忽略possession_phases
+    """
+    # 统计每个球员在各球队的出现次数
+    if player_team_counts is None:
+        player_team_counts = count_player_teams(possession_phases)
 
     # 球员→球队映射（按出现次数最多的球队匹配）
     player_team = {p: max(ts.items(), key=lambda x: x[1])[0] for p, ts in player_team_counts.items()}
@@ -97,8 +210,7 @@ def generate_auto_mapping(possession_phases):
 
 def save_team_players_mapping(team_players, save_path):
     """将自动生成的球队-球员映射保存为JSON文件"""
-    with open(save_path, "w", encoding="utf-8") as f:
-        json.dump(team_players, f, ensure_ascii=False, indent=2)
+    write_json_atomic(save_path, team_players)
 
 
 def load_team_players_mapping(load_path):
@@ -109,6 +221,20 @@ def load_team_players_mapping(load_path):
         return json.load(f)
 
 
+def sheet_team_mapping(possession_phases, mapping_config):
+    """
+    逐sheet处理（监听模式/整季批处理）时的球队-球员映射：
+    AUTO_GENERATE时由本sheet自动生成，否则读取MANUAL_PATH手动映射（文件存在时），最后用CUSTOM_PLAYERS补充
+    """
+    team_players = {}
+    if mapping_config["AUTO_GENERATE"]:
+        team_players, _ = generate_auto_mapping(possession_phases)
+    elif os.path.exists(mapping_config["MANUAL_PATH"]):
+        team_players = load_team_players_mapping(mapping_config["MANUAL_PATH"])
+    team_players.update(mapping_config["CUSTOM_PLAYERS"])
+    return team_players
+
+
 def get_sheet_player_info(filename, sheet_idx, useful_test):
     """获取指定sheet的球员集合和球员→球队映射"""
     output_df = load_and_filter_data(filename, sheet_idx, useful_test)
@@ -126,66 +252,104 @@ def merge_consecutive_players(cleaned_df):
     merged_df = cleaned_df.copy().reset_index(drop=True)
     if len(merged_df) < 2:
         return merged_df
-
-    # 标记需要保留的行索引
-    keep_indices = [True] * len(merged_df)
-    # 遍历数据，从后往前检查连续重复
-    for i in range(len(merged_df) - 1, 0, -1):
-        current_row = merged_df.iloc[i]
-        prev_row = merged_df.iloc[i - 1]
-
-        # 仅处理球员行
-        is_current_player = pd.isna(current_row["text"]) and "-" in str(
-            current_row["code"]) and "Possessions" not in str(current_row["code"])
-        is_prev_player = pd.isna(prev_row["text"]) and "-" in str(prev_row["code"]) and "Possessions" not in str(
-            prev_row["code"])
-
-        if is_current_player and is_prev_player and current_row["code"].strip() == prev_row["code"].strip():
-            merged_df.loc[i - 1, "end"] = current_row["end"]
-            keep_indices[i] = False
-
-    merged_df = merged_df[keep_indices].reset_index(drop=True)
+    if "is_merge_player" not in merged_df.columns:
+        merged_df = parse_event_codes(merged_df)
+
+    # 仅处理球员行：与上一行均为球员行且code（去空格）相同 → 属于同一连续段
+    is_player = merged_df["is_merge_player"].to_numpy() & merged_df["text"].isna().to_numpy()
+    code_ids = pd.factorize(merged_df["code"].astype(str).str.strip())[0]
+    same_as_prev = np.zeros(len(merged_df), dtype=bool)
+    same_as_prev[1:] = is_player[1:] & is_player[:-1] & (code_ids[1:] == code_ids[:-1])
+
+    # 每段保留首行，end取段内最后一行
+    run_starts = np.flatnonzero(~same_as_prev)
+    run_ends = np.append(run_starts[1:] - 1, len(merged_df) - 1)
+    ends = merged_df["end"].to_numpy()[run_ends]
+    merged_df = merged_df.iloc[run_starts].reset_index(drop=True)
+    merged_df["end"] = ends
     return merged_df
 
 
-def clean_data(output_df, possession_phases, custom_team_players, filename, sheet_idx, output_dir):
-    """根据「自动生成+手动调整」的映射清理数据 + 新增连续重复球员合并"""
+def reconcile_player_codes(output_df, custom_team_players, min_confidence=0.75, min_margin=0.05):
+    """
+    映射中找不到的球员code（拼写/变音符号不同，如「8 - Đ. Denić」与「8 - D. Denic」）→
+    在映射球员的三元组索引中查找候选，置信度达标的改写为映射中的写法
+    返回 (改写后重新解析的数据, 匹配报告DataFrame)
+    """
+    if "player" not in output_df.columns:
+        output_df = parse_event_codes(output_df)
+    known = {p.strip() for players in custom_team_players.values() for p in players}
+    unmatched = [code for code in output_df["player"].cat.categories if code not in known]
+    index = PlayerNameIndex(custom_team_players)
+    report = index.resolve(unmatched, min_confidence, min_margin)
+    for row in report.itertuples(index=False):
+        status = "√ 改写为" if row.matched else "× 未采用"
+        print(f"   - {row.code} {status} {row.candidate}（{row.team}，置信度{row.confidence:.2f}，"
+              f"领先第二候选{row.margin:.2f}）")
+
+    accepted = report[report["matched"]]
+    if accepted.empty:
+        return output_df, report
+    # 在code类别上改写（每个取值只处理一次），再重新解析
+    rename = dict(zip(accepted["code"], accepted["candidate"]))
+    categories = output_df["code"].cat.categories
+    new_values = np.array([rename.get(str(c).strip(), c) for c in categories], dtype=object)
+    cat_codes = output_df["code"].cat.codes.to_numpy()
+    codes = np.where(cat_codes >= 0, new_values[np.maximum(cat_codes, 0)], None)
+    reconciled = output_df[EVENT_COLUMNS].copy()
+    reconciled["code"] = codes
+    return parse_event_codes(reconciled), report
+
+
+def clean_data(output_df, possession_phases, custom_team_players, filename, sheet_idx, output_dir,
+               writer=None, persist=True, return_df=False, reconcile_config=None):
+    """
+    根据「自动生成+手动调整」的映射清理数据 + 新增连续重复球员合并
+    writer：BackgroundWriter，传入时在后台线程写出文件；persist=False时不写文件
+    return_df=True时返回 (文件路径, 清洗后数据)，供下一阶段直接使用
+    reconcile_config：{"MIN_CONFIDENCE", "MIN_MARGIN"}，传入时先把映射中找不到的球员code模糊匹配到映射球员
+    """
     # 验证映射格式
     if not isinstance(custom_team_players, dict) or len(custom_team_players) == 0:
         raise ValueError("球队-球员映射必须是有效的字典（格式：{球队名: [球员1, 球员2,...]}）")
 
+    if "player" not in output_df.columns:
+        output_df = parse_event_codes(output_df)
+    if reconcile_config:
+        print("球员姓名模糊匹配（映射中找不到的球员code）：")
+        output_df, _ = reconcile_player_codes(output_df, custom_team_players,
+                                              reconcile_config.get("MIN_CONFIDENCE", 0.75),
+                                              reconcile_config.get("MIN_MARGIN", 0.05))
+
     # 转换映射为：球员→球队
     player_correct_team = {}
     for team, players in custom_team_players.items():
         for player in players:
             player_correct_team[player.strip()] = team
 
-    # 标记有效行
-    rows_to_keep = [False] * len(output_df)
-    for phase in possession_phases:
-        valid_players_count = 0
-        valid_player_rows = []
-        # 遍历该控球阶段的所有行
-        for idx in range(phase["start_idx"], phase["end_idx"] + 1):
-            if idx >= len(output_df):
-                continue
-            row = output_df.iloc[idx]
-            col3_val = str(row.iloc[2]) if len(row) > 2 else ""
-            # 筛选有效球员记录
-            if "-" in col3_val and any(
-                    c.isdigit() for c in col3_val.split("-")[0].strip()) and "Possessions" not in col3_val:
-                player_original = col3_val.strip()
-                # 只有球员属于当前控球球队，才保留
-                if player_correct_team.get(player_original) == phase["team"]:
-                    rows_to_keep[idx] = True
-                    valid_players_count += 1
-                    valid_player_rows.append(idx)
-        # 控球阶段至少2名有效球员才保留该阶段标记行
-        if valid_players_count >= 2:
+    # 球员所属球队：每个球员类别只查一次映射，逐行只取整数编号
+    team_index = pd.Index(list(custom_team_players.keys()))
+    player_team_id = team_index.get_indexer(
+        [player_correct_team.get(p) for p in output_df["player"].cat.categories]).astype(np.int32)
+    player_ids = output_df["player_id"].to_numpy()
+    row_team_id = np.where(player_ids >= 0, player_team_id[np.maximum(player_ids, 0)], -1)
+
+    # 每行所属控球阶段及该阶段球队
+    row_phase = np.full(len(output_df), -1, dtype=np.int64)
+    phase_team_id = team_index.get_indexer([phase["team"] for phase in possession_phases])
+    for i, phase in enumerate(possession_phases):
+        row_phase[phase["start_idx"]:phase["end_idx"] + 1] = i
+    row_phase_team = np.where(row_phase >= 0, phase_team_id[np.maximum(row_phase, 0)], -2)
+
+    # 有效球员行：属于当前控球球队（未在映射中的球员/球队不会匹配）
+    valid_player = (player_ids >= 0) & (row_team_id >= 0) & (row_team_id == row_phase_team)
+    phase_counts = np.bincount(row_phase[valid_player], minlength=len(possession_phases))
+
+    # 控球阶段至少2名有效球员才保留该阶段的球员行和标记行
+    rows_to_keep = valid_player & (phase_counts[np.maximum(row_phase, 0)] >= 2)
+    for i, phase in enumerate(possession_phases):
+        if phase_counts[i] >= 2 and phase["start_idx"] < len(output_df):
             rows_to_keep[phase["start_idx"]] = True
-        else:
-            for idx in valid_player_rows:
-                rows_to_keep[idx] = False
 
     # 应用筛选条件
     cleaned_df = output_df[rows_to_keep].copy().reset_index(drop=True)
@@ -201,9 +365,12 @@ def clean_data(output_df, possession_phases, custom_team_players, filename, shee
     output_filename = f"{file_name_without_ext}_sheet{sheet_idx}.xlsx"
     output_path = os.path.join(output_dir, output_filename)
 
-    cleaned_df.to_excel(output_path, index=False)
+    if persist:
+        persist_excel(cleaned_df[EVENT_COLUMNS], output_path, writer)
 
     print(f"最终文件路径：{output_path}")
     print(f"最终数据统计：筛选后{len(output_df[rows_to_keep])}行 → 合并后{len(cleaned_df)}行")
 
+    if return_df:
+        return output_path, cleaned_df
     return output_path
\ No newline at end of file
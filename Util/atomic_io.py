@@ -0,0 +1,36 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_output(output_path: str):
+    """
+    原子写出：with块内写入同目录的临时文件，正常结束后用os.replace替换目标文件
+    写出过程中出错或进程被中断时，目标文件保持原内容（或仍不存在），临时文件被删除
+    临时文件名以.tmp结尾，按扩展名扫描目录（如*.xlsx）时不会被误读
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_text_atomic(output_path: str, content: str) -> str:
+    """原子写出文本文件（UTF-8）"""
+    with atomic_output(output_path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+    return output_path
+
+
+def write_json_atomic(output_path: str, data) -> str:
+    """原子写出JSON（ensure_ascii=False，indent=2，与各分析模块的输出格式一致）"""
+    return write_text_atomic(output_path, json.dumps(data, ensure_ascii=False, indent=2))
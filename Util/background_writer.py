@@ -0,0 +1,55 @@
+import atexit
+import queue
+import threading
+from typing import Callable, List, Tuple
+
+
+class BackgroundWriter:
+    """
+    后台写出线程：各阶段把落盘任务（如写Excel）提交到队列后立即返回，
+    数据通过内存直接交给下一阶段，磁盘I/O不在主流程的关键路径上
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_pending: int = 64):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.errors: List[Tuple[str, str]] = []
+        self.completed = 0
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+        self._closed = False
+        # 主流程提前exit时仍写完已提交的任务
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is self._STOP:
+                    return
+                description, func, args, kwargs = job
+                try:
+                    func(*args, **kwargs)
+                    self.completed += 1
+                except Exception as e:
+                    self.errors.append((description, str(e)))
+                    print(f"   × 后台写出失败：{description} - {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func: Callable, *args, description: str = "", **kwargs) -> None:
+        """提交写出任务（队列满时阻塞，避免积压过多未写出的数据）"""
+        self._queue.put((description or getattr(func, "__name__", "write"), func, args, kwargs))
+
+    def flush(self) -> None:
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+
+    def close(self) -> List[Tuple[str, str]]:
+        """写完剩余任务并结束线程，返回失败任务列表（可重复调用）"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(self._STOP)
+            self._thread.join()
+        return self.errors
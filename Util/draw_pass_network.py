@@ -3,6 +3,9 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import os
 from typing import List
+from Util.atomic_io import atomic_output
+from Util.file_loader import load_excel_files
+from Util.pass_pairs import build_pass_graph, chain_sequences, frame_sequence
 
 
 def draw_single_pass_network(
@@ -13,16 +16,32 @@ def draw_single_pass_network(
         save_dir: str = "./PassingNetwork",
         fig_size: tuple = (12, 10),
         node_size: int = 800,
-        node_color: str = "lightblue"
+        node_color: str = "lightblue",
+        event_store=None,
+        season: str = None,
+        df: pd.DataFrame = None,
+        workbook: str = None
 ) -> None:
-    """绘制单场传球网络"""
+    """
+    绘制单场传球网络（传入event_store时按赛季/场次/球队查询事件库，input_file_path可为None）
+    df：上一阶段在内存中的接球记录，传入时不再读取input_file_path
+    workbook：工作簿名（事件库模式缺省为season），写入标题与图片文件名，不同工作簿的同号场次不会互相覆盖
+    """
     try:
-        df = pd.read_excel(input_file_path)
-        required_col = "接球球员"
-        pass_sequence = df[required_col].dropna().tolist()
+        if event_store is not None:
+            pass_sequence, possession_ids = event_store.pass_sequence(season=season, match=sheet_idx, team=team_name,
+                                                                      with_possessions=True)
+        else:
+            if df is None:
+                df = pd.read_excel(input_file_path)
+            pass_sequence, possession_ids = frame_sequence(df)
 
         subtitle = f"Sheet{sheet_idx}" if sheet_idx is not None else "Single Match"
-        _draw_network_core(pass_sequence, team_name, subtitle, save_img, save_dir, fig_size, node_size, node_color)
+        workbook = workbook or (season if event_store is not None else None)
+        if workbook:
+            subtitle = f"{workbook} {subtitle}"
+        _draw_network_core(pass_sequence, team_name, subtitle, save_img, save_dir, fig_size, node_size, node_color,
+                           possession_ids)
     except Exception as e:
         print(f"绘制{team_name}传球网络失败：{str(e)}")
 
@@ -34,28 +53,37 @@ def draw_combined_pass_network(
         save_dir: str = "./CombinedPassingNetwork",
         fig_size: tuple = (14, 12),
         node_size: int = 1000,
-        node_color: str = "lightcoral"
+        node_color: str = "lightcoral",
+        event_store=None,
+        season: str = None,
+        query_team: str = None,
+        memory_frames: dict = None
 ) -> None:
-    """合并文件夹内所有Excel数据，绘制总传球网络"""
+    """
+    合并文件夹内所有Excel数据，绘制总传球网络（传入event_store时改为查询事件库中query_team的全部场次）
+    memory_frames：本次运行中已在内存的数据 {文件名: DataFrame}，优先于磁盘文件使用
+    """
     try:
         print("   正在读取文件夹内所有传球数据...")
-        combined_pass_sequence = []
-        excel_files = [f for f in os.listdir(data_folder) if f.endswith(".xlsx")]
-
-        for file_idx, file_name in enumerate(excel_files, 1):
-            file_path = os.path.join(data_folder, file_name)
-            try:
-                df = pd.read_excel(file_path)
+        combined_pass_sequence, possession_ids = [], None
+        if event_store is not None:
+            combined_pass_sequence, possession_ids = event_store.pass_sequence(season=season, team=query_team,
+                                                                               with_possessions=True)
+            print(f"   √ 已从事件库查询 {query_team or '全部球队'}（{len(combined_pass_sequence)}条记录）")
+        else:
+            frames, errors = load_excel_files(data_folder, memory_frames=memory_frames)
+            for file_name, message in errors.items():
+                print(f"   × 读取文件{file_name}失败：{message}，已跳过")
+            parts = []
+            for file_idx, (file_name, df) in enumerate(frames.items(), 1):
                 # 检查是否有"接球球员"列
                 if "接球球员" not in df.columns:
                     print(f"   × 跳过无效文件{file_name}：缺少'接球球员'列")
                     continue
-                # 提取非空的接球球员，添加到合并序列
-                file_pass_sequence = df["接球球员"].dropna().tolist()
-                combined_pass_sequence.extend(file_pass_sequence)
-                print(f"   √ 已读取 {file_idx}/{len(excel_files)}：{file_name}（{len(file_pass_sequence)}条记录）")
-            except Exception as e:
-                print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+                # 提取非空的接球球员及其控球段，不同文件的控球段互不相连
+                parts.append(frame_sequence(df))
+                print(f"   √ 已读取 {file_idx}/{len(frames)}：{file_name}（{len(parts[-1][0])}条记录）")
+            combined_pass_sequence, possession_ids = chain_sequences(parts)
 
         # 校验合并后的数据
         if not combined_pass_sequence:
@@ -72,7 +100,8 @@ def draw_combined_pass_network(
             save_dir=save_dir,
             fig_size=fig_size,
             node_size=node_size,
-            node_color=node_color
+            node_color=node_color,
+            possession_ids=possession_ids
         )
 
         print(f"√ {team_name}总传球网络绘制完成！")
@@ -88,20 +117,15 @@ def _draw_network_core(
         save_dir: str,
         fig_size: tuple,
         node_size: int,
-        node_color: str
-) -> None:
-    """核心绘图逻辑（抽取公共部分，避免重复代码）"""
-    # 构建有向加权图
-    G = nx.DiGraph()
-    for i in range(len(pass_sequence) - 1):
-        source = pass_sequence[i].strip()
-        target = pass_sequence[i + 1].strip()
-        if source == target:
-            continue  # 跳过自己传给自己的情况
-        if G.has_edge(source, target):
-            G[source][target]['weight'] += 1
-        else:
-            G.add_edge(source, target, weight=1)
+        node_color: str,
+        possession_ids=None
+) -> str:
+    """
+    核心绘图逻辑（抽取公共部分，避免重复代码），保存图片时返回图片路径
+    possession_ids：与pass_sequence等长的控球段键，只在同一控球段内连边（None时整段序列相邻连边）
+    """
+    # 构建有向加权图（跳过自己传给自己的情况）
+    G = build_pass_graph(pass_sequence, possession_ids)
 
     # 输出统计信息
     print(f"   传球网络统计：球员数{G.number_of_nodes()} | 传球关系数{G.number_of_edges()}")
@@ -135,8 +159,11 @@ def _draw_network_core(
         os.makedirs(save_dir, exist_ok=True)
         save_filename = f"{team_name}_{subtitle.replace(' ', '_')}_PassingNetwork.png"
         save_path = os.path.join(save_dir, save_filename)
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        with atomic_output(save_path) as tmp_path:
+            plt.savefig(tmp_path, format='png', dpi=300, bbox_inches='tight')
         plt.close()
         print(f"   传球网络已保存到：{save_path}")
+        return save_path
     else:
-        plt.show()
\ No newline at end of file
+        plt.show()
+        return None
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+try:
+    import xlsxwriter  # 可选依赖（pip install xlsxwriter）：常量内存模式写出最快，未安装时使用openpyxl只写模式
+except ImportError:
+    xlsxwriter = None
+from openpyxl import Workbook
+from Util.atomic_io import atomic_output
+
+# Excel工作表名限制：最长31字符，不能包含 []:*?/\
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def _sheet_name(name: str, used: set) -> str:
+    """生成合法且不重复的工作表名"""
+    base = _INVALID_SHEET_CHARS.sub("_", str(name))[:31] or "Sheet"
+    candidate, suffix = base, 1
+    while candidate.lower() in used:
+        tail = f"_{suffix}"
+        candidate = base[:31 - len(tail)] + tail
+        suffix += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _column_values(series: pd.Series) -> List:
+    """把一列转换为可直接写入单元格的Python值（缺失值→None，numpy数值→Python数值）"""
+    values = np.array(series.astype(object), dtype=object)
+    mask = series.isna().to_numpy()
+    if mask.any():
+        values[mask] = None
+    return values.tolist()
+
+
+def _iter_rows(df: pd.DataFrame):
+    columns = [_column_values(df[col]) for col in df.columns]
+    return zip(*columns)
+
+
+def resolve_engine(engine: str = None) -> str:
+    """写出引擎：'xlsxwriter' / 'openpyxl'，None时优先使用已安装的xlsxwriter"""
+    engine = engine or ("xlsxwriter" if xlsxwriter is not None else "openpyxl")
+    if engine == "xlsxwriter" and xlsxwriter is None:
+        raise ImportError("未安装xlsxwriter（可选依赖，pip install xlsxwriter），请改用engine='openpyxl'")
+    if engine not in ("xlsxwriter", "openpyxl"):
+        raise ValueError(f"不支持的写出引擎：{engine}")
+    return engine
+
+
+def write_excel_sheets(sheets: Dict[str, pd.DataFrame], output_path: str, engine: str = None) -> str:
+    """
+    以流式（常量内存）方式把多个DataFrame写入同一个工作簿，每个键一个工作表，只写一遍
+    engine：'xlsxwriter' / 'openpyxl'，默认优先使用已安装的xlsxwriter
+    """
+    engine = resolve_engine(engine)
+    used = set()
+
+    # 先写临时文件再替换，中断时不会留下写了一半的工作簿
+    with atomic_output(output_path) as tmp_path:
+        if engine == "xlsxwriter":
+            workbook = xlsxwriter.Workbook(tmp_path, {"constant_memory": True, "nan_inf_to_errors": True})
+            try:
+                for name, df in sheets.items():
+                    worksheet = workbook.add_worksheet(_sheet_name(name, used))
+                    worksheet.write_row(0, 0, [str(c) for c in df.columns])
+                    for row_idx, row in enumerate(_iter_rows(df), 1):
+                        worksheet.write_row(row_idx, 0, row)
+            finally:
+                workbook.close()
+        else:
+            workbook = Workbook(write_only=True)
+            for name, df in sheets.items():
+                worksheet = workbook.create_sheet(_sheet_name(name, used))
+                worksheet.append([str(c) for c in df.columns])
+                for row in _iter_rows(df):
+                    worksheet.append(row)
+            workbook.save(tmp_path)
+    return output_path
+
+
+def write_excel(df: pd.DataFrame, output_path: str, sheet_name: str = "Sheet1", engine: str = None) -> str:
+    """单个DataFrame的流式写出（替代 df.to_excel(path, index=False)）"""
+    return write_excel_sheets({sheet_name: df}, output_path, engine)
+
+
+def persist_excel(df: pd.DataFrame, output_path: str, writer=None) -> str:
+    """落盘一个DataFrame：传入BackgroundWriter时提交到后台线程异步写出，否则同步写出"""
+    if writer is None:
+        return write_excel(df, output_path)
+    writer.submit(write_excel, df, output_path, description=output_path)
+    return output_path
+
+
+def export_match_workbook(team_frames: Dict[str, pd.DataFrame], match_name: str, output_dir: str,
+                          engine: str = None) -> str:
+    """一场比赛所有球队的接球记录写入同一个工作簿（每队一个工作表）"""
+    output_path = os.path.join(output_dir, f"{match_name}.xlsx")
+    write_excel_sheets(team_frames, output_path, engine)
+    print(f"   已导出比赛工作簿：{output_path}（{len(team_frames)}支球队）")
+    return output_path
+
+
+def export_team_workbook(match_frames: Dict[str, pd.DataFrame], team_name: str, output_dir: str,
+                         engine: str = None) -> str:
+    """一支球队所有比赛的接球记录写入同一个工作簿（每场一个工作表）"""
+    output_path = os.path.join(output_dir, f"{team_name}_all_matches.xlsx")
+    write_excel_sheets(match_frames, output_path, engine)
+    print(f"   已导出球队工作簿：{output_path}（{len(match_frames)}场比赛）")
+    return output_path
+
+
+def export_deliverables(input_dir: str, output_dir: str, mode: str = "MATCH", team_name: str = None,
+                        event_store=None, season: str = None, engine: str = None) -> List[str]:
+    """
+    导出最终交付的Excel：
+    - MATCH：每场比赛一个工作簿，包含该场所有球队
+    - TEAM：每支球队一个工作簿，包含该队所有场次（team_name为None时导出全部球队）
+    数据来源为CutOutput拆分文件，传入event_store时改为查询事件库
+    engine：写出引擎，None时优先使用已安装的xlsxwriter（可选依赖），否则openpyxl
+    场次按 (工作簿, 场次) 区分，工作簿名与工作表名使用场次标识（如match_Port24_sheet1.xlsx / Port24_sheet1）
+    """
+    from event_store import MATCH_FILE_PATTERN, match_label, match_sort_key
+    from Util.file_loader import list_excel_files
+
+    # 收集 (球队, 场次标识) → DataFrame
+    frames = {}
+    if event_store is not None:
+        for (match_season, match, team), df in event_store.iter_match_frames(season=season, team=team_name):
+            frames[(team, match_label(match_season, match))] = df
+    else:
+        for file_name in list_excel_files(input_dir):
+            match = MATCH_FILE_PATTERN.match(file_name)
+            if not match or (team_name and match.group("team") != team_name):
+                continue
+            try:
+                key = (match.group("team"), match_label(match.group("workbook"), match.group("match")))
+                frames[key] = pd.read_excel(os.path.join(input_dir, file_name))
+            except Exception as e:
+                print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+    if not frames:
+        raise ValueError("未找到可导出的接球记录")
+
+    engine = resolve_engine(engine)
+    print(f"   写出引擎：{engine}" + ("" if xlsxwriter is not None else "（未安装可选依赖xlsxwriter）"))
+    outputs = []
+    if mode == "MATCH":
+        by_match = {}
+        for (team, match), df in frames.items():
+            by_match.setdefault(match, {})[team] = df
+        for match in sorted(by_match, key=match_sort_key):
+            # 旧命名文件的场次标识只有场次号，沿用原来的match_sheet{场次}
+            name = f"match_{match}" if match_sort_key(match)[0] else f"match_sheet{match}"
+            outputs.append(export_match_workbook(by_match[match], name, output_dir, engine))
+    elif mode == "TEAM":
+        by_team = {}
+        for (team, match), df in frames.items():
+            by_team.setdefault(team, {})[match] = df
+        for team in sorted(by_team):
+            matches = {match if match_sort_key(match)[0] else f"sheet{match}": by_team[team][match]
+                       for match in sorted(by_team[team], key=match_sort_key)}
+            outputs.append(export_team_workbook(matches, team, output_dir, engine))
+    else:
+        raise ValueError(f"导出模式只能是MATCH或TEAM：{mode}")
+    return outputs
+
+
+def benchmark_export(frames: Dict[str, pd.DataFrame], output_dir: str, repeats: int = 3) -> Dict[str, float]:
+    """
+    导出性能对比：逐表 DataFrame.to_excel（openpyxl，原有方式） vs 流式单工作簿写出（一个赛季写入一个工作簿）
+    返回各方式的最短耗时（秒）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    engines = ["openpyxl"] + (["xlsxwriter"] if xlsxwriter is not None else [])
+    timings = {}
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i, df in enumerate(frames.values()):
+            df.to_excel(os.path.join(output_dir, f"bench_to_excel_{i}.xlsx"), index=False, engine="openpyxl")
+        best = min(best, time.perf_counter() - start)
+    timings["to_excel_per_file"] = best
+
+    for engine in engines:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            write_excel_sheets(frames, os.path.join(output_dir, f"bench_stream_{engine}.xlsx"), engine=engine)
+            best = min(best, time.perf_counter() - start)
+        timings[f"stream_{engine}"] = best
+    return timings
+
+
+if __name__ == "__main__":
+    import sys
+    import shutil
+    import tempfile
+
+    # 用法：python -m Util.excel_export [CutOutput目录] [复制倍数]
+    # 以目录内全部拆分文件复制若干份模拟一个完整赛季
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else "./CutOutput"
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 19
+    source = {f: pd.read_excel(os.path.join(input_dir, f)) for f in sorted(os.listdir(input_dir)) if f.endswith(".xlsx")}
+    frames = {f"{os.path.splitext(name)[0]}_{i}": df for i in range(copies) for name, df in source.items()}
+    total_rows = sum(len(df) for df in frames.values())
+
+    bench_dir = tempfile.mkdtemp(prefix="excel_export_bench_")
+    try:
+        timings = benchmark_export(frames, bench_dir)
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+    print(f"导出基准：{len(frames)}张表，共{total_rows}行"
+          + ("" if xlsxwriter is not None else "（未安装可选依赖xlsxwriter，只测试openpyxl）"))
+    baseline = timings["to_excel_per_file"]
+    for name, seconds in timings.items():
+        print(f"   {name:<20} {seconds:8.3f}s  （{baseline / seconds:.1f}x）")
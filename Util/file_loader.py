@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+# 汇总、指标、绘图阶段只用到的列
+PASS_COLUMNS = ["接球球员", "所属队伍", "start", "end", "控球编号"]
+# 待读文件数达到该值且有多个CPU时使用进程池（read_excel解析受GIL限制，线程池只能重叠磁盘I/O）
+PROCESS_MIN_FILES = 8
+
+
+def _read_columns(path: str, columns: List[str] = None) -> pd.DataFrame:
+    """读取单个Excel，只解析需要的列（文件中缺少的列不报错，由调用方检查）"""
+    if columns is None:
+        return pd.read_excel(path)
+    wanted = set(columns)
+    return pd.read_excel(path, usecols=lambda c: c in wanted)
+
+
+def list_excel_files(folder: str, name_filter: str = None, memory_frames: Dict = None) -> List[str]:
+    """
+    文件夹内的Excel文件名（按文件名排序；memory_frames中尚未写出到磁盘的文件一并列出）
+    与带工作簿前缀的拆分文件重复的旧命名拆分文件不列出，避免同一场比赛被重复计数
+    """
+    from event_store import dedupe_cut_files
+
+    files = set(f for f in os.listdir(folder) if f.endswith(".xlsx")) if folder and os.path.isdir(folder) else set()
+    files |= set(memory_frames or {})
+    return [f for f in dedupe_cut_files(sorted(files)) if name_filter is None or name_filter in f]
+
+
+def load_excel_files(folder: str, files: List[str] = None, columns: List[str] = PASS_COLUMNS,
+                     memory_frames: Dict[str, pd.DataFrame] = None, max_workers: int = None,
+                     executor: str = "auto") -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    并发读取文件夹内多个Excel，返回 ({文件名: DataFrame}, {文件名: 错误信息})
+    - files：要读取的文件名，缺省为文件夹内全部Excel；结果顺序与files一致（缺省时按文件名排序）
+    - columns：只读取这些列，None为全部列
+    - memory_frames：已在内存的数据 {文件名: DataFrame}，直接使用，不再读取
+    - executor：thread / process / auto（文件较多且有多个CPU时用进程池，否则用线程池）
+    """
+    memory_frames = memory_frames or {}
+    if files is None:
+        files = list_excel_files(folder, memory_frames=memory_frames)
+    to_read = [f for f in files if f not in memory_frames]
+
+    loaded, errors = {}, {}
+    if to_read:
+        workers = max_workers or min(len(to_read), (os.cpu_count() or 1) + 4)
+        if executor == "auto":
+            use_processes = len(to_read) >= PROCESS_MIN_FILES and (os.cpu_count() or 1) > 1
+            executor = "process" if use_processes else "thread"
+        if executor == "process":
+            pool = ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1))
+        elif executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"不支持的并发方式：{executor}（可选thread/process/auto）")
+        with pool:
+            futures = {f: pool.submit(_read_columns, os.path.join(folder, f), columns) for f in to_read}
+            for file_name, future in futures.items():
+                try:
+                    loaded[file_name] = future.result()
+                except Exception as e:
+                    errors[file_name] = str(e)
+
+    frames = {}
+    for file_name in files:
+        if file_name in memory_frames:
+            frames[file_name] = memory_frames[file_name]
+        elif file_name in loaded:
+            frames[file_name] = loaded[file_name]
+    return frames, errors
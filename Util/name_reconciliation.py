@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# NFKD分解后仍不是「基本字母 + 组合符号」的字母，单独转写
+_SPECIAL_LETTERS = str.maketrans({
+    "đ": "d", "Đ": "D", "ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "ß": "ss",
+    "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ı": "i", "þ": "th", "ð": "d"
+})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# 球员code：「号码 - 姓名」
+_CODE_PATTERN = re.compile(r"^\s*(?P<jersey>\d+)\s*-\s*(?P<name>.*)$")
+
+# 号码相同的加分权重（号码可能跨赛季变化，只作为辅助证据）
+JERSEY_WEIGHT = 0.15
+
+
+def normalize_name(name: str) -> str:
+    """姓名规范化：去除变音符号（Č→C、Đ→D等），转小写，标点与多余空白统一为单个空格"""
+    text = unicodedata.normalize("NFKD", str(name).translate(_SPECIAL_LETTERS))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def split_code(code: str) -> Tuple[str, str]:
+    """球员code → (号码, 规范化姓名)，没有号码时号码为空字符串"""
+    match = _CODE_PATTERN.match(str(code))
+    if match:
+        return match.group("jersey"), normalize_name(match.group("name"))
+    return "", normalize_name(code)
+
+
+def trigrams(name: str) -> set:
+    """字符三元组（首尾补空格，使短名字和词首字母也有三元组）"""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlayerNameIndex:
+    """
+    已知球员名单的字符三元组倒排索引：三元组 → 含该三元组的球员编号
+    查询时只访问与查询名共享三元组的球员（倒排表长度之和），不与名单逐一比较
+    """
+
+    def __init__(self, team_players: Dict[str, List[str]]):
+        self.codes, self.teams, self.jerseys = [], [], []
+        exact, postings, sizes = {}, defaultdict(list), []
+        for team, players in team_players.items():
+            for code in players:
+                code = code.strip()
+                jersey, name = split_code(code)
+                idx = len(self.codes)
+                self.codes.append(code)
+                self.teams.append(team)
+                self.jerseys.append(jersey)
+                exact.setdefault((jersey, name), idx)
+                grams = trigrams(name)
+                sizes.append(len(grams))
+                for gram in grams:
+                    postings[gram].append(idx)
+        self._exact = exact
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._sizes = np.array(sizes, dtype=np.float64)
+        self._jerseys = np.array(self.jerseys, dtype=object)
+
+    def candidates(self, code: str, top_k: int = 2) -> List[Tuple[int, float]]:
+        """
+        查询code最相似的top_k个已知球员，返回 [(球员编号, 置信度)]（按置信度降序）
+        置信度 = (1 - JERSEY_WEIGHT) × 姓名三元组Dice系数 + JERSEY_WEIGHT × 号码是否相同；
+        规范化后号码与姓名完全相同时为1.0
+        """
+        jersey, name = split_code(code)
+        exact = self._exact.get((jersey, name))
+        if exact is not None:
+            return [(exact, 1.0)]
+        grams = trigrams(name)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return []
+        ids, overlap = np.unique(np.concatenate(hits), return_counts=True)
+        dice = 2 * overlap / (len(grams) + self._sizes[ids])
+        score = (1 - JERSEY_WEIGHT) * dice + JERSEY_WEIGHT * (self._jerseys[ids] == jersey) if jersey else dice
+        order = np.argsort(-score, kind="stable")[:top_k]
+        return [(int(ids[i]), float(score[i])) for i in order]
+
+    def resolve(self, codes: List[str], min_confidence: float = 0.75, min_margin: float = 0.05) -> pd.DataFrame:
+        """
+        批量匹配未知code，返回每个code的最佳候选：
+        code / candidate / team / confidence / margin（与第二候选的置信度差） / matched
+        matched：置信度不低于min_confidence，且与第二候选拉开min_margin（避免同名或相近名字误配）
+        """
+        rows = []
+        for code in codes:
+            found = self.candidates(code)
+            if not found:
+                rows.append((code, None, None, 0.0, 0.0))
+                continue
+            best, confidence = found[0]
+            margin = confidence - (found[1][1] if len(found) > 1 else 0.0)
+            rows.append((code, self.codes[best], self.teams[best], confidence, margin))
+        result = pd.DataFrame(rows, columns=["code", "candidate", "team", "confidence", "margin"])
+        result["matched"] = (result["confidence"] >= min_confidence) & (result["margin"] >= min_margin)
+        return result
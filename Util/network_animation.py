@@ -0,0 +1,198 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from Util.pass_pairs import POSSESSION_COLUMN, extract_pass_pairs
+
+# 布局与_draw_network_core一致（spring_layout，k=3.0，seed=42）；热启动后每帧只需少量迭代
+LAYOUT_K = 3.0
+LAYOUT_SEED = 42
+WARM_ITERATIONS = 15
+# 固定坐标范围，避免每帧自动缩放造成画面跳动
+AXIS_LIMIT = 1.25
+
+
+def frame_times(starts: np.ndarray, step_seconds: float) -> np.ndarray:
+    """帧对应的比赛时间（秒）：从第一次接球起每step_seconds一帧，最后一帧包含全部接球"""
+    first, last = float(np.nanmin(starts)), float(np.nanmax(starts))
+    times = np.arange(first + step_seconds, last, step_seconds)
+    return np.append(times, last)
+
+
+def frame_pairs(df: pd.DataFrame, times: np.ndarray, mode: str = "CUMULATIVE",
+                window_seconds: float = 900) -> List[pd.DataFrame]:
+    """
+    每帧的传球边（source/target/weight）：
+    - CUMULATIVE：开场至该帧时间的全部接球
+    - WINDOW：该帧时间之前window_seconds秒内的接球
+    只在同一控球段内的相邻接球之间连边（同 extract_pass_pairs）
+    """
+    df = df[df["接球球员"].notna()].reset_index(drop=True)
+    starts = pd.to_numeric(df["start"], errors="coerce").to_numpy(dtype=np.float64)
+    players = df["接球球员"].tolist()
+    possessions = df[POSSESSION_COLUMN].to_numpy() if POSSESSION_COLUMN in df.columns else None
+    pairs = []
+    for t in times:
+        if mode == "CUMULATIVE":
+            rows = np.flatnonzero(starts <= t)
+        elif mode == "WINDOW":
+            rows = np.flatnonzero((starts <= t) & (starts > t - window_seconds))
+        else:
+            raise ValueError(f"动画模式只能是CUMULATIVE或WINDOW：{mode}")
+        pairs.append(extract_pass_pairs([players[i] for i in rows],
+                                        None if possessions is None else possessions[rows]))
+    return pairs
+
+
+def warm_started_layouts(pairs: List[pd.DataFrame]) -> List[Dict[str, Tuple[float, float]]]:
+    """
+    逐帧计算布局：第一帧完整计算，之后以上一帧的坐标为初始位置只迭代少量步数
+    新出现的球员从已有球员的重心附近开始，布局保持连续、不在帧间跳动
+    """
+    layouts, previous = [], {}
+    rng = np.random.default_rng(LAYOUT_SEED)
+    for frame in pairs:
+        G = nx.DiGraph()
+        G.add_weighted_edges_from(zip(frame["source"], frame["target"], frame["weight"]))
+        if G.number_of_nodes() == 0:
+            layouts.append({})
+            continue
+        if not previous:
+            pos = nx.spring_layout(G, seed=LAYOUT_SEED, k=LAYOUT_K)
+        else:
+            center = np.mean(list(previous.values()), axis=0)
+            init = {v: previous[v] if v in previous else center + rng.normal(scale=0.1, size=2) for v in G}
+            pos = nx.spring_layout(G, pos=init, k=LAYOUT_K, iterations=WARM_ITERATIONS, seed=LAYOUT_SEED)
+        pos = {v: (float(p[0]), float(p[1])) for v, p in pos.items()}
+        previous = {**previous, **pos}
+        layouts.append(pos)
+    return layouts
+
+
+def _render_frame(task: Dict) -> str:
+    """渲染单帧PNG（在工作进程中执行，只接收可序列化的数据）"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    pos, edges = task["pos"], task["edges"]
+    fig, ax = plt.subplots(figsize=task["fig_size"], dpi=task["dpi"])
+    ax.set_xlim(-AXIS_LIMIT, AXIS_LIMIT)
+    ax.set_ylim(-AXIS_LIMIT, AXIS_LIMIT)
+    ax.axis("off")
+    if pos:
+        G = nx.DiGraph()
+        G.add_nodes_from(pos)
+        G.add_weighted_edges_from(edges)
+        nx.draw_networkx_nodes(G, pos, ax=ax, node_size=task["node_size"], node_color=task["node_color"],
+                               alpha=0.8, edgecolors="black")
+        nx.draw_networkx_edges(G, pos, ax=ax, edgelist=[(u, v) for u, v, _ in edges],
+                               width=[w * task["width_scale"] for _, _, w in edges],
+                               edge_color="gray", arrowsize=15, alpha=0.7, node_size=task["node_size"])
+        nx.draw_networkx_labels(G, pos, ax=ax, font_size=7, font_weight="bold")
+    ax.set_title(task["title"], fontsize=12, fontweight="bold")
+    fig.savefig(task["path"])
+    plt.close(fig)
+    return task["path"]
+
+
+def _encode(frame_paths: List[str], output_path: str, fmt: str, fps: float) -> str:
+    """帧序列编码为GIF（Pillow）或MP4（本机ffmpeg）"""
+    if fmt == "GIF":
+        from PIL import Image
+
+        images = [Image.open(path) for path in frame_paths]
+        images[0].save(output_path, save_all=True, append_images=images[1:],
+                       duration=int(1000 / fps), loop=0)
+        return output_path
+    if fmt == "MP4":
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("未找到ffmpeg，无法编码MP4（可改用GIF或FRAMES）")
+        pattern = os.path.join(os.path.dirname(frame_paths[0]), "frame_%04d.png")
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-framerate", str(fps), "-i", pattern,
+                        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", output_path], check=True)
+        return output_path
+    raise ValueError(f"不支持的动画格式：{fmt}（可选GIF/MP4/FRAMES）")
+
+
+def animate_pass_network(
+        input_file_path: str,
+        team_name: str,
+        sheet_idx: int = None,
+        save_dir: str = "./PassingNetworkAnimation",
+        mode: str = "CUMULATIVE",
+        step_seconds: float = 60,
+        window_seconds: float = 900,
+        fmt: str = "GIF",
+        fps: float = 4,
+        workers: int = None,
+        fig_size: tuple = (8, 7),
+        dpi: int = 100,
+        node_size: int = 500,
+        node_color: str = "lightblue",
+        df: pd.DataFrame = None,
+        workbook: str = None
+) -> str:
+    """
+    单场传球网络随比赛时间演变的动画：
+    1. 按step_seconds切帧，每帧为累计（CUMULATIVE）或滑动窗口（WINDOW）内的传球网络
+    2. 主进程逐帧计算布局（以上一帧坐标热启动）
+    3. 工作进程并行渲染各帧PNG，最后编码为GIF/MP4；fmt为FRAMES时只保留帧序列
+    df：上一阶段在内存中的接球记录，传入时不再读取input_file_path
+    workbook：工作簿名，写入标题与文件名（不同工作簿的同号场次不会互相覆盖）
+    返回动画文件路径（FRAMES时为帧目录）
+    """
+    if df is None:
+        df = pd.read_excel(input_file_path)
+    starts = pd.to_numeric(df["start"], errors="coerce").to_numpy(dtype=np.float64)
+    if np.isnan(starts).all():
+        raise ValueError("接球记录缺少有效的start时间，无法按比赛时间生成动画")
+
+    subtitle = f"Sheet{sheet_idx}" if sheet_idx is not None else "Single Match"
+    if workbook:
+        subtitle = f"{workbook} {subtitle}"
+    name = f"{team_name}_{subtitle.replace(' ', '_')}_{mode.lower()}"
+    frame_dir = os.path.join(save_dir, f"{name}_frames")
+    os.makedirs(frame_dir, exist_ok=True)
+    for old_frame in os.listdir(frame_dir):  # 清除上次生成的帧，避免帧数变化时混入旧帧
+        if old_frame.startswith("frame_") and old_frame.endswith(".png"):
+            os.remove(os.path.join(frame_dir, old_frame))
+
+    times = frame_times(starts, step_seconds)
+    pairs = frame_pairs(df, times, mode, window_seconds)
+    layouts = warm_started_layouts(pairs)
+    # 边宽按整场最大边权缩放，各帧可比
+    max_weight = max((int(p["weight"].max()) for p in pairs if len(p)), default=1)
+    tasks = [{
+        "pos": pos,
+        "edges": list(zip(frame["source"], frame["target"], frame["weight"].tolist())),
+        "title": f"{team_name} Passing Network - {subtitle} ({mode.title()}, {t / 60:.0f}')",
+        "path": os.path.join(frame_dir, f"frame_{i:04d}.png"),
+        "fig_size": fig_size,
+        "dpi": dpi,
+        "node_size": node_size,
+        "node_color": node_color,
+        "width_scale": 6.0 / max_weight
+    } for i, (t, frame, pos) in enumerate(zip(times, pairs, layouts))]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frame_paths = list(pool.map(_render_frame, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        frame_paths = [_render_frame(task) for task in tasks]
+    print(f"   已渲染{len(frame_paths)}帧（{workers}个进程）：{frame_dir}")
+
+    if fmt == "FRAMES":
+        return frame_dir
+    output_path = os.path.join(save_dir, f"{name}.{fmt.lower()}")
+    _encode(frame_paths, output_path, fmt, fps)
+    print(f"   传球网络动画已保存到：{output_path}")
+    return output_path
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import List, Dict
+from DataProcessor import assign_possession_ids
+from Util.atomic_io import write_json_atomic
+
+
+def load_possession_events(input_dir: str, event_store=None, season: str = None) -> pd.DataFrame:
+    """
+    读取数据阶段的清洗后数据（OutputData，含控球标识行），返回带场次与全局控球编号的接球事件
+    列：场次/start/end/接球球员/所属队伍/控球编号（场次取文件名，如Port24_sheet1）
+    传入event_store时改为查询事件库（场次为match_label，与文件名一致；控球编号为空的旧事件整场视为一个控球段）
+    """
+    if event_store is not None:
+        from event_store import match_label
+
+        events = event_store.query_events(season=season)
+        if events.empty:
+            raise ValueError(f"事件库中没有赛季{season or '（全部）'}的接球事件")
+        labels = [match_label(s, m) for s, m in zip(events["season"], events["match"])]
+        events = events.drop(columns=["season", "match"])
+        events.insert(0, "场次", labels)
+        events["控球编号"] = events["控球编号"].fillna(-1).astype(np.int64)
+        return events[["场次", "start", "end", "接球球员", "所属队伍", "控球编号"]]
+
+    frames = []
+    excel_files = sorted(f for f in os.listdir(input_dir) if f.endswith(".xlsx"))
+    for file_name in excel_files:
+        try:
+            df = pd.read_excel(os.path.join(input_dir, file_name))
+        except Exception as e:
+            print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+            continue
+        if "code" not in df.columns or "text" not in df.columns:
+            print(f"   × 跳过无效文件{file_name}：缺少code/text列")
+            continue
+        events = assign_possession_ids(df)
+        events.insert(0, "场次", os.path.splitext(file_name)[0])
+        frames.append(events)
+    if not frames:
+        raise ValueError(f"在{input_dir}中未找到有效的清洗后数据")
+    return pd.concat(frames, ignore_index=True)
+
+
+def mine_pass_chains(events: pd.DataFrame, n: int) -> pd.DataFrame:
+    """
+    统计控球段内长度为n的接球链（A→B→C…）出现次数：
+    球员编码为整数，滑动窗口 + 整数哈希计数，窗口跨越控球段边界的链被丢弃
+    返回列：场次/所属队伍/chain_hash/count
+    """
+    if n < 2:
+        raise ValueError("接球链长度至少为2")
+    if len(events) < n:
+        return pd.DataFrame(columns=["场次", "所属队伍", "chain_hash", "count"])
+
+    player_ids, _ = pd.factorize(events["接球球员"])
+    base = np.int64(max(player_ids.max() + 1, 2))
+    if float(base) ** n >= 2 ** 62:
+        raise ValueError(f"球员数{base}过多，长度{n}的接球链无法用int64编码")
+
+    # 全局控球段编号：场次+控球编号唯一确定一个控球段
+    possession_keys, _ = pd.factorize(pd.MultiIndex.from_arrays([events["场次"], events["控球编号"]]))
+    windows = sliding_window_view(player_ids.astype(np.int64), n)
+    possession_windows = sliding_window_view(possession_keys, n)
+    valid = possession_windows[:, 0] == possession_windows[:, -1]
+
+    # 整数哈希：以球员数为基的n位数
+    weights = base ** np.arange(n - 1, -1, -1, dtype=np.int64)
+    chain_hash = windows[valid] @ weights
+
+    chains = pd.DataFrame({
+        "场次": events["场次"].to_numpy()[:len(valid)][valid],
+        "所属队伍": events["所属队伍"].to_numpy()[:len(valid)][valid],
+        "chain_hash": chain_hash
+    })
+    return chains.groupby(["场次", "所属队伍", "chain_hash"], sort=False).size().rename("count").reset_index()
+
+
+def _decode_chain(chain_hash: int, n: int, base: int, players) -> List[str]:
+    """整数哈希还原为球员序列"""
+    ids = []
+    for _ in range(n):
+        chain_hash, player_id = divmod(int(chain_hash), base)
+        ids.append(players[player_id])
+    return ids[::-1]
+
+
+def top_pass_chains(events: pd.DataFrame, lengths: List[int] = (3, 4), top_k: int = 10) -> Dict:
+    """
+    每个链长分别给出按球队（全部场次累计）与按场次的Top-K接球链
+    返回 {链长: {"by_team": {球队: [...]}, "by_match": {场次: {球队: [...]}}}}
+    """
+    player_ids, players = pd.factorize(events["接球球员"])
+    base = max(player_ids.max() + 1, 2) if len(player_ids) else 2
+
+    def to_records(df):
+        return [{"chain": _decode_chain(h, n, base, players), "count": int(c)}
+                for h, c in zip(df["chain_hash"], df["count"])]
+
+    result = {}
+    for n in lengths:
+        counts = mine_pass_chains(events, n)
+        by_team_counts = counts.groupby(["所属队伍", "chain_hash"], sort=False)["count"].sum().reset_index()
+        by_team = {
+            team: to_records(group.nlargest(top_k, "count", keep="first"))
+            for team, group in by_team_counts.groupby("所属队伍", sort=True)
+        }
+        by_match = {}
+        for (match, team), group in counts.groupby(["场次", "所属队伍"], sort=True):
+            by_match.setdefault(match, {})[team] = to_records(group.nlargest(top_k, "count", keep="first"))
+        result[str(n)] = {"by_team": by_team, "by_match": by_match}
+        print(f"   - 长度{n}：共{int(counts['count'].sum()) if len(counts) else 0}条接球链，"
+              f"{counts['chain_hash'].nunique() if len(counts) else 0}种组合")
+    return result
+
+
+def analyze_pass_chains(input_dir: str, output_path: str = None, lengths: List[int] = (3, 4),
+                        top_k: int = 10, event_store=None, season: str = None) -> Dict:
+    """接球链挖掘：读取清洗后数据（传入event_store时查询事件库） → 统计Top-K接球链 → 可选保存为JSON"""
+    events = load_possession_events(input_dir, event_store, season)
+    print(f"   读取完成：{events['场次'].nunique()}场比赛，{len(events)}条接球事件")
+    result = top_pass_chains(events, lengths, top_k)
+    if output_path:
+        write_json_atomic(output_path, result)
+        print(f"   接球链结果已保存到：{output_path}")
+    return result
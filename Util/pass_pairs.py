@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+from typing import Iterable, List, Tuple
+
+# 拆分数据中的控球段编号列（单场内从0递增）；旧数据没有该列时整个文件视为一个控球段
+POSSESSION_COLUMN = "控球编号"
+
+
+def frame_sequence(df: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+    """单个接球记录表 → (接球球员序列, 控球段键)，接球球员为空的行连同其控球段键一起丢弃"""
+    valid = df["接球球员"].notna().to_numpy()
+    players = df["接球球员"].to_numpy()[valid].tolist()
+    if POSSESSION_COLUMN in df.columns:
+        keys = pd.factorize(df[POSSESSION_COLUMN].fillna(-1).to_numpy()[valid])[0]
+    else:
+        keys = np.zeros(len(players), dtype=np.int64)
+    return players, keys
+
+
+def chain_sequences(parts: Iterable[Tuple[List[str], np.ndarray]]) -> Tuple[List[str], np.ndarray]:
+    """拼接多段 (接球球员序列, 控球段键)，各段的键加偏移后互不重叠（不同文件/场次之间不连边）"""
+    players, keys, offset = [], [], 0
+    for part_players, part_keys in parts:
+        players.extend(part_players)
+        keys.append(np.asarray(part_keys, dtype=np.int64) + offset)
+        if len(part_keys):
+            offset += int(np.max(part_keys)) + 1
+    return players, np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+
+
+def concat_pass_sequences(frames: Iterable[pd.DataFrame]) -> Tuple[List[str], np.ndarray]:
+    """拼接多个接球记录表（缺少接球球员列的表跳过），返回 (接球球员序列, 控球段键)"""
+    return chain_sequences(frame_sequence(df) for df in frames if "接球球员" in df.columns)
+
+
+def extract_pass_pairs(pass_sequence: List[str], possession_ids=None) -> pd.DataFrame:
+    """
+    同一控球段内相邻两次接球 → 一次传球（同一球员连续接球不计），向量化统计每对球员的传球次数
+    possession_ids：与pass_sequence等长的控球段键，None时整段序列视为一个控球段（旧行为）
+    返回列：source/target/weight，按首次出现的顺序排列
+    """
+    if len(pass_sequence) < 2:
+        return pd.DataFrame({"source": [], "target": [], "weight": []})
+    # 先对原始取值去重再去空格，每个取值只处理一次
+    raw_ids, raw_names = pd.factorize(np.asarray(pass_sequence, dtype=object))
+    name_ids, names = pd.factorize(pd.Index(raw_names.astype(str)).str.strip())
+    player_ids = name_ids[raw_ids].astype(np.int64)
+
+    source, target = player_ids[:-1], player_ids[1:]
+    keep = source != target
+    if possession_ids is not None:
+        possession_ids = np.asarray(possession_ids)
+        keep &= possession_ids[:-1] == possession_ids[1:]
+    pair_ids, pairs = pd.factorize(source[keep] * len(names) + target[keep])
+    return pd.DataFrame({
+        "source": names[pairs // len(names)],
+        "target": names[pairs % len(names)],
+        "weight": np.bincount(pair_ids, minlength=len(pairs))
+    })
+
+
+def build_pass_graph(pass_sequence: List[str], possession_ids=None) -> nx.DiGraph:
+    """由接球序列构建有向加权传球图（节点/边的加入顺序与逐对遍历序列一致）"""
+    pairs = extract_pass_pairs(pass_sequence, possession_ids)
+    G = nx.DiGraph()
+    G.add_weighted_edges_from(zip(pairs["source"].tolist(), pairs["target"].tolist(), pairs["weight"].tolist()))
+    return G
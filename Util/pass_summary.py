@@ -1,23 +1,39 @@
 import pandas as pd
 import os
 from typing import List
-
-
-def summarize_team_pass_players(output_file_path, sheet_idx, cut_output_dir):
-    """按Excel格式分类接球记录，生成带sheet索引的文件名"""
-    # 数据读取
-    if not os.path.exists(output_file_path):
-        raise FileNotFoundError(f"数据文件不存在：{output_file_path}")
-
+from DataProcessor import parse_event_codes, possession_spans
+from Util.excel_export import persist_excel
+from Util.file_loader import list_excel_files, load_excel_files
+from Util.pass_pairs import POSSESSION_COLUMN
+from event_store import cut_file_name
+
+
+def summarize_team_pass_players(output_file_path, sheet_idx, cut_output_dir, event_store=None, season=None,
+                                cleaned_df=None, writer=None, persist=True, workbook=None):
+    """
+    按Excel格式分类接球记录，生成带sheet索引的文件名（传入event_store时同时写入事件库）
+    cleaned_df：上一阶段直接传入的清洗后数据（传入时不再读取output_file_path）
+    writer/persist：后台写出线程 / 是否写出文件
+    workbook：工作簿名，传入时作为文件名前缀（同时处理多个工作簿时避免同号sheet互相覆盖）
+    返回 {文件名: 球队接球记录DataFrame}，供网络阶段直接使用
+    """
     print("\n5. 传球总结")
-    df = pd.read_excel(output_file_path)
+    if cleaned_df is not None:
+        df = cleaned_df
+    else:
+        # 数据读取
+        if not os.path.exists(output_file_path):
+            raise FileNotFoundError(f"数据文件不存在：{output_file_path}")
+        df = pd.read_excel(output_file_path)
     total_rows = len(df)
     print(f"5.1 传球总结开始：读取到{total_rows}行数据")
 
+    # 一次性解析code列（类别列 + 行类型标记）
+    df = parse_event_codes(df)
+
     # 识别控球行
-    possession_code_pattern = r"(.+?)\s*-\s*Possessions"
-    df['是否控球标识行'] = (df['text'] == 'Possessions') & (df['code'].str.match(possession_code_pattern, na=False))
-    df['当前控球队伍'] = df['code'].str.extract(possession_code_pattern)[0].str.strip()
+    df['是否控球标识行'] = df['is_possession'] & (df['text'] == 'Possessions').to_numpy()
+    df['当前控球队伍'] = df['possession_team']
 
     # 打印控球标识行统计
     possession_flag_rows = df[df['是否控球标识行']]
@@ -31,21 +47,12 @@ def summarize_team_pass_players(output_file_path, sheet_idx, cut_output_dir):
     else:
         raise ValueError("未从数据中识别到任何球队的控球记录！请检查映射文件和原始数据")
 
-    # 标记球员所属队伍
-    df['球员所属队伍'] = None
-    current_team = None
-
-    for idx, row in df.iterrows():
-        if row['是否控球标识行']:
-            current_team = row['当前控球队伍']
-        elif current_team is not None:
-            # 识别有效球员行
-            is_player_row = (pd.isna(row['text']) and
-                             pd.notna(row['code']) and
-                             '-' in str(row['code']) and
-                             'Possessions' not in str(row['code']))
-            if is_player_row:
-                df.loc[idx, '球员所属队伍'] = current_team
+    # 标记球员所属队伍：控球标识行的球队向下填充到其后的有效球员行
+    current_team = df['当前控球队伍'].where(df['是否控球标识行']).ffill()
+    is_player_row = df['is_merge_player'] & df['text'].isna()
+    df['球员所属队伍'] = current_team.where(is_player_row)
+    # 控球段编号：第几个控球标识行（本场内从0递增），网络只在同一控球段内的相邻接球之间连边
+    df['控球编号'] = df['是否控球标识行'].cumsum() - 1
 
     # 有效球员记录统计
     valid_player_records = df[df['球员所属队伍'].notna()].copy()
@@ -55,6 +62,8 @@ def summarize_team_pass_players(output_file_path, sheet_idx, cut_output_dir):
     os.makedirs(cut_output_dir, exist_ok=True)
     print(f"   - 输出文件夹：{cut_output_dir}")
 
+    team_frames = {}
+    file_frames = {}
     for team in unique_teams:
         team_records = valid_player_records[valid_player_records['球员所属队伍'] == team]
         print(f"\n   ** {team}：")
@@ -69,54 +78,92 @@ def summarize_team_pass_players(output_file_path, sheet_idx, cut_output_dir):
             "start": team_records['start'].values,
             "end": team_records['end'].values,
             "接球球员": team_records['code'].str.strip().values,
-            "所属队伍": team
+            "所属队伍": team,
+            POSSESSION_COLUMN: team_records['控球编号'].values
         })
 
-        output_filename = f"{team}_sheet{sheet_idx}.xlsx"
+        output_filename = cut_file_name(team, sheet_idx, workbook)
         output_path = os.path.join(cut_output_dir, output_filename)
 
-        output_df.to_excel(output_path, index=False)
+        if persist:
+            persist_excel(output_df, output_path, writer)
+        team_frames[team] = output_df
+        file_frames[output_filename] = output_df
         unique_players = output_df["接球球员"].unique()
         print(f"      - 参与球员数：{len(unique_players)}人")
         print(f"      - 文件生成成功：{output_path}")
 
-    print(f"\n5.2 传球总结完成！共生成{len(unique_teams)}个球队的传球记录文件")
-
+    if event_store is not None and team_frames:
+        event_count = event_store.ingest_team_events(season, sheet_idx, team_frames, possession_spans(df))
+        print(f"\n   - 已写入事件库：赛季{season} 场次{sheet_idx}，共{event_count}条事件")
 
-def summarize_combined_matches(input_dir: str, output_dir: str, team_name: str) -> None:
-    """汇总多场比赛的传球数据（从CutOutput到GameSum）"""
+    print(f"\n5.2 传球总结完成！共生成{len(unique_teams)}个球队的传球记录文件")
+    return file_frames
+
+
+def summarize_combined_matches(input_dir: str, output_dir: str, team_name: str, event_store=None,
+                               season: str = None, memory_frames: dict = None, writer=None,
+                               persist: bool = True) -> dict:
+    """
+    汇总多场比赛的传球数据（从CutOutput到GameSum；传入event_store时直接查询事件库）
+    memory_frames：本次运行中已在内存的CutOutput数据 {文件名: DataFrame}，优先于磁盘文件使用
+    writer/persist：后台写出线程 / 是否写出文件
+    返回 {汇总文件名: 汇总DataFrame}
+    """
     print("1. 开始汇总多场比赛数据...")
 
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
 
-    # 收集所有相关Excel文件
-    excel_files = [f for f in os.listdir(input_dir) if f.endswith(".xlsx") and team_name in f]
+    if event_store is not None:
+        team_data = {}
+        for (match_season, match, team), df in event_store.iter_match_frames(season=season, team=team_name):
+            team_data.setdefault(team, []).append(df)
+            print(f"   已查询 赛季{match_season} 场次{match}：{team}（{len(df)}条记录）")
+        if not team_data:
+            raise ValueError(f"事件库中未找到{team_name}的比赛数据")
+        return _save_combined(team_data, output_dir, writer, persist)
+
+    # 收集所有相关Excel文件（并发读取）
+    excel_files = list_excel_files(input_dir, team_name, memory_frames)
     if not excel_files:
         raise ValueError(f"在{input_dir}中未找到包含{team_name}的Excel文件")
+    frames, errors = load_excel_files(input_dir, excel_files, memory_frames=memory_frames)
+    for file_name, message in errors.items():
+        print(f"   读取文件{file_name}失败：{message}，已跳过")
 
     # 按球队分组汇总
     team_data = {}
-    for file_idx, file_name in enumerate(excel_files, 1):
-        file_path = os.path.join(input_dir, file_name)
-        try:
-            df = pd.read_excel(file_path)
-            if "所属队伍" not in df.columns or "接球球员" not in df.columns:
-                print(f"   跳过无效文件{file_name}：缺少必要列")
-                continue
-
-            team = df["所属队伍"].iloc[0] if not df.empty else "Unknown"
-            if team not in team_data:
-                team_data[team] = []
-            team_data[team].append(df)
-            print(f"   已读取 {file_idx}/{len(excel_files)}：{file_name}")
-        except Exception as e:
-            print(f"   读取文件{file_name}失败：{str(e)}，已跳过")
-
-    # 合并并保存每个球队的汇总数据
+    for file_idx, (file_name, df) in enumerate(frames.items(), 1):
+        if "所属队伍" not in df.columns or "接球球员" not in df.columns:
+            print(f"   跳过无效文件{file_name}：缺少必要列")
+            continue
+
+        team = df["所属队伍"].iloc[0] if not df.empty else "Unknown"
+        if team not in team_data:
+            team_data[team] = []
+        team_data[team].append(df)
+        print(f"   已读取 {file_idx}/{len(excel_files)}：{file_name}")
+
+    return _save_combined(team_data, output_dir, writer, persist)
+
+
+def _save_combined(team_data: dict, output_dir: str, writer=None, persist: bool = True) -> dict:
+    """合并并保存每个球队的汇总数据，返回 {文件名: 汇总DataFrame}"""
+    combined_frames = {}
     for team, dfs in team_data.items():
-        combined_df = pd.concat(dfs, ignore_index=True)
+        # 各场的控球编号都从0开始，汇总时依次加偏移，使不同场次的控球段不会相连
+        offset, renumbered = 0, []
+        for df in dfs:
+            if POSSESSION_COLUMN in df.columns and df[POSSESSION_COLUMN].notna().any():
+                df = df.assign(**{POSSESSION_COLUMN: df[POSSESSION_COLUMN] + offset})
+                offset = int(df[POSSESSION_COLUMN].max()) + 1
+            renumbered.append(df)
+        combined_df = pd.concat(renumbered, ignore_index=True)
         output_filename = f"{team}_combined.xlsx"
         output_path = os.path.join(output_dir, output_filename)
-        combined_df.to_excel(output_path, index=False)
-        print(f"   已生成{team}汇总数据：{output_path}（共{len(combined_df)}条记录）")
\ No newline at end of file
+        if persist:
+            persist_excel(combined_df, output_path, writer)
+        combined_frames[output_filename] = combined_df
+        print(f"   已生成{team}汇总数据：{output_path}（共{len(combined_df)}条记录）")
+    return combined_frames
\ No newline at end of file
@@ -0,0 +1,212 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from event_store import MATCH_FILE_PATTERN, match_label, match_sort_key, resolve_matches
+from Util.file_loader import list_excel_files, load_excel_files
+from Util.pass_pairs import extract_pass_pairs, frame_sequence
+from Util.atomic_io import write_json_atomic
+
+# 可检验的网络指标（逐场传球图计算，与nx.density等定义一致；组间比较各组的场均值）
+GROUP_METRICS = ("density", "in_degree_centralization", "out_degree_centralization")
+
+# 进程池工作进程中的逐场指标 {指标: (场次数,)}（由初始化函数写入，避免每个任务重复传输）
+_WORKER_VALUES = None
+
+
+def build_adjacency_stack(sequences: Dict[str, Tuple[List[str], np.ndarray]]) -> Tuple[np.ndarray, List[str], List[str]]:
+    """
+    每场比赛的 (接球序列, 控球段键) → 邻接矩阵栈 (场次数, 球员数, 球员数)，边权为传球次数
+    连边规则同 _build_graph_from_sequence（同一控球段内相邻接球连边，同一球员不连自环）
+    返回 (邻接矩阵栈, 场次列表, 球员列表)
+    """
+    matches = list(sequences)
+    pairs = {match: extract_pass_pairs(*sequences[match]) for match in matches}
+    players = pd.Index(sorted(set().union(*[set(p["source"]) | set(p["target"]) for p in pairs.values()])))
+    stack = np.zeros((len(matches), len(players), len(players)))
+    for m, match in enumerate(matches):
+        match_pairs = pairs[match]
+        stack[m, players.get_indexer(match_pairs["source"]), players.get_indexer(match_pairs["target"])] = \
+            match_pairs["weight"].to_numpy()
+    return stack, matches, list(players)
+
+
+def group_metrics(adjacency_stack: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算邻接矩阵栈 (场次数, 球员数, 球员数) 中每张传球图的指标，返回 {指标: (场次数,)}
+    节点只计入有传球关系的球员（与由传球序列构建的nx图一致）：
+    - density：边数 / (n(n-1))
+    - in/out_degree_centralization：Freeman中心势 Σ(最大度 - 度) / (n-1)²
+    """
+    adjacency = adjacency_stack > 0
+    edges = adjacency.sum(axis=(1, 2)).astype(np.float64)
+    in_degree = adjacency.sum(axis=1)
+    out_degree = adjacency.sum(axis=2)
+    n = ((in_degree > 0) | (out_degree > 0)).sum(axis=1).astype(np.float64)
+    pairs = n * (n - 1)
+    valid = n > 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "density": np.where(valid, edges / pairs, 0.0),
+            # 各节点度之和等于边数：Σ(max - d_i) = n·max - 边数
+            "in_degree_centralization": np.where(valid, (n * in_degree.max(axis=1) - edges) / (n - 1) ** 2, 0.0),
+            "out_degree_centralization": np.where(valid, (n * out_degree.max(axis=1) - edges) / (n - 1) ** 2, 0.0)
+        }
+
+
+def _group_difference(values: Dict[str, np.ndarray], weights_a: np.ndarray, weights_b: np.ndarray,
+                      metrics: List[str]) -> Dict[str, np.ndarray]:
+    """按场次权重 (批大小, 场次数) 求两组逐场指标的加权均值（一次矩阵乘法），返回各指标的组间差（A - B）"""
+    size_a = weights_a.sum(axis=1)
+    size_b = weights_b.sum(axis=1)
+    return {metric: weights_a @ values[metric] / size_a - weights_b @ values[metric] / size_b for metric in metrics}
+
+
+def _init_worker(values: Dict[str, np.ndarray]) -> None:
+    global _WORKER_VALUES
+    _WORKER_VALUES = values
+
+
+def _run_batch(kind: str, labels: np.ndarray, size: int, seed, metrics: List[str]) -> Dict[str, np.ndarray]:
+    """
+    一批随机重排/重抽样：
+    - permutation：打乱场次标签（保持两组场次数不变）
+    - bootstrap：两组内分别有放回重抽场次
+    """
+    values = _WORKER_VALUES
+    rng = np.random.default_rng(seed)
+    if kind == "permutation":
+        permuted = rng.permuted(np.tile(labels, (size, 1)), axis=1)
+        weights_a = permuted.astype(np.float64)
+        weights_b = 1.0 - weights_a
+    else:
+        weights_a = np.zeros((size, len(labels)))
+        weights_b = np.zeros((size, len(labels)))
+        for weights, members in ((weights_a, np.flatnonzero(labels)), (weights_b, np.flatnonzero(~labels))):
+            draws = rng.integers(0, len(members), size=(size, len(members)))
+            np.add.at(weights, (np.repeat(np.arange(size), len(members)), members[draws.ravel()]), 1)
+    return _group_difference(values, weights_a, weights_b, metrics)
+
+
+def _run_batches(values: Dict[str, np.ndarray], kind: str, labels: np.ndarray, total: int, batch_size: int,
+                 seed_sequence: np.random.SeedSequence, metrics: List[str], workers: int) -> Dict[str, np.ndarray]:
+    """把total次重排切成批，单进程顺序执行或分发到进程池；各批种子由seed_sequence派生，结果与进程数无关"""
+    sizes = [min(batch_size, total - start) for start in range(0, total, batch_size)]
+    seeds = seed_sequence.spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(values,)) as pool:
+            results = list(pool.map(_run_batch, [kind] * len(sizes), [labels] * len(sizes), sizes, seeds,
+                                    [metrics] * len(sizes)))
+    else:
+        _init_worker(values)
+        results = [_run_batch(kind, labels, size, seed, metrics) for size, seed in zip(sizes, seeds)]
+    return {metric: np.concatenate([r[metric] for r in results]) for metric in metrics}
+
+
+def permutation_test(stack: np.ndarray, labels, metrics: List[str] = GROUP_METRICS,
+                     n_permutations: int = 5000, n_bootstrap: int = 2000, confidence: float = 0.95,
+                     batch_size: int = 500, seed: int = 42, workers: int = None) -> Dict[str, Dict]:
+    """
+    两组比赛（labels为True的场次为A组）网络指标的差异检验：每场传球图各算一次指标，比较两组的场均值
+    - p值：场次标签置换检验（双侧，(超过观测差的次数 + 1) / (置换次数 + 1)）
+    - 置信区间：组内有放回重抽场次的百分位bootstrap区间
+    返回 {指标: {group_a, group_b（两组场均值）, difference, p_value, ci_low, ci_high, match_values（逐场指标）}}
+    """
+    labels = np.asarray(labels, dtype=bool)
+    if labels.all() or not labels.any():
+        raise ValueError("两组都至少需要一场比赛")
+    unknown = [m for m in metrics if m not in GROUP_METRICS]
+    if unknown:
+        raise ValueError(f"不支持的指标：{unknown}，请从{list(GROUP_METRICS)}中选择")
+    workers = workers or os.cpu_count() or 1
+
+    values = {metric: v for metric, v in group_metrics(stack).items() if metric in metrics}
+    permutation_seeds, bootstrap_seeds = np.random.SeedSequence(seed).spawn(2)
+    null = _run_batches(values, "permutation", labels, n_permutations, batch_size, permutation_seeds, list(metrics),
+                        workers)
+    boot = _run_batches(values, "bootstrap", labels, n_bootstrap, batch_size, bootstrap_seeds, list(metrics), workers)
+
+    tail = (1 - confidence) / 2
+    results = {}
+    for metric in metrics:
+        a, b = float(values[metric][labels].mean()), float(values[metric][~labels].mean())
+        diff = a - b
+        exceed = np.count_nonzero(np.abs(null[metric]) >= abs(diff) - 1e-12)
+        low, high = np.quantile(boot[metric], [tail, 1 - tail])
+        results[metric] = {
+            "group_a": a,
+            "group_b": b,
+            "difference": diff,
+            "p_value": float((exceed + 1) / (n_permutations + 1)),
+            "ci_low": float(low),
+            "ci_high": float(high),
+            "match_values": values[metric].tolist()
+        }
+    return results
+
+
+def load_match_sequences(input_dir: str, team_name: str, memory_frames: Dict = None, event_store=None,
+                         season: str = None) -> Dict[str, Tuple[List[str], np.ndarray]]:
+    """
+    读取拆分数据中某支球队各场的接球序列，返回 {场次标识: (接球序列, 控球段键)}（按工作簿、场次排序）
+    场次标识见match_label（如Port24_sheet1），不同工作簿的同号场次是不同比赛；传入event_store时改为查询事件库
+    """
+    if event_store is not None:
+        sequences = {match_label(match_season, match): frame_sequence(df)
+                     for (match_season, match, _), df in event_store.iter_match_frames(season=season, team=team_name)}
+        return {m: sequences[m] for m in sorted(sequences, key=match_sort_key)}
+
+    files = {}
+    for file_name in list_excel_files(input_dir, memory_frames=memory_frames):
+        match = MATCH_FILE_PATTERN.match(file_name)
+        if match and match.group("team") == team_name:
+            files[match_label(match.group("workbook"), match.group("match"))] = file_name
+    labels = sorted(files, key=match_sort_key)
+    frames, errors = load_excel_files(input_dir, [files[m] for m in labels], memory_frames=memory_frames)
+    for file_name, message in errors.items():
+        print(f"   × 读取文件{file_name}失败：{message}，已跳过")
+    return {m: frame_sequence(frames[files[m]]) for m in labels
+            if files[m] in frames and "接球球员" in frames[files[m]].columns}
+
+
+def analyze_group_difference(input_dir: str, team_name: str, group_a: List[int], group_b: List[int] = None,
+                             metrics: List[str] = GROUP_METRICS, n_permutations: int = 5000,
+                             n_bootstrap: int = 2000, confidence: float = 0.95, seed: int = 42,
+                             workers: int = None, output_path: str = None, memory_frames: Dict = None,
+                             event_store=None, season: str = None) -> Dict:
+    """
+    比较某支球队两组比赛（如主场/客场、某球员是否出场）的传球网络指标（逐场计算，比较两组场均值）
+    group_a/group_b：场次列表（完整场次标识如Port24_sheet1，或只在一个工作簿中存在的场次号），
+    group_b为None时取其余全部场次；传入event_store时从事件库查询各场接球序列
+    """
+    sequences = load_match_sequences(input_dir, team_name, memory_frames, event_store, season)
+    group_a = set(resolve_matches(group_a, list(sequences)))
+    group_b = set(resolve_matches(group_b, list(sequences))) if group_b is not None else set(sequences) - group_a
+    sequences = {m: seq for m, seq in sequences.items() if m in group_a | group_b}
+    stack, matches, players = build_adjacency_stack(sequences)
+    labels = np.array([m in group_a for m in matches])
+    print(f"   - {team_name}：A组{labels.sum()}场，B组{(~labels).sum()}场，{len(players)}名球员")
+
+    results = permutation_test(stack, labels, metrics, n_permutations, n_bootstrap, confidence, seed=seed,
+                               workers=workers)
+    for metric, r in results.items():
+        r["match_values"] = dict(zip(matches, r["match_values"]))
+        print(f"   - {metric}：A={r['group_a']:.4f} B={r['group_b']:.4f} 差={r['difference']:+.4f} "
+              f"p={r['p_value']:.4f} {confidence:.0%}CI=[{r['ci_low']:+.4f}, {r['ci_high']:+.4f}]")
+
+    output = {
+        "team_name": team_name,
+        "group_a": [m for m in matches if m in group_a],
+        "group_b": [m for m in matches if m not in group_a],
+        "n_permutations": n_permutations,
+        "n_bootstrap": n_bootstrap,
+        "confidence": confidence,
+        "metrics": results
+    }
+    if output_path:
+        write_json_atomic(output_path, output)
+        print(f"   置换检验结果已保存到：{output_path}")
+    return output
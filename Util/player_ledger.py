@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+# 单场账本列（每场每队每名球员一行），赛季累计由事件库按这些列求和
+LEDGER_COLUMNS = ["team", "player", "touches", "passes_in", "passes_out", "minutes"]
+PAIR_COLUMNS = ["team", "source", "target", "weight"]
+
+
+def match_ledger(events: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    单场事件（列：team/player/start/possession，各队事件连续且按seq排列）→ (球员账本, 传球对)
+    传球的定义同 extract_pass_pairs：同一球队、同一控球段内相邻两次接球，同一球员连续接球不计；
+    控球编号为空的旧数据整场视为一个控球段。全部通过数组比较 + groupby完成，不构建networkx图
+    - 球员账本：touches接球次数 / passes_in接到传球（入强度） / passes_out传出（出强度） /
+      minutes参与时长（首次到最后一次接球的比赛时间，分钟）
+    - 传球对：team/source/target/weight，赛季传球对象数由此去重统计
+    """
+    events = events.reset_index(drop=True)
+    team = events["team"].to_numpy()
+    player = events["player"].to_numpy()
+    possession = pd.to_numeric(events["possession"], errors="coerce").fillna(-1).to_numpy()
+
+    linked = np.zeros(len(events), dtype=bool)
+    linked[:-1] = (team[1:] == team[:-1]) & (possession[1:] == possession[:-1]) & (player[1:] != player[:-1])
+    rows = np.flatnonzero(linked)
+    pairs = (pd.DataFrame({"team": team[rows], "source": player[rows], "target": player[rows + 1]})
+             .groupby(["team", "source", "target"], sort=False).size().rename("weight").reset_index())
+
+    starts = pd.to_numeric(events["start"], errors="coerce")
+    ledger = events.assign(start=starts).groupby(["team", "player"], sort=False)["start"].agg(
+        touches="size", first="min", last="max")
+    ledger["minutes"] = ((ledger["last"] - ledger["first"]) / 60).fillna(0.0)
+    for column, side in (("passes_in", "target"), ("passes_out", "source")):
+        strength = pairs.groupby(["team", side])["weight"].sum().rename_axis(["team", "player"])
+        ledger[column] = strength.reindex(ledger.index, fill_value=0).astype(np.int64)
+    return ledger.reset_index()[LEDGER_COLUMNS], pairs[PAIR_COLUMNS]
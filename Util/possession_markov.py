@@ -0,0 +1,126 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict
+from Util.pass_chains import load_possession_events
+from Util.atomic_io import write_json_atomic
+
+
+def build_transition_counts(events: pd.DataFrame):
+    """
+    按（场次, 球队）把控球段内的接球序列转换为转移计数，所有场次一次性向量化完成：
+    - transitions：(图数, K, K)，控球段内相邻接球 i→j 的次数
+    - absorbed：(图数, K)，控球段最后一次接球后丢失球权（吸收态）的次数
+    - starts：(图数, K)，控球段由该球员第一次接球的次数
+    K为各图球员数的最大值，球员较少的图以0补齐（补齐的状态不可达，不影响求解）
+    返回 (transitions, absorbed, starts, 图键列表, 各图球员列表)
+    """
+    graph_ids, graph_keys = pd.factorize(pd.MultiIndex.from_arrays([events["场次"], events["所属队伍"]]))
+    possession_keys = pd.factorize(pd.MultiIndex.from_arrays([events["场次"], events["控球编号"]]))[0]
+
+    # 图内球员编号：(图, 球员) 组合按图分组后依次编号
+    player_keys, player_pairs = pd.factorize(pd.MultiIndex.from_arrays([graph_ids, events["接球球员"].to_numpy()]))
+    pair_frame = pd.DataFrame({"graph": player_pairs.get_level_values(0), "player": player_pairs.get_level_values(1)})
+    local_ids = pair_frame.groupby("graph", sort=False).cumcount().to_numpy()
+    state = local_ids[player_keys]
+    size = int(local_ids.max()) + 1 if len(local_ids) else 0
+    players = pair_frame.assign(local=local_ids).sort_values(["graph", "local"]).groupby("graph")["player"].agg(list)
+
+    n_graphs = len(graph_keys)
+    transitions = np.zeros((n_graphs, size, size))
+    absorbed = np.zeros((n_graphs, size))
+    starts = np.zeros((n_graphs, size))
+
+    same_next = np.zeros(len(events), dtype=bool)
+    same_next[:-1] = possession_keys[1:] == possession_keys[:-1]
+    first = np.ones(len(events), dtype=bool)
+    first[1:] = ~same_next[:-1]
+
+    rows = np.flatnonzero(same_next)
+    np.add.at(transitions, (graph_ids[rows], state[rows], state[rows + 1]), 1)
+    last = ~same_next
+    np.add.at(absorbed, (graph_ids[last], state[last]), 1)
+    np.add.at(starts, (graph_ids[first], state[first]), 1)
+    return transitions, absorbed, starts, list(graph_keys), [players.get(g, []) for g in range(n_graphs)]
+
+
+def solve_absorbing_chains(transitions: np.ndarray, absorbed: np.ndarray, starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量求解吸收马尔可夫链（一次np.linalg.solve处理全部图）：
+    Q = 转移计数 / 该球员的总流出次数（含丢失球权），基本矩阵 N = (I - Q)^-1
+    - expected_touches：每个控球段中该球员的期望接球次数 s·N（s为起始分布）
+    - involvement：每个控球段中该球员至少接球一次的概率 (s·N)_j / N_jj
+    - chain_from：由该球员接球开始，到丢失球权前的期望接球次数 N·1
+    - expected_chain_length：每个控球段的期望接球次数 s·N·1
+    """
+    outflow = transitions.sum(axis=2) + absorbed
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = np.where(outflow[:, :, None] > 0, transitions / outflow[:, :, None], 0.0)
+        start_dist = starts / starts.sum(axis=1, keepdims=True)
+    start_dist = np.nan_to_num(start_dist)
+    identity = np.broadcast_to(np.eye(q.shape[1]), q.shape)
+    fundamental = np.linalg.solve(identity - q, identity)
+
+    expected_touches = np.einsum("gi,gij->gj", start_dist, fundamental)
+    diagonal = np.diagonal(fundamental, axis1=1, axis2=2)
+    return {
+        "expected_touches": expected_touches,
+        "involvement": expected_touches / diagonal,
+        "chain_from": fundamental.sum(axis=2),
+        "expected_chain_length": expected_touches.sum(axis=1),
+        "exit_probability": np.where(outflow > 0, absorbed / np.where(outflow > 0, outflow, 1), 0.0)
+    }
+
+
+def possession_markov_model(events: pd.DataFrame) -> Dict:
+    """
+    每场比赛每支球队的控球马尔可夫模型
+    返回 {场次: {球队: {"possessions", "expected_chain_length", "players": {球员: {...}}}}}
+    """
+    transitions, absorbed, starts, graph_keys, graph_players = build_transition_counts(events)
+    solved = solve_absorbing_chains(transitions, absorbed, starts)
+
+    result = {}
+    for g, ((match, team), players) in enumerate(zip(graph_keys, graph_players)):
+        order = np.argsort(-solved["involvement"][g, :len(players)], kind="stable")
+        result.setdefault(match, {})[team] = {
+            "possessions": int(starts[g].sum()),
+            "expected_chain_length": float(solved["expected_chain_length"][g]),
+            "players": {
+                players[i]: {
+                    "involvement": float(solved["involvement"][g, i]),
+                    "expected_touches": float(solved["expected_touches"][g, i]),
+                    "chain_from": float(solved["chain_from"][g, i]),
+                    "exit_probability": float(solved["exit_probability"][g, i])
+                }
+                for i in order
+            }
+        }
+    return result
+
+
+def default_output_path(metrics_output_path: str, suffix: str = "possession_markov") -> str:
+    """与网络指标输出同目录：port24_metrics.json → port24_possession_markov.json"""
+    directory, file_name = os.path.split(metrics_output_path)
+    stem = os.path.splitext(file_name)[0]
+    stem = stem[:-len("_metrics")] if stem.endswith("_metrics") else stem
+    return os.path.join(directory, f"{stem}_{suffix}.json")
+
+
+def analyze_possession_markov(input_dir: str, output_path: str = None, team_name: str = None,
+                              event_store=None, season: str = None) -> Dict:
+    """控球马尔可夫模型：读取清洗后数据（传入event_store时查询事件库） → 批量求解各场各队的吸收链 → 可选保存为JSON"""
+    events = load_possession_events(input_dir, event_store, season)
+    if team_name:
+        events = events[events["所属队伍"] == team_name].reset_index(drop=True)
+        if events.empty:
+            raise ValueError(f"清洗后数据中没有球队{team_name}的接球事件")
+    result = possession_markov_model(events)
+    for match, teams in result.items():
+        for team, model in teams.items():
+            print(f"   - {match} {team}：{model['possessions']}个控球段，"
+                  f"期望链长{model['expected_chain_length']:.2f}次接球")
+    if output_path:
+        write_json_atomic(output_path, result)
+        print(f"   控球马尔可夫模型结果已保存到：{output_path}")
+    return result
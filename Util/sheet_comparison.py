@@ -1,4 +1,6 @@
+import pandas as pd
 from collections import defaultdict
+from DataProcessor import filter_sheet_data, extract_possession_phases
 
 
 def compare_players(base_players, base_player_team, current_players, current_player_team, base_sheet_idx,
@@ -49,4 +51,127 @@ def compare_players(base_players, base_player_team, current_players, current_pla
 
     if not has_diff:
         print("\n两个sheet的球员名单完全一致，无增减差异！")
+    print("=" * 65 + "\n")
+
+
+def build_roster_matrix(filename, useful_test):
+    """
+    一次读取工作簿的全部sheet，构建赛季花名册：
+    - presence：sheet × 球员 的出场矩阵（bool）
+    - team_matrix：sheet × 球员 的所属球队（该sheet内出现次数最多的球队，未出场为NaN）
+    - season_counts：球员 → {球队: 次数} 的赛季累计计数（可直接传给generate_auto_mapping）
+    - sheet_names：sheet索引 → sheet名称
+    """
+    workbook = pd.read_excel(filename, sheet_name=None)
+
+    records = []
+    sheet_names = {}
+    for sheet_idx, (sheet_name, raw_df) in enumerate(workbook.items()):
+        try:
+            phases = extract_possession_phases(filter_sheet_data(raw_df, useful_test))
+        except Exception as e:
+            print(f"   跳过sheet{sheet_idx}（{sheet_name}）：{str(e)}")
+            continue
+        sheet_names[sheet_idx] = sheet_name
+        for phase in phases:
+            records.extend((sheet_idx, player, phase["team"]) for player in phase["players"])
+
+    long_df = pd.DataFrame(records, columns=["sheet", "player", "team"])
+    if long_df.empty:
+        raise ValueError(f"工作簿{filename}中未识别到任何球员")
+
+    # 每个sheet内按出现次数最多的球队归属（次数相同取先出现的球队，与generate_auto_mapping一致）
+    sheet_counts = long_df.groupby(["sheet", "player", "team"], sort=False).size().rename("count").reset_index()
+    top_rows = sheet_counts.loc[sheet_counts.groupby(["sheet", "player"], sort=False)["count"].idxmax()]
+    team_matrix = top_rows.pivot(index="sheet", columns="player", values="team").reindex(
+        index=sorted(sheet_names), columns=sorted(long_df["player"].unique()))
+    presence = team_matrix.notna()
+
+    season_counts = defaultdict(lambda: defaultdict(int))
+    for (player, team), count in long_df.groupby(["player", "team"], sort=False).size().items():
+        season_counts[player][team] = int(count)
+
+    return {
+        "presence": presence,
+        "team_matrix": team_matrix,
+        "season_counts": season_counts,
+        "sheet_names": sheet_names
+    }
+
+
+def compare_all_sheets(roster, base_sheet_idx=None):
+    """
+    基于花名册矩阵一次性对比所有sheet：
+    base_sheet_idx为None时每个sheet与上一个sheet对比，否则全部与基准sheet对比
+    返回 [{sheet, compared_to, added: {球队: [...]}, missing: {球队: [...]}, team_changed: [(球员, 原球队, 现球队)]}]
+    """
+    presence = roster["presence"]
+    team_matrix = roster["team_matrix"]
+    sheets = list(presence.index)
+    if base_sheet_idx is None:
+        pairs = list(zip(sheets[:-1], sheets[1:]))
+    else:
+        if base_sheet_idx not in presence.index:
+            raise ValueError(f"基准sheet{base_sheet_idx}不存在或无有效球员")
+        pairs = [(base_sheet_idx, s) for s in sheets if s != base_sheet_idx]
+    if not pairs:
+        return []
+
+    base_idx = [b for b, _ in pairs]
+    current_idx = [c for _, c in pairs]
+    base_presence = presence.loc[base_idx].to_numpy()
+    current_presence = presence.loc[current_idx].to_numpy()
+    base_team = team_matrix.loc[base_idx].to_numpy()
+    current_team = team_matrix.loc[current_idx].to_numpy()
+
+    # 整体矩阵运算：新增 / 缺失 / 两边都在但球队不同
+    added_mask = current_presence & ~base_presence
+    missing_mask = base_presence & ~current_presence
+    changed_mask = base_presence & current_presence & (base_team != current_team)
+
+    players = presence.columns.to_numpy()
+    results = []
+    for row, (base, current) in enumerate(pairs):
+        added = defaultdict(list)
+        for col in added_mask[row].nonzero()[0]:
+            added[current_team[row, col]].append(players[col])
+        missing = defaultdict(list)
+        for col in missing_mask[row].nonzero()[0]:
+            missing[base_team[row, col]].append(players[col])
+        results.append({
+            "sheet": current,
+            "compared_to": base,
+            "added": dict(added),
+            "missing": dict(missing),
+            "team_changed": [(players[col], base_team[row, col], current_team[row, col])
+                             for col in changed_mask[row].nonzero()[0]]
+        })
+    return results
+
+
+def print_roster_changes(roster, changes):
+    """格式化输出全部sheet的花名册差异"""
+    sheet_names = roster["sheet_names"]
+    player_counts = roster["presence"].sum(axis=1)
+
+    print("\n" + "=" * 65)
+    print(f"赛季球员对比结果（共{len(sheet_names)}个sheet，{roster['presence'].shape[1]}名球员）")
+    print("=" * 65)
+    for change in changes:
+        sheet, base = change["sheet"], change["compared_to"]
+        print(f"\nsheet{sheet}（{sheet_names[sheet]}，{player_counts[sheet]}人） vs "
+              f"sheet{base}（{sheet_names[base]}，{player_counts[base]}人）：")
+        if not change["added"] and not change["missing"] and not change["team_changed"]:
+            print("  球员名单完全一致，无增减差异")
+            continue
+        for team in sorted(set(change["added"]) | set(change["missing"])):
+            missing = sorted(change["missing"].get(team, []))
+            added = sorted(change["added"].get(team, []))
+            print(f"  {team}：")
+            if missing:
+                print(f"    缺失球员：{', '.join(missing)}")
+            if added:
+                print(f"    新增球员：{', '.join(added)}")
+        for player, old_team, new_team in change["team_changed"]:
+            print(f"  球队变更：{player}（{old_team} → {new_team}）")
     print("=" * 65 + "\n")
\ No newline at end of file
@@ -0,0 +1,115 @@
+import numpy as np
+import networkx as nx
+from typing import Dict, List, Tuple
+
+# 与networkx默认参数一致：nx.pagerank(alpha=0.85, max_iter=100, tol=1e-6)；
+# 特征向量中心性沿用compute_graph_metrics中的 nx.eigenvector_centrality(G, max_iter=1000)
+PAGERANK_PARAMS = {"alpha": 0.85, "max_iter": 100, "tol": 1e-6}
+EIGENVECTOR_PARAMS = {"max_iter": 1000, "tol": 1e-6}
+
+
+def pad_adjacency(graphs: List[nx.DiGraph], weight: str = "weight") -> Tuple[np.ndarray, np.ndarray, List[List]]:
+    """
+    多个传球图 → 补齐后的邻接矩阵栈 (图数, K, K) 与节点掩码 (图数, K)，K为最大节点数
+    补齐的节点没有边且掩码为False，不参与各图的归一化与收敛判断
+    返回 (邻接矩阵栈, 节点掩码, 各图节点列表)
+    """
+    size = max((G.number_of_nodes() for G in graphs), default=0)
+    adjacency = np.zeros((len(graphs), size, size))
+    mask = np.zeros((len(graphs), size), dtype=bool)
+    nodelists = []
+    for b, G in enumerate(graphs):
+        nodes = list(G)
+        adjacency[b, :len(nodes), :len(nodes)] = nx.to_numpy_array(G, nodelist=nodes, weight=weight)
+        mask[b, :len(nodes)] = True
+        nodelists.append(nodes)
+    return adjacency, mask, nodelists
+
+
+def _row_times(x: np.ndarray, matrices: np.ndarray) -> np.ndarray:
+    """逐图计算 x_b · M_b（批量矩阵乘法）"""
+    return np.matmul(x[:, None, :], matrices)[:, 0, :]
+
+
+def batched_pagerank(adjacency: np.ndarray, mask: np.ndarray, alpha: float = 0.85, max_iter: int = 100,
+                     tol: float = 1e-6) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    所有图同时做PageRank幂迭代（与nx.pagerank相同：按出强度归一化，悬挂节点均匀分配，L1误差 < n·tol收敛）
+    每个图单独判断收敛，收敛后结果冻结，不再随其他图继续迭代
+    返回 (PageRank (图数, K), 迭代次数, 是否收敛)
+    """
+    n = mask.sum(axis=1)
+    out_strength = adjacency.sum(axis=2)
+    dangling = mask & (out_strength == 0)
+    transition = adjacency / np.where(out_strength > 0, out_strength, 1)[:, :, None]
+    personalization = mask / np.maximum(n, 1)[:, None]
+
+    x = personalization.copy()
+    iterations = np.zeros(len(adjacency), dtype=np.int64)
+    converged = n == 0
+    for iteration in range(1, max_iter + 1):
+        active = ~converged
+        if not active.any():
+            break
+        dangling_sum = (x * dangling).sum(axis=1, keepdims=True)
+        x_new = alpha * (_row_times(x, transition) + dangling_sum * personalization) + (1 - alpha) * personalization
+        error = np.abs(x_new - x).sum(axis=1)
+        x = np.where(active[:, None], x_new, x)
+        iterations[active] = iteration
+        converged |= active & (error < n * tol)
+    return x, iterations, converged
+
+
+def batched_eigenvector(adjacency: np.ndarray, mask: np.ndarray, max_iter: int = 1000,
+                        tol: float = 1e-6) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    所有图同时做特征向量中心性幂迭代（与nx.eigenvector_centrality相同：左特征向量，迭代 A+I，每步L2归一化）
+    adjacency按原值参与计算，需要不加权时传入 (adjacency > 0)
+    返回 (特征向量中心性 (图数, K), 迭代次数, 是否收敛)
+    """
+    n = mask.sum(axis=1)
+    x = mask / np.maximum(n, 1)[:, None]
+    iterations = np.zeros(len(adjacency), dtype=np.int64)
+    converged = n == 0
+    for iteration in range(1, max_iter + 1):
+        active = ~converged
+        if not active.any():
+            break
+        x_new = x + _row_times(x, adjacency)
+        norm = np.sqrt((x_new ** 2).sum(axis=1))
+        x_new /= np.where(norm > 0, norm, 1)[:, None]
+        error = np.abs(x_new - x).sum(axis=1)
+        x = np.where(active[:, None], x_new, x)
+        iterations[active] = iteration
+        converged |= active & (error < n * tol)
+    return x, iterations, converged
+
+
+def batched_spectral_centralities(graphs: List[nx.DiGraph], metrics: List[str] = ("node_pagerank", "node_eigenvector"),
+                                  pagerank_params: Dict = None, eigenvector_params: Dict = None) -> List[Dict]:
+    """
+    多个传球图的PageRank（按传球次数加权）与特征向量中心性（不加权，同compute_graph_metrics）
+    返回与graphs等长的列表：{指标名: {球员: 值}}，某图未收敛时该指标为「计算失败：…」（同compute_graph_metrics）
+    """
+    adjacency, mask, nodelists = pad_adjacency(graphs)
+    solvers = {
+        "node_pagerank": lambda: batched_pagerank(adjacency, mask, **{**PAGERANK_PARAMS, **(pagerank_params or {})}),
+        "node_eigenvector": lambda: batched_eigenvector((adjacency > 0).astype(np.float64), mask,
+                                                        **{**EIGENVECTOR_PARAMS, **(eigenvector_params or {})})
+    }
+    unknown = [m for m in metrics if m not in solvers]
+    if unknown:
+        raise ValueError(f"批量计算只支持{list(solvers)}，不支持：{unknown}")
+
+    results = [{} for _ in graphs]
+    for metric in metrics:
+        values, iterations, converged = solvers[metric]()
+        for b, nodes in enumerate(nodelists):
+            if not nodes:
+                # nx.pagerank对空图返回空字典，nx.eigenvector_centrality抛出异常
+                results[b][metric] = {} if metric == "node_pagerank" else "计算失败：空图无法计算"
+            elif not converged[b]:
+                results[b][metric] = f"计算失败：幂迭代{int(iterations[b])}次未收敛"
+            else:
+                results[b][metric] = dict(zip(nodes, values[b, :len(nodes)].tolist()))
+    return results
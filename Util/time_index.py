@@ -0,0 +1,202 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Dict
+from DataProcessor import assign_possession_ids, possession_spans
+from Util.atomic_io import atomic_output, write_json_atomic
+
+# 索引文件与数据文件同目录：Port24_sheet1.xlsx → Port24_sheet1.tindex.npz
+INDEX_SUFFIX = ".tindex.npz"
+# 索引格式版本：构建方式变化时提升，旧索引文件自动重建（2：控球段起止取控球标识行的时间）
+INDEX_VERSION = 2
+
+
+def _index_path(data_path: str) -> str:
+    return os.path.splitext(data_path)[0] + INDEX_SUFFIX
+
+
+def build_time_index(cleaned_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    由单场清洗后数据（含控球标识行）构建按start排序的时间索引：
+    - pass_*：接球事件（start/end/球员编号/球队编号/控球编号）
+    - poss_*：控球段（起止时间取控球标识行自身的start/end；标识行缺少时间时取段内接球的最早start与最晚end）
+    """
+    events = assign_possession_ids(cleaned_df)
+    events = events[pd.to_numeric(events["start"], errors="coerce").notna()]
+    spans = possession_spans(cleaned_df)
+    return _index_arrays(events, spans)
+
+
+def _index_arrays(events: pd.DataFrame, spans: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """接球事件（start/end/接球球员/所属队伍/控球编号） + 控球段（控球编号/所属队伍/start/end） → 索引数组"""
+    player_ids, players = pd.factorize(events["接球球员"])
+    # 球队编号在接球事件与控球段之间共用（没有接球的控球段也有球队）
+    team_ids, teams = pd.factorize(np.r_[events["所属队伍"].to_numpy(dtype=object),
+                                         spans["所属队伍"].to_numpy(dtype=object)])
+    starts = events["start"].to_numpy(dtype=np.float64)
+    ends = pd.to_numeric(events["end"], errors="coerce").to_numpy(dtype=np.float64)
+    possession = events["控球编号"].to_numpy(dtype=np.int64)
+    order = np.argsort(starts, kind="stable")
+
+    # 控球段：每段的接球数，以及标识行缺少时间时的兜底起止时间
+    receptions = events.assign(end=ends).groupby("控球编号").agg(
+        count=("start", "size"), first=("start", "min"), last=("end", "max")).reindex(spans["控球编号"])
+    poss_start = spans["start"].fillna(pd.Series(receptions["first"].to_numpy(), index=spans.index)).to_numpy()
+    poss_end = spans["end"].fillna(pd.Series(receptions["last"].to_numpy(), index=spans.index)).to_numpy()
+    timed = ~np.isnan(poss_start)  # 既无标识行时间也无接球的控球段无法按时间查询
+    poss_sort = np.flatnonzero(timed)[np.argsort(poss_start[timed], kind="stable")]
+
+    return {
+        "pass_start": starts[order],
+        "pass_end": ends[order],
+        "pass_player": player_ids[order].astype(np.int32),
+        "pass_team": team_ids[:len(events)][order].astype(np.int32),
+        "pass_possession": possession[order],
+        "poss_start": poss_start[poss_sort].astype(np.float64),
+        "poss_end": poss_end[poss_sort].astype(np.float64),
+        "poss_team": team_ids[len(events):][poss_sort].astype(np.int32),
+        "poss_count": receptions["count"].fillna(0).to_numpy()[poss_sort].astype(np.int32),
+        "poss_id": spans["控球编号"].to_numpy(dtype=np.int64)[poss_sort],
+        "players": np.array(players, dtype=str),
+        "teams": np.array(teams, dtype=str)
+    }
+
+
+def load_or_build_time_index(data_path: str) -> Dict[str, np.ndarray]:
+    """读取与数据文件同目录的时间索引；索引不存在、比数据文件旧或版本不同时重新构建并保存"""
+    index_path = _index_path(data_path)
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(data_path):
+        with np.load(index_path, allow_pickle=False) as data:
+            if "version" in data.files and int(data["version"]) == INDEX_VERSION:
+                return {key: data[key] for key in data.files if key != "version"}
+    index = build_time_index(pd.read_excel(data_path))
+    with atomic_output(index_path) as tmp_path:
+        with open(tmp_path, "wb") as f:  # 传入文件对象，np.savez不会给临时文件名追加.npz
+            np.savez(f, version=INDEX_VERSION, **index)
+    return index
+
+
+class TimeIndex:
+    """多场比赛的时间索引集合：按start二分查找区间内的接球事件与控球段"""
+
+    def __init__(self, input_dir: str, event_store=None, season: str = None):
+        """
+        input_dir：清洗后数据目录（每个数据文件旁保存索引文件）
+        传入event_store时改为查询事件库（事件库本身按时间建有索引，时间索引只在内存中构建），场次为match_label
+        """
+        self.matches = {}
+        if event_store is not None:
+            self._load_event_store(event_store, season)
+            return
+        for file_name in sorted(os.listdir(input_dir)):
+            if not file_name.endswith(".xlsx"):
+                continue
+            try:
+                self.matches[os.path.splitext(file_name)[0]] = load_or_build_time_index(
+                    os.path.join(input_dir, file_name))
+            except Exception as e:
+                print(f"   × 构建时间索引失败{file_name}：{str(e)}，已跳过")
+        if not self.matches:
+            raise ValueError(f"在{input_dir}中未找到可建立时间索引的数据")
+
+    def _load_event_store(self, event_store, season: str = None) -> None:
+        from event_store import match_label
+
+        events = event_store.query_events(season=season)
+        events = events[pd.to_numeric(events["start"], errors="coerce").notna()]
+        events = events.assign(**{"控球编号": events["控球编号"].fillna(-1).astype(np.int64)})
+        spans = event_store.possession_spans(season=season)
+        spans_by_match = {key: group for key, group in spans.groupby(["season", "match"], sort=False)}
+        for (match_season, match), group in events.groupby(["season", "match"], sort=False):
+            match_spans = spans_by_match.get((match_season, match))
+            if match_spans is None:
+                # 由CutOutput导入的场次没有控球标识行：控球段起止取段内接球时间
+                match_spans = group.groupby("控球编号", sort=True)["所属队伍"].first().reset_index().assign(
+                    start=np.nan, end=np.nan)
+            self.matches[match_label(match_season, match)] = _index_arrays(group, match_spans.reset_index(drop=True))
+        if not self.matches:
+            raise ValueError(f"事件库中没有赛季{season or '（全部）'}可建立时间索引的数据")
+
+    def query(self, minute_from: float, minute_to: float, matches: List[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        查询 [minute_from, minute_to) 分钟内开始的接球事件与控球段（start单位为秒）
+        返回 {"passes": DataFrame, "possessions": DataFrame}
+        """
+        t0, t1 = minute_from * 60, minute_to * 60
+        passes, possessions = [], []
+        for match in (matches or self.matches):
+            idx = self.matches[match]
+            lo, hi = np.searchsorted(idx["pass_start"], [t0, t1], side="left")
+            passes.append(pd.DataFrame({
+                "场次": match,
+                "start": idx["pass_start"][lo:hi],
+                "end": idx["pass_end"][lo:hi],
+                "接球球员": idx["players"][idx["pass_player"][lo:hi]],
+                "所属队伍": idx["teams"][idx["pass_team"][lo:hi]],
+                "控球编号": idx["pass_possession"][lo:hi]
+            }))
+            lo, hi = np.searchsorted(idx["poss_start"], [t0, t1], side="left")
+            possessions.append(pd.DataFrame({
+                "场次": match,
+                "控球编号": idx["poss_id"][lo:hi],
+                "所属队伍": idx["teams"][idx["poss_team"][lo:hi]],
+                "start": idx["poss_start"][lo:hi],
+                "end": idx["poss_end"][lo:hi],
+                "接球数": idx["poss_count"][lo:hi]
+            }))
+        return {
+            "passes": pd.concat(passes, ignore_index=True),
+            "possessions": pd.concat(possessions, ignore_index=True)
+        }
+
+    def tempo_by_team(self, minute_from: float = None, minute_to: float = None) -> Dict[str, Dict[str, float]]:
+        """
+        各队控球时长与传球节奏（向量化）：
+        控球段数、平均/中位控球时长（秒）、平均每段接球数、每分钟控球内接球数
+        """
+        if minute_from is None and minute_to is None:
+            possessions = pd.concat([
+                pd.DataFrame({
+                    "所属队伍": idx["teams"][idx["poss_team"]],
+                    "start": idx["poss_start"],
+                    "end": idx["poss_end"],
+                    "接球数": idx["poss_count"]
+                }) for idx in self.matches.values()
+            ], ignore_index=True)
+        else:
+            possessions = self.query(minute_from if minute_from is not None else 0,
+                                     minute_to if minute_to is not None else np.inf)["possessions"]
+        possessions["时长"] = possessions["end"] - possessions["start"]
+        grouped = possessions.groupby("所属队伍")
+        minutes = grouped["时长"].sum() / 60
+        stats = pd.DataFrame({
+            "possessions": grouped.size(),
+            "mean_duration": grouped["时长"].mean(),
+            "median_duration": grouped["时长"].median(),
+            "mean_receptions": grouped["接球数"].mean(),
+            # 控球总时长为0（全部单次接球或时间缺失）时记为0，避免inf写入JSON
+            "receptions_per_minute": (grouped["接球数"].sum() / minutes.where(minutes > 0)).fillna(0.0)
+        })
+        # 时间全部缺失的球队均值为NaN，输出为null（JSON不支持NaN）
+        return {team: {k: float(v) if np.isfinite(v) else None for k, v in row.items()}
+                for team, row in stats.iterrows()}
+
+
+def analyze_time_window(input_dir: str, minute_from: float, minute_to: float, output_path: str = None,
+                        event_store=None, season: str = None) -> Dict:
+    """按时间区间统计各队控球时长与传球节奏（全场 + 指定区间），可选保存为JSON；传入event_store时查询事件库"""
+    index = TimeIndex(input_dir, event_store, season)
+    window = index.query(minute_from, minute_to)
+    result = {
+        "window": [minute_from, minute_to],
+        "window_passes": int(len(window["passes"])),
+        "window_possessions": int(len(window["possessions"])),
+        "tempo_full_match": index.tempo_by_team(),
+        "tempo_window": index.tempo_by_team(minute_from, minute_to)
+    }
+    print(f"   - {len(index.matches)}场比赛，{minute_from}~{minute_to}分钟："
+          f"{result['window_passes']}次接球，{result['window_possessions']}个控球段")
+    if output_path:
+        write_json_atomic(output_path, result)
+        print(f"   时间区间统计已保存到：{output_path}")
+    return result
@@ -0,0 +1,72 @@
+import re
+import hashlib
+import zipfile
+import posixpath
+from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+from typing import Dict, List
+
+_XLSX_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships"
+}
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_SHARED_STRINGS = "xl/sharedStrings.xml"
+# 单元格：<c r="A1" t="s"><v>12</v></c> / <c r="A1" t="inlineStr"><is><t>ID</t></is></c> / <c r="A1" s="1"/>
+_CELL = re.compile(rb"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_CELL_REF = re.compile(rb'\br="([A-Z]+\d+)"')
+_CELL_TYPE = re.compile(rb'\bt="(\w+)"')
+_CELL_VALUE = re.compile(rb"<v>(.*?)</v>", re.S)
+_CELL_TEXT = re.compile(rb"<t\b[^>]*>(.*?)</t>", re.S)
+_XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+def _cell_digest(xml: bytes, shared_strings: List[str]) -> str:
+    """按单元格内容（位置 + 值）计算sheet哈希，与字符串存储方式（共享/内联）和样式无关"""
+    digest = hashlib.sha256()
+    for attrs, body in _CELL.findall(xml):
+        if not body:
+            continue
+        ref = _CELL_REF.search(attrs)
+        cell_type = _CELL_TYPE.search(attrs)
+        cell_type = cell_type.group(1) if cell_type else b"n"
+        if cell_type == b"s":
+            value = shared_strings[int(_CELL_VALUE.search(body).group(1))]
+        elif cell_type == b"inlineStr":
+            value = unescape(b"".join(_CELL_TEXT.findall(body)).decode("utf-8"), _XML_ENTITIES)
+        else:
+            value = _CELL_VALUE.search(body)
+            value = unescape(value.group(1).decode("utf-8"), _XML_ENTITIES) if value else ""
+        digest.update(f"{ref.group(1).decode() if ref else ''}\t{value}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def sheet_digests(path: str, known: Dict[str, str] = None) -> List[List[str]]:
+    """
+    不经pandas解析，直接从xlsx压缩包计算每个sheet的内容哈希（按工作簿中的sheet顺序）
+    返回 [[原始键, 内容哈希], ...]：原始键为sheet XML与共享字符串表的CRC，
+    known（上次的 原始键→内容哈希）中已有的sheet不再解析；文件未写完（压缩包不完整）时抛出异常
+    """
+    known = known or {}
+    with zipfile.ZipFile(path) as archive:
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels.findall("rel:Relationship", _XLSX_NS)}
+        members = {info.filename: info for info in archive.infolist()}
+        sst_crc = members[_SHARED_STRINGS].CRC if _SHARED_STRINGS in members else 0
+        shared_strings = None
+        result = []
+        for sheet in workbook.find("main:sheets", _XLSX_NS).findall("main:sheet", _XLSX_NS):
+            target = targets[sheet.get(_REL_ID)]
+            member = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            raw_key = f"{members[member].CRC:08x}-{members[member].file_size}-{sst_crc:08x}"
+            if raw_key not in known:
+                if shared_strings is None:
+                    shared_strings = []
+                    if sst_crc or _SHARED_STRINGS in members:
+                        sst = ElementTree.fromstring(archive.read(_SHARED_STRINGS))
+                        shared_strings = ["".join(t.text or "" for t in si.iter(f"{{{_XLSX_NS['main']}}}t"))
+                                          for si in sst.findall("main:si", _XLSX_NS)]
+                known[raw_key] = _cell_digest(archive.read(member), shared_strings)
+            result.append([raw_key, known[raw_key]])
+    return result
@@ -21,6 +21,13 @@ TEAM_MAPPING = {
     "AUTO_GENERATE": True,
     "MANUAL_PATH": "player_name/team_players_mapping.json",
     "OVERWRITE_AUTO": False,  # 首次生成设True，修改后设False
+    "SEASON_COUNTS": False,  # True时按整个工作簿所有sheet的出现次数生成映射（而非仅当前sheet）
+    # 姓名模糊匹配：映射中找不到的球员code（拼写/变音符号不同）按字符三元组索引匹配到映射球员，达标的改写为映射中的写法
+    "RECONCILE": {
+        "ENABLE": False,
+        "MIN_CONFIDENCE": 0.75,  # 置信度下限（号码+姓名三元组相似度，0~1）
+        "MIN_MARGIN": 0.05  # 与第二候选的最小置信度差，避免相近名字误配
+    },
     "CUSTOM_PLAYERS": {
         # 'Zhejiang': [
         #     '7 - D. Owusu-Sekyere', '36 - Lucas Possignolo'
@@ -40,7 +47,8 @@ DATA_OUTPUT = {
 # 跨sheet对比配置
 DATA_COMPARE = {
     "ENABLE": False,
-    "BASE_SHEET": 0  # 对比的基准sheet索引
+    "MODE": "PAIR",  # PAIR：基准sheet vs 当前sheet；SEASON：一次扫描全部sheet，逐个与上一sheet对比
+    "BASE_SHEET": 0  # 对比的基准sheet索引（PAIR模式）
 }
 
 # ==================== 比赛操作配置（MATCH_OPERATION_ENABLED=True时生效） ====================
@@ -56,7 +64,43 @@ NETWORK_METRICS = {
     "CALCULATE": True,
     "INPUT_PATH": "CutOutput",
     "OUTPUT_PATH": "./NetworkMetrics/port24_metrics.json",
-    "TARGET_METRICS": None
+    "TARGET_METRICS": None,  # None为全部精确指标；可加入node_betweenness_approx/node_closeness_approx/edge_betweenness_approx
+    # 近似中心性（联赛级多队大图使用）：采样枢纽点总数、随机种子、分批数（用于估计标准误）
+    "APPROXIMATE": {
+        "SAMPLE_SIZE": 256,
+        "SEED": 42,
+        "BATCHES": 8
+    },
+    # 逐场逐队的PageRank/特征向量中心性：所有单场传球图补齐为一个邻接矩阵栈，批量幂迭代（结果与networkx一致）
+    "PER_MATCH": {
+        "ENABLE": False,
+        "INPUT_DIR": "./CutOutput",
+        "METRICS": ["node_pagerank", "node_eigenvector"],
+        "OUTPUT_PATH": "./NetworkMetrics/port24_match_centrality.json"
+    },
+    # 指标缓存：按传球图哈希 + 指标名/版本缓存结果，图未变化时直接复用
+    "CACHE": {
+        "ENABLE": False,
+        "PATH": "./NetworkMetrics/metric_cache.db",
+        "MAX_ENTRIES": 2000  # 超出后淘汰最久未访问的条目
+    }
+}
+
+# 接球链挖掘（控球段内A→B→C等组合，基于Data阶段的清洗后数据）
+PASS_CHAINS = {
+    "ENABLE": False,
+    "INPUT_DIR": "./OutputData",
+    "OUTPUT_PATH": "./NetworkMetrics/port24_pass_chains.json",
+    "LENGTHS": [3, 4],  # 统计的链长
+    "TOP_K": 10  # 每支球队/每场比赛输出的链数
+}
+
+# 时间区间查询（基于Data阶段清洗后数据的start/end，索引文件与数据同目录保存）
+TIME_INDEX = {
+    "ENABLE": False,
+    "INPUT_DIR": "./OutputData",
+    "WINDOW_MINUTES": [60, 75],  # 查询区间（分钟，左闭右开）
+    "OUTPUT_PATH": "./NetworkMetrics/port24_tempo.json"
 }
 
 # 传球网络绘制
@@ -74,4 +118,118 @@ NETWORK_PLOT = {
     # 图片保存配置
     "SAVE_IMG": True,
     "TEAM_NAME": "Port24"
-}
\ No newline at end of file
+}
+
+# 单场传球网络动画（随比赛时间演变，逐帧并行渲染）
+NETWORK_ANIMATION = {
+    "ENABLE": False,
+    "INPUT_DIR": "./CutOutput",
+    "TEAM_NAME": "Shanghai Port",
+    "SHEET_IDX": 1,  # 读取 {工作簿}__{TEAM_NAME}_sheet{SHEET_IDX}.xlsx（工作簿取DATA_INPUT.FILENAME）
+    "MODE": "CUMULATIVE",  # CUMULATIVE：开场至当前的累计网络；WINDOW：最近WINDOW_SECONDS秒内的网络
+    "STEP_SECONDS": 60,  # 每帧间隔的比赛时间（秒）
+    "WINDOW_SECONDS": 900,
+    "FORMAT": "GIF",  # GIF（Pillow）/ MP4（需本机ffmpeg）/ FRAMES（只保留逐帧PNG）
+    "FPS": 4,
+    "WORKERS": None,  # 渲染进程数，None为CPU核数
+    "SAVE_DIR": "./PassingNetworkAnimation"
+}
+
+# 球员赛季账本（需开启EVENT_STORE：写入事件时逐场增量更新，报表直接查询账本表）
+PLAYER_LEDGER = {
+    "ENABLE": False,
+    "TEAM_NAME": None,  # None为全部球队
+    "OUTPUT_PATH": "./NetworkMetrics/port24_player_ledger.xlsx"
+}
+
+# ==================== 流水线配置（阶段间内存传递 + 后台写出） ====================
+PIPELINE = {
+    "IN_MEMORY": True,  # 同一次运行中，下游阶段直接使用上游阶段的DataFrame，不再重新读取刚写出的Excel
+    "ASYNC_WRITE": True,  # 中间结果在后台线程写出，磁盘I/O不阻塞主流程（仅IN_MEMORY=True时生效，否则同步写出）
+    "PERSIST": True  # 是否写出OutputData/CutOutput/GameSum（关闭后接球链、时间索引、交付导出等读取目录的步骤看不到本次结果）
+}
+
+# ==================== 监听模式配置（运行 python watch_mode.py，比赛日自动处理新放入的工作簿） ====================
+WATCH = {
+    "INPUT_DIR": "./InputData",  # 监听的原始数据目录
+    "POLL_SECONDS": 1.0,  # 轮询间隔
+    "DEBOUNCE_SECONDS": 2.0,  # 文件大小/修改时间稳定多久后才处理（避免读到未写完的文件）
+    "STATE_PATH": "./WatchState/watch_state.json",  # 已处理工作簿的签名与各sheet哈希
+    "PROCESS_EXISTING": False,  # 启动时是否处理目录中已有的工作簿（False时只记录，变化后才处理）
+    "RENDER": True  # 是否为变化的场次和汇总数据保存网络图
+}
+
+# ==================== 整季批处理配置（运行 python season_runner.py，断点续跑） ====================
+SEASON_RUN = {
+    "WORKBOOKS": ["./InputData/Port24.xlsx"],  # 依次处理的工作簿
+    "SHEETS": None,  # 处理的sheet索引列表，None为全部
+    "CHECKPOINT_PATH": "./Checkpoints/season_run.json",  # 各sheet/阶段的完成状态（原子写出）
+    "MAX_RETRIES": 3,  # 单元失败后的最多执行次数
+    "BACKOFF_SECONDS": 1.0,  # 重试等待：BACKOFF_SECONDS × 2^(第几次失败-1)
+    "FORCE": False  # True时忽略检查点，全部重新运行
+}
+
+# ==================== 实时事件配置（运行 python live_stream.py，比赛中逐条接收事件并在线更新网络指标） ====================
+LIVE = {
+    "SOURCE": "FILE",  # FILE：持续读取追加写入的JSONL文件；SOCKET：本地TCP，每行一个JSON事件
+    "JSONL_PATH": "./LiveData/events.jsonl",  # 每行一个事件：{"start": .., "end": .., "code": .., "text": ..}
+    "HOST": "127.0.0.1",
+    "PORT": 8766,
+    # 球队-球员映射JSON：映射中的球员与批处理结果完全一致；未映射的球员按已出现的控球段在线判定球队，
+    # 比赛初期样本少时误判较多，建议使用赛前已有的映射
+    "MAPPING_PATH": "player_name/team_players_mapping.json",
+    "OUTPUT_PATH": "./NetworkMetrics/live_metrics.json",  # 度/强度/PageRank快照
+    "SNAPSHOT_EVERY": 20  # 每多少条事件写出一次快照
+}
+
+# ==================== 组间网络差异检验（置换检验 + bootstrap置信区间） ====================
+PERMUTATION_TEST = {
+    "ENABLE": False,
+    "INPUT_DIR": "./CutOutput",  # 单场拆分数据
+    "TEAM_NAME": "Shanghai Port",
+    "GROUP_A": [1, 3, 5],  # A组场次（如主场、某球员出场的比赛）：场次号，多个工作簿时用完整标识如"Port24_sheet1"
+    "GROUP_B": None,  # B组场次，None为其余全部场次
+    "METRICS": ["density", "in_degree_centralization", "out_degree_centralization"],
+    "PERMUTATIONS": 5000,
+    "BOOTSTRAP": 2000,
+    "CONFIDENCE": 0.95,
+    "SEED": 42,
+    "WORKERS": None,  # 并行进程数，None为CPU核数
+    "OUTPUT_PATH": "./NetworkMetrics/port24_permutation_test.json"
+}
+
+# ==================== 控球马尔可夫模型（丢失球权为吸收态，批量求解期望参与度与期望链长） ====================
+POSSESSION_MARKOV = {
+    "ENABLE": False,
+    "INPUT_DIR": "./OutputData",  # 数据阶段的清洗后数据（含控球标识行）
+    "TEAM_NAME": None,  # 只建模该球队，None为全部球队
+    "OUTPUT_PATH": None  # None时与网络指标输出同目录（如port24_possession_markov.json）
+}
+
+# ==================== 交付导出配置（流式写出，多表合并到单个工作簿） ====================
+EXPORT = {
+    "ENABLE": False,
+    "MODE": "MATCH",  # MATCH：每场比赛一个工作簿（每队一个工作表）；TEAM：每支球队一个工作簿（每场一个工作表）
+    "TEAM_NAME": None,  # TEAM模式下只导出该球队，None为全部球队
+    "INPUT_DIR": "./CutOutput",
+    "OUTPUT_DIR": "./Deliverables",
+    # 写出引擎：None时优先使用xlsxwriter（可选依赖，pip install xlsxwriter，常量内存、最快），未安装时用openpyxl只写模式
+    "ENGINE": None
+}
+
+# ==================== 事件库配置（SQLite，开启后各阶段改为查询事件库而非扫描目录） ====================
+EVENT_STORE = {
+    "ENABLE": False,
+    "DB_PATH": "./EventStore/events.db",
+    "SEASON": None,  # 赛季标识，None时取数据输入文件名（如Port24）
+    "BATCH_SIZE": 5000  # 每批插入的事件数
+}
+
+# ==================== 查询服务配置（运行 python query_service.py 启动） ====================
+QUERY_SERVICE = {
+    "HOST": "127.0.0.1",  # 仅监听本机
+    "PORT": 8765,
+    "DATA_DIR": "./CutOutput",  # 常驻内存的单场拆分数据
+    "RENDER_DIR": "./ServiceOutput",  # 服务渲染的网络图保存目录
+    "CACHE_SIZE": 128  # LRU缓存的最大查询结果数
+}
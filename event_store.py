@@ -0,0 +1,378 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Iterable, Tuple
+
+import pandas as pd
+
+from Util.file_loader import list_excel_files
+from Util.pass_pairs import POSSESSION_COLUMN, concat_pass_sequences
+from Util.player_ledger import LEDGER_COLUMNS, PAIR_COLUMNS, match_ledger
+
+# 单场拆分文件命名：{工作簿}__{球队}_sheet{索引}.xlsx（各入口统一带工作簿前缀，不同工作簿的同号sheet不会互相覆盖）；
+# 旧版只有{球队}_sheet{索引}.xlsx，仍可读取
+WORKBOOK_SEPARATOR = "__"
+MATCH_FILE_PATTERN = re.compile(r"^(?:(?P<workbook>.+?)__)?(?P<team>.+)_sheet(?P<match>\d+)\.xlsx$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    season TEXT NOT NULL,
+    match TEXT NOT NULL,
+    team TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    possession INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_events_season_match_team ON events(season, match, team, seq);
+CREATE INDEX IF NOT EXISTS idx_events_player ON events(player);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events(season, match, start);
+CREATE TABLE IF NOT EXISTS ledger_players (
+    season TEXT NOT NULL,
+    match TEXT NOT NULL,
+    team TEXT NOT NULL,
+    player TEXT NOT NULL,
+    touches INTEGER NOT NULL,
+    passes_in INTEGER NOT NULL,
+    passes_out INTEGER NOT NULL,
+    minutes REAL NOT NULL,
+    PRIMARY KEY (season, match, team, player)
+);
+CREATE TABLE IF NOT EXISTS ledger_pairs (
+    season TEXT NOT NULL,
+    match TEXT NOT NULL,
+    team TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    weight INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_pairs ON ledger_pairs(season, match, team);
+CREATE TABLE IF NOT EXISTS possessions (
+    season TEXT NOT NULL,
+    match TEXT NOT NULL,
+    possession INTEGER NOT NULL,
+    team TEXT,
+    start REAL,
+    end REAL,
+    PRIMARY KEY (season, match, possession)
+);
+"""
+
+# 球员赛季账本：单场账本行求和；传球对象数按传球对去重（不同场次的同一对象只计一次）；
+# 传球参与率 = (接到传球 + 传出) / 球队传球总数
+_LEDGER_QUERY = """
+WITH lp AS (SELECT * FROM ledger_players{where}),
+     lq AS (SELECT * FROM ledger_pairs{where}),
+     partners AS (
+         SELECT team, player, COUNT(DISTINCT partner) AS partners FROM (
+             SELECT team, source AS player, target AS partner FROM lq
+             UNION ALL
+             SELECT team, target AS player, source AS partner FROM lq
+         ) GROUP BY team, player
+     ),
+     totals AS (SELECT team, SUM(weight) AS team_passes FROM lq GROUP BY team)
+SELECT lp.team AS 所属队伍, lp.player AS 球员, COUNT(*) AS 场次数, SUM(lp.touches) AS 接球次数,
+       SUM(lp.passes_in) AS 接到传球, SUM(lp.passes_out) AS 传出, COALESCE(MAX(partners.partners), 0) AS 传球对象数,
+       COALESCE((SUM(lp.passes_in) + SUM(lp.passes_out)) * 1.0 / MAX(totals.team_passes), 0.0) AS 传球参与率,
+       SUM(lp.minutes) AS 参与分钟
+FROM lp
+LEFT JOIN partners ON partners.team = lp.team AND partners.player = lp.player
+LEFT JOIN totals ON totals.team = lp.team
+GROUP BY lp.team, lp.player
+ORDER BY lp.team, 接球次数 DESC, lp.player
+"""
+
+
+def cut_file_name(team: str, sheet_idx, workbook: str = None) -> str:
+    """单场拆分文件名，workbook为工作簿名（不含扩展名），不同工作簿的同号sheet不会互相覆盖"""
+    prefix = f"{workbook}{WORKBOOK_SEPARATOR}" if workbook else ""
+    return f"{prefix}{team}_sheet{sheet_idx}.xlsx"
+
+
+def match_label(workbook, match) -> str:
+    """
+    场次标识：{工作簿}_sheet{场次}（不同工作簿的同号sheet是不同比赛，按 (工作簿, 球队, 场次) 区分）；
+    没有工作簿的旧命名文件只有场次号。事件库中以赛季作为工作簿
+    """
+    return f"{workbook}_sheet{match}" if workbook else str(match)
+
+
+def match_sort_key(label) -> Tuple[str, int]:
+    """场次标识的排序键：先按工作簿，再按场次号（数值）"""
+    workbook, _, match = str(label).rpartition("_sheet")
+    return workbook, int(match) if match.isdigit() else -1
+
+
+def resolve_matches(requested: Iterable, available: List[str]) -> List[str]:
+    """
+    把请求的场次解析为available中的场次标识（按available的顺序返回）：
+    可以是完整标识（如Port24_sheet1），也可以是场次号（如1，只在一个工作簿中存在时）
+    不存在的场次抛出KeyError，场次号对应多个工作簿时抛出ValueError
+    """
+    selected, missing = set(), []
+    for item in requested:
+        item = str(item).strip()
+        if item in available:
+            candidates = [item]
+        elif item.isdigit():
+            candidates = [label for label in available if match_sort_key(label)[1] == int(item)]
+        else:
+            candidates = []
+        if len(candidates) > 1:
+            raise ValueError(f"场次{item}在多个工作簿中存在，请使用完整标识：{', '.join(candidates)}")
+        if not candidates:
+            missing.append(item)
+        selected.update(candidates)
+    if missing:
+        raise KeyError(f"不存在场次：{', '.join(missing)}")
+    return [label for label in available if label in selected]
+
+
+def dedupe_cut_files(file_names: Iterable[str]) -> List[str]:
+    """
+    去掉与带工作簿前缀文件重复的旧命名拆分文件（旧版main.py写出的{球队}_sheet{索引}.xlsx与整季批处理/监听模式
+    写出的同一场比赛重复，汇总和指标会重复计数）；其他文件按原顺序保留
+    """
+    file_names = list(file_names)
+    parsed = {name: MATCH_FILE_PATTERN.match(name) for name in file_names}
+    prefixed = {(m.group("team"), m.group("match")) for m in parsed.values() if m and m.group("workbook")}
+    kept, dropped = [], []
+    for name in file_names:
+        m = parsed[name]
+        if m and not m.group("workbook") and (m.group("team"), m.group("match")) in prefixed:
+            dropped.append(name)
+        else:
+            kept.append(name)
+    if dropped:
+        print(f"   提示：{len(dropped)}个旧命名拆分文件与带工作簿前缀的文件重复，已忽略（可删除）：{', '.join(dropped)}")
+    return kept
+
+
+def season_from_filename(filename: str) -> str:
+    """由原始数据文件名得到赛季标识（如 ./InputData/Port24.xlsx → Port24）"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+class EventStore:
+    """
+    嵌入式SQLite事件库：保存清洗后的接球事件（按赛季/场次/球队索引）
+    下游阶段通过查询获取数据，无需扫描目录、按文件名匹配
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 5000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            # 旧版事件库没有控球编号列：补列，旧事件的控球编号为NULL（整场视为一个控球段）
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+            if "possession" not in columns:
+                self._conn.execute("ALTER TABLE events ADD COLUMN possession INTEGER")
+            # 旧版事件库没有球员账本：由已有事件补建
+            backfill = self._conn.execute("SELECT EXISTS (SELECT 1 FROM events)").fetchone()[0] and \
+                not self._conn.execute("SELECT EXISTS (SELECT 1 FROM ledger_players)").fetchone()[0]
+        if backfill:
+            self.rebuild_ledger()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ==================== 写入 ====================
+    def ingest_team_events(self, season: str, match, team_frames: Dict[str, pd.DataFrame],
+                           possessions: pd.DataFrame = None) -> int:
+        """
+        写入一场比赛各球队的接球事件（同一场次重复写入时先删除旧记录）
+        team_frames：球队 → 含 start/end/接球球员（可选控球编号）列的DataFrame
+        possessions：本场控球段（控球编号/所属队伍/start/end，见DataProcessor.possession_spans），时间索引使用
+        球员账本在同一事务中按本场事件增量更新，其他场次的账本行不变
+        """
+        match = str(match)
+        rows = []
+        for team, df in team_frames.items():
+            players = df["接球球员"].astype(str).str.strip().tolist()
+            starts = pd.to_numeric(df["start"], errors="coerce").tolist()
+            ends = pd.to_numeric(df["end"], errors="coerce").tolist()
+            possession_ids = (pd.to_numeric(df[POSSESSION_COLUMN], errors="coerce").tolist()
+                              if POSSESSION_COLUMN in df.columns else [None] * len(df))
+            for seq, (player, start, end, possession) in enumerate(zip(players, starts, ends, possession_ids)):
+                rows.append((season, match, team, seq, player,
+                             None if pd.isna(start) else start, None if pd.isna(end) else end,
+                             None if pd.isna(possession) else int(possession)))
+
+        events = pd.DataFrame(rows, columns=["season", "match", "team", "seq", "player", "start", "end", "possession"])
+        with self._lock:
+            with self._conn:  # 单个事务：删除旧记录 + 批量插入
+                self._conn.execute("DELETE FROM events WHERE season = ? AND match = ?", (season, match))
+                for batch_start in range(0, len(rows), self.batch_size):
+                    self._conn.executemany(
+                        "INSERT INTO events (season, match, team, seq, player, start, end, possession) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows[batch_start:batch_start + self.batch_size]
+                    )
+                self._write_ledger(season, match, events)
+                self._conn.execute("DELETE FROM possessions WHERE season = ? AND match = ?", (season, match))
+                if possessions is not None:
+                    self._conn.executemany(
+                        "INSERT INTO possessions (season, match, possession, team, start, end) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(season, match, int(possession), team, None if pd.isna(start) else float(start),
+                          None if pd.isna(end) else float(end))
+                         for possession, team, start, end in possessions[
+                             [POSSESSION_COLUMN, "所属队伍", "start", "end"]].itertuples(index=False)])
+        return len(rows)
+
+    def _write_ledger(self, season: str, match: str, events: pd.DataFrame) -> None:
+        """替换一场比赛的球员账本与传球对（调用方持有锁并处于事务中）"""
+        ledger, pairs = match_ledger(events)
+        self._conn.execute("DELETE FROM ledger_players WHERE season = ? AND match = ?", (season, match))
+        self._conn.execute("DELETE FROM ledger_pairs WHERE season = ? AND match = ?", (season, match))
+        self._conn.executemany(
+            f"INSERT INTO ledger_players (season, match, {', '.join(LEDGER_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(season, match, *row) for row in ledger.itertuples(index=False)])
+        self._conn.executemany(
+            f"INSERT INTO ledger_pairs (season, match, {', '.join(PAIR_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            [(season, match, *row) for row in pairs.itertuples(index=False)])
+
+    def rebuild_ledger(self, season=None) -> int:
+        """由事件表重建球员账本（旧版事件库升级时使用），返回重建的场次数"""
+        where, params = self._where(season=season)
+        with self._lock:
+            events = pd.read_sql_query(
+                f"SELECT season, match, team, seq, player, start, possession FROM events{where} "
+                "ORDER BY season, match, team, seq", self._conn, params=params)
+            with self._conn:
+                for (match_season, match), group in events.groupby(["season", "match"], sort=False):
+                    self._write_ledger(match_season, match, group)
+        count = events.groupby(["season", "match"]).ngroups
+        print(f"球员账本已重建：{count}场比赛")
+        return count
+
+    def ingest_cut_output_dir(self, input_dir: str, season: str) -> int:
+        """
+        把已有的CutOutput拆分文件一次性导入事件库，返回导入的事件数
+        带工作簿前缀的文件以工作簿作为赛季（不同工作簿的同号场次分开导入），旧命名文件归入season
+        """
+        by_match = {}
+        for file_name in list_excel_files(input_dir):
+            match = MATCH_FILE_PATTERN.match(file_name)
+            if not match:
+                continue
+            try:
+                df = pd.read_excel(os.path.join(input_dir, file_name))
+            except Exception as e:
+                print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+                continue
+            if "接球球员" not in df.columns:
+                print(f"   × 跳过无效文件{file_name}：缺少'接球球员'列")
+                continue
+            key = (match.group("workbook") or season, match.group("match"))
+            by_match.setdefault(key, {})[match.group("team")] = df
+
+        total = 0
+        for (match_season, match_id), team_frames in by_match.items():
+            total += self.ingest_team_events(match_season, match_id, team_frames)
+        print(f"事件库导入完成：{len(by_match)}场比赛，共{total}条事件 → {self.db_path}")
+        return total
+
+    # ==================== 查询 ====================
+    @staticmethod
+    def _where(season=None, match=None, team=None, player=None, start_min=None, start_max=None) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, value in (("season", season), ("team", team), ("player", player)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if match is not None:
+            matches = [str(m) for m in match] if isinstance(match, (list, tuple, set)) else [str(match)]
+            clauses.append(f"match IN ({', '.join('?' * len(matches))})")
+            params.extend(matches)
+        if start_min is not None:
+            clauses.append("start >= ?")
+            params.append(start_min)
+        if start_max is not None:
+            clauses.append("start <= ?")
+            params.append(start_max)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_events(self, season=None, match=None, team=None, player=None,
+                     start_min=None, start_max=None) -> pd.DataFrame:
+        """
+        按条件查询接球事件，返回与CutOutput相同列名的DataFrame（附带season/match）
+        match 可以是单个场次或场次列表
+        """
+        where, params = self._where(season, match, team, player, start_min, start_max)
+        sql = (f"SELECT season, match, start, end, player AS 接球球员, team AS 所属队伍, possession AS {POSSESSION_COLUMN} "
+               "FROM events"
+               f"{where} ORDER BY season, CAST(match AS INTEGER), match, team, seq")
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def pass_sequence(self, season=None, match=None, team=None, with_possessions: bool = False):
+        """
+        按场次顺序拼接的接球球员序列（与逐文件读取后extend的结果一致）
+        with_possessions=True时返回 (接球球员序列, 控球段键)，不同场次/球队的控球段互不相连
+        """
+        if with_possessions:
+            return concat_pass_sequences(df for _, df in self.iter_match_frames(season=season, match=match, team=team))
+        return self.query_events(season=season, match=match, team=team)["接球球员"].tolist()
+
+    def list_matches(self, season=None, team=None) -> List[Tuple[str, str, str]]:
+        """列出 (赛季, 场次, 球队) 组合"""
+        where, params = self._where(season=season, team=team)
+        sql = (f"SELECT DISTINCT season, match, team FROM events{where} "
+               "ORDER BY season, CAST(match AS INTEGER), match, team")
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def player_ledger(self, season=None, match=None, team=None, player=None) -> pd.DataFrame:
+        """
+        球员赛季账本（直接查询账本表，不读取事件、不构建传球图）：
+        所属队伍/球员/场次数/接球次数/接到传球/传出/传球对象数/传球参与率/参与分钟
+        match 可以是单个场次或场次列表（如截至某轮的场次）
+        """
+        where, params = self._where(season, match, team)
+        sql = _LEDGER_QUERY.format(where=where)
+        with self._lock:
+            ledger = pd.read_sql_query(sql, self._conn, params=params * 2)
+        if player is not None:
+            ledger = ledger[ledger["球员"] == player].reset_index(drop=True)
+        return ledger
+
+    def possession_spans(self, season=None, match=None) -> pd.DataFrame:
+        """
+        控球段起止时间（控球标识行的start/end），列：season/match/控球编号/所属队伍/start/end
+        由CutOutput导入的场次没有控球标识行，不返回记录（时间索引改用段内接球时间）
+        """
+        where, params = self._where(season=season, match=match)
+        sql = (f"SELECT season, match, possession AS {POSSESSION_COLUMN}, team AS 所属队伍, start, end "
+               f"FROM possessions{where} ORDER BY season, CAST(match AS INTEGER), match, possession")
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def iter_match_frames(self, season=None, match=None, team=None) -> Iterable[Tuple[Tuple[str, str, str], pd.DataFrame]]:
+        """按 (赛季, 场次, 球队) 分组返回事件，替代逐个读取拆分文件"""
+        df = self.query_events(season=season, match=match, team=team)
+        for key, group in df.groupby(["season", "match", "所属队伍"], sort=False):
+            yield key, group.drop(columns=["season", "match"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import config
+
+    # 将已有的CutOutput拆分文件导入事件库
+    store = EventStore(config.EVENT_STORE["DB_PATH"], config.EVENT_STORE["BATCH_SIZE"])
+    store.ingest_cut_output_dir(
+        config.DATA_OUTPUT["CUT_DIR"],
+        config.EVENT_STORE["SEASON"] or season_from_filename(config.DATA_INPUT["FILENAME"])
+    )
+    store.close()
@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import threading
+import socketserver
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+import config
+from DataProcessor import classify_codes
+from Util.atomic_io import write_json_atomic
+
+
+class IncrementalPassGraph:
+    """
+    单支球队的在线传球图：邻接矩阵按需扩容，逐边更新度/强度，
+    PageRank以上一次结果为初值继续迭代（与nx.pagerank相同的阻尼、悬挂节点处理和收敛判据）
+    """
+
+    def __init__(self, alpha: float = 0.85, tol: float = 1e-6, max_iter: int = 100, capacity: int = 32):
+        self.alpha = alpha
+        self.tol = tol
+        self.max_iter = max_iter
+        self.nodes: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._weights = np.zeros((capacity, capacity))
+        self._in_degree = np.zeros(capacity, dtype=np.int64)
+        self._out_degree = np.zeros(capacity, dtype=np.int64)
+        self._in_strength = np.zeros(capacity)
+        self._out_strength = np.zeros(capacity)
+        self._pagerank = np.zeros(0)
+        self.edges = 0
+        self.receptions = 0
+        self.last_player = None
+        self.last_iterations = 0
+
+    def _node(self, name: str) -> int:
+        idx = self._index.get(name)
+        if idx is not None:
+            return idx
+        idx = len(self.nodes)
+        if idx == len(self._in_degree):
+            # 容量翻倍
+            size = 2 * idx
+            weights = np.zeros((size, size))
+            weights[:idx, :idx] = self._weights
+            self._weights = weights
+            for attr in ("_in_degree", "_out_degree", "_in_strength", "_out_strength"):
+                old = getattr(self, attr)
+                new = np.zeros(size, dtype=old.dtype)
+                new[:idx] = old
+                setattr(self, attr, new)
+        self._index[name] = idx
+        self.nodes.append(name)
+        return idx
+
+    def add_reception(self, player: str) -> bool:
+        """追加一次接球：与同一控球段内的上一次接球之间连边（同一球员连续接球不连边），返回是否更新了图"""
+        previous, self.last_player = self.last_player, player
+        self.receptions += 1
+        if previous is None or previous == player:
+            return False
+        self.add_edge(previous, player)
+        return True
+
+    def add_edge(self, source: str, target: str, weight: float = 1) -> None:
+        u, v = self._node(source), self._node(target)
+        if self._weights[u, v] == 0:
+            self._out_degree[u] += 1
+            self._in_degree[v] += 1
+            self.edges += 1
+        self._weights[u, v] += weight
+        self._out_strength[u] += weight
+        self._in_strength[v] += weight
+        self._update_pagerank()
+
+    def _update_pagerank(self) -> None:
+        n = len(self.nodes)
+        x = np.full(n, 1.0 / n)
+        known = len(self._pagerank)
+        if known:
+            # 热启动：已有节点沿用上次结果，新节点取1/n，再归一化
+            x[:known] = self._pagerank
+            x /= x.sum()
+        weights = self._weights[:n, :n]
+        out_strength = self._out_strength[:n]
+        dangling = out_strength == 0
+        inv_out = np.divide(1.0, out_strength, out=np.zeros(n), where=~dangling)
+
+        for iteration in range(1, self.max_iter + 1):
+            x_last = x
+            x = self.alpha * ((x_last * inv_out) @ weights) + \
+                (self.alpha * x_last[dangling].sum() + 1 - self.alpha) / n
+            if np.abs(x - x_last).sum() < n * self.tol:
+                break
+        self._pagerank = x
+        self.last_iterations = iteration
+
+    def metrics(self) -> Dict:
+        n = len(self.nodes)
+        in_degree, out_degree = self._in_degree[:n], self._out_degree[:n]
+        in_strength, out_strength = self._in_strength[:n], self._out_strength[:n]
+
+        def by_node(values):
+            return {name: value.item() for name, value in zip(self.nodes, values)}
+
+        return {
+            "network_nodes_count": n,
+            "network_edges_count": self.edges,
+            "receptions": self.receptions,
+            "node_degree": by_node(in_degree + out_degree),
+            "node_in_degree": by_node(in_degree),
+            "node_out_degree": by_node(out_degree),
+            "node_strength": by_node(in_strength + out_strength),
+            "node_in_strength": by_node(in_strength),
+            "node_out_strength": by_node(out_strength),
+            "node_pagerank": by_node(self._pagerank) if len(self._pagerank) == n else {},
+            "pagerank_iterations": self.last_iterations
+        }
+
+
+class LivePassNetwork:
+    """
+    实时比赛事件流：逐条接收事件（start/end/code/text），按 extract_possession_phases + clean_data 的规则在线切分控球段，
+    控球段内有效球员（所属球队 = 控球球队）达到2人后，该段接球逐条加入对应球队的传球图
+
+    与批处理的对应关系：
+    - 只保留text属于useful_test的事件；开场第二个控球标识到达前的事件先缓存，
+      再按filter_sheet_data的规则（以第二个控球标识的球队作为开场控球段）回放
+    - 球员所属球队：team_players中有的按其映射，其余按到目前为止在各队控球段中出现次数最多的球队（在线版generate_auto_mapping），
+      提供完整映射时结果与批处理完全一致
+    - 连续相同球员合并（merge_consecutive_players）对传球图等价于不连自环
+    """
+
+    def __init__(self, team_players: Dict[str, List[str]] = None,
+                 useful_test: Iterable[str] = ("Successful passes", "Possessions"),
+                 alpha: float = 0.85, tol: float = 1e-6, max_iter: int = 100):
+        self.useful_test = set(useful_test)
+        self.fixed_player_team = {p.strip(): team for team, players in (team_players or {}).items() for p in players}
+        self.player_team_counts = defaultdict(lambda: defaultdict(int))
+        self.graphs: Dict[str, IncrementalPassGraph] = {}
+        self._graph_params = {"alpha": alpha, "tol": tol, "max_iter": max_iter}
+        self._code_cache = {}
+        self._opening = []  # 第二个控球标识到达前的事件
+        self._marker_count = 0
+        self._phase = None  # 当前控球段：{"team", "valid"（已确认前缓存的有效球员）, "confirmed"}
+        self.events = 0
+        self.possessions = 0
+        self.kept_possessions = 0
+        self.elapsed = 0.0
+
+    def _code_info(self, code) -> Dict:
+        info = self._code_cache.get(code)
+        if info is None:
+            flags = classify_codes(pd.Index([code])).iloc[0]
+            info = {
+                "is_possession": bool(flags["is_possession"]),
+                "is_player": bool(flags["is_player"]),
+                "team": flags["possession_team"],
+                "player": flags["stripped"]
+            }
+            self._code_cache[code] = info
+        return info
+
+    def _player_team(self, player: str):
+        team = self.fixed_player_team.get(player)
+        if team is None and player in self.player_team_counts:
+            # 与generate_auto_mapping相同：出现次数最多的球队（并列时取最先出现的）
+            team = max(self.player_team_counts[player].items(), key=lambda x: x[1])[0]
+        return team
+
+    def _graph(self, team: str) -> IncrementalPassGraph:
+        if team not in self.graphs:
+            self.graphs[team] = IncrementalPassGraph(**self._graph_params)
+        return self.graphs[team]
+
+    def _open_phase(self, team: str) -> None:
+        self._phase = {"team": team, "valid": [], "confirmed": False}
+        self.possessions += 1
+
+    def _process(self, code) -> List[Dict]:
+        info = self._code_info(code)
+        if info["is_possession"]:
+            self._open_phase(info["team"])
+            return []
+        if not info["is_player"] or self._phase is None:
+            return []
+
+        phase, player = self._phase, info["player"]
+        self.player_team_counts[player][phase["team"]] += 1
+        if self._player_team(player) != phase["team"]:
+            return []
+        if phase["confirmed"]:
+            players = [player]
+        else:
+            phase["valid"].append(player)
+            if len(phase["valid"]) < 2:
+                return []
+            # 控球段达到2名有效球员：保留该段，缓存的接球一并加入传球图
+            phase["confirmed"] = True
+            self.kept_possessions += 1
+            players, phase["valid"] = phase["valid"], []
+            # 新控球段的第一次接球不与该队上一控球段的最后一次接球连边
+            self._graph(phase["team"]).last_player = None
+
+        graph = self._graph(phase["team"])
+        updates = []
+        for p in players:
+            source = graph.last_player
+            if graph.add_reception(p):
+                updates.append({"team": phase["team"], "source": source, "target": p,
+                                "pagerank_iterations": graph.last_iterations})
+        return updates
+
+    def push(self, event: Dict) -> List[Dict]:
+        """
+        处理一条事件（含code/text字段，可选start/end），返回本次新增的传球边
+        [{"team", "source", "target", "pagerank_iterations"}]
+        """
+        begin = time.perf_counter()
+        self.events += 1
+        text = str(event.get("text"))
+        if text not in self.useful_test:
+            return []
+        code = event.get("code")
+        updates = []
+        if self._marker_count < 2:
+            self._opening.append(code)
+            if text == "Possessions":
+                self._marker_count += 1
+                if self._marker_count == 2:
+                    # 开场控球段取第二个控球标识的球队（同filter_sheet_data）
+                    updates += self._process(code)
+                    for opening_code in self._opening:
+                        updates += self._process(opening_code)
+                    self._opening = []
+        else:
+            updates = self._process(code)
+        self.elapsed += time.perf_counter() - begin
+        return updates
+
+    def flush(self) -> List[Dict]:
+        """事件流结束：不足两个控球标识时按原顺序处理缓存事件（批处理此时不插入开场控球段）"""
+        updates = []
+        opening, self._opening = self._opening, []
+        self._marker_count = 2
+        for code in opening:
+            updates += self._process(code)
+        return updates
+
+    def snapshot(self) -> Dict:
+        return {
+            "events": self.events,
+            "possessions": self.possessions,
+            "kept_possessions": self.kept_possessions,
+            "mean_event_ms": 1000 * self.elapsed / self.events if self.events else 0.0,
+            "teams": {team: graph.metrics() for team, graph in self.graphs.items()}
+        }
+
+
+def follow_jsonl(path: str, poll_seconds: float = 0.2, from_start: bool = True,
+                 idle_timeout: float = None) -> Iterator[Dict]:
+    """
+    逐行读取不断追加的JSONL文件（类似tail -f），未写完的行等待换行后再解析
+    idle_timeout：超过该秒数没有新数据时结束（None为一直等待）
+    """
+    while not os.path.exists(path):
+        time.sleep(poll_seconds)
+    with open(path, "r", encoding="utf-8") as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        buffer, last_data = "", time.monotonic()
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                if idle_timeout is not None and time.monotonic() - last_data > idle_timeout:
+                    return
+                time.sleep(poll_seconds)
+                continue
+            last_data = time.monotonic()
+            buffer += chunk
+            if not buffer.endswith("\n"):
+                continue
+            line, buffer = buffer.strip(), ""
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"   × 无法解析的事件行：{line[:80]}（{str(e)}），已跳过")
+
+
+def save_snapshot(network: LivePassNetwork, output_path: str) -> None:
+    """原子写出当前指标快照（先写临时文件再替换）"""
+    write_json_atomic(output_path, network.snapshot())
+
+
+def run_live(network: LivePassNetwork, events: Iterable[Dict], output_path: str = None,
+             snapshot_every: int = 20) -> Dict:
+    """消费事件流，每snapshot_every条事件及结束时写出指标快照"""
+    try:
+        for event in events:
+            for update in network.push(event):
+                print(f"   {update['team']}：{update['source']} → {update['target']}"
+                      f"（PageRank迭代{update['pagerank_iterations']}次）")
+            if output_path and network.events % snapshot_every == 0:
+                save_snapshot(network, output_path)
+    except KeyboardInterrupt:
+        print("实时接收已停止")
+    network.flush()
+    if output_path:
+        save_snapshot(network, output_path)
+        print(f"实时指标已保存到：{output_path}")
+    print(f"共处理{network.events}条事件，平均每条{network.snapshot()['mean_event_ms']:.3f}毫秒")
+    return network.snapshot()
+
+
+def serve_socket(network: LivePassNetwork, host: str = "127.0.0.1", port: int = 8766,
+                 output_path: str = None, snapshot_every: int = 20) -> None:
+    """本地TCP服务：每行一个JSON事件，每条事件回复一行JSON（本次新增的传球边）；阻塞运行，Ctrl+C退出"""
+    lock = threading.Lock()
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8").strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.wfile.write((json.dumps({"error": str(e)}, ensure_ascii=False) + "\n").encode("utf-8"))
+                    continue
+                with lock:
+                    updates = network.push(event)
+                    if output_path and network.events % snapshot_every == 0:
+                        save_snapshot(network, output_path)
+                self.wfile.write((json.dumps(updates, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    server = socketserver.ThreadingTCPServer((host, port), _Handler)
+    server.daemon_threads = True
+    print(f"实时事件接收已启动：{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("实时接收已停止")
+    finally:
+        server.server_close()
+        with lock:
+            network.flush()
+            if output_path:
+                save_snapshot(network, output_path)
+
+
+if __name__ == "__main__":
+    team_players = dict(config.TEAM_MAPPING["CUSTOM_PLAYERS"])
+    if config.LIVE["MAPPING_PATH"] and os.path.exists(config.LIVE["MAPPING_PATH"]):
+        with open(config.LIVE["MAPPING_PATH"], "r", encoding="utf-8") as f:
+            team_players.update(json.load(f))
+    live_network = LivePassNetwork(team_players, config.DATA_INPUT["USEFUL_TEST"])
+    if config.LIVE["SOURCE"] == "SOCKET":
+        serve_socket(live_network, config.LIVE["HOST"], config.LIVE["PORT"],
+                     config.LIVE["OUTPUT_PATH"], config.LIVE["SNAPSHOT_EVERY"])
+    else:
+        print(f"正在读取实时事件文件：{config.LIVE['JSONL_PATH']}")
+        run_live(live_network, follow_jsonl(config.LIVE["JSONL_PATH"]),
+                 config.LIVE["OUTPUT_PATH"], config.LIVE["SNAPSHOT_EVERY"])
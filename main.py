@@ -3,15 +3,38 @@ from DataProcessor import (
     get_sheet_player_info, clean_data, generate_auto_mapping,
     save_team_players_mapping, load_team_players_mapping
 )
-from Util.sheet_comparison import compare_players
+from Util.sheet_comparison import compare_players, build_roster_matrix, compare_all_sheets, print_roster_changes
 from Util.pass_summary import summarize_team_pass_players, summarize_combined_matches
 from Util.draw_pass_network import draw_single_pass_network, draw_combined_pass_network
+from Util.background_writer import BackgroundWriter
+from Util.file_loader import list_excel_files
+from event_store import EventStore, MATCH_FILE_PATTERN, season_from_filename, cut_file_name
 import os
 import json
 import config
 
 if __name__ == "__main__":
     final_team_players = {}
+    # 拆分文件名的工作簿前缀，与整季批处理/监听模式一致（同一场比赛只有一个拆分文件）
+    workbook = season_from_filename(config.DATA_INPUT["FILENAME"])
+
+    # 事件库（开启后各阶段从事件库查询，不再扫描目录）
+    event_store = None
+    season = None
+    if config.EVENT_STORE["ENABLE"]:
+        event_store = EventStore(config.EVENT_STORE["DB_PATH"], config.EVENT_STORE["BATCH_SIZE"])
+        season = config.EVENT_STORE["SEASON"] or season_from_filename(config.DATA_INPUT["FILENAME"])
+        print(f"事件库已开启：{config.EVENT_STORE['DB_PATH']}（赛季{season}）")
+
+    # 阶段间内存传递：{目录绝对路径: {文件名: DataFrame}}；中间结果由后台线程写出
+    in_memory = config.PIPELINE["IN_MEMORY"]
+    persist = config.PIPELINE["PERSIST"]
+    stage_frames = {}
+    if not in_memory and not persist:
+        print("流水线配置无效：IN_MEMORY与PERSIST不能同时关闭（下游阶段既没有内存数据，也读不到文件）")
+        exit(1)
+    # 不在内存传递时，下游阶段读取上游刚写出的文件，必须同步写出（后台写出可能尚未落盘）
+    writer = BackgroundWriter() if persist and in_memory and config.PIPELINE["ASYNC_WRITE"] else None
 
     # ==================== 数据操作阶段 ====================
     if config.DATA_OPERATION_ENABLED:
@@ -27,7 +50,15 @@ if __name__ == "__main__":
             f"1. 原始sheet{config.DATA_INPUT['CURRENT_SHEET']}数据筛选后共{len(output_df)}行, 共{len(possession_phases)}个控球阶段")
 
         # 2. 跨sheet球员对比
-        if config.DATA_COMPARE["ENABLE"]:
+        season_roster = None
+        if config.DATA_COMPARE["ENABLE"] and config.DATA_COMPARE.get("MODE") == "SEASON":
+            try:
+                print(f"2. 开启赛季球员对比（一次扫描全部sheet）")
+                season_roster = build_roster_matrix(config.DATA_INPUT["FILENAME"], config.DATA_INPUT["USEFUL_TEST"])
+                print_roster_changes(season_roster, compare_all_sheets(season_roster))
+            except Exception as e:
+                print(f"2. 赛季球员对比失败：{str(e)}")
+        elif config.DATA_COMPARE["ENABLE"]:
             if config.DATA_COMPARE["BASE_SHEET"] == config.DATA_INPUT["CURRENT_SHEET"]:
                 print(f"2. 基准sheet与当前sheet相同，跳过对比")
             else:
@@ -61,9 +92,17 @@ if __name__ == "__main__":
         print(f"\n3. 球队-球员映射处理")
         try:
             if config.TEAM_MAPPING["AUTO_GENERATE"]:
-                # 自动生成映射
-                auto_team_players, auto_player_team = generate_auto_mapping(possession_phases)
-                print(f"3.1 自动生成球队-球员映射：")
+                # 自动生成映射（可选：使用整个赛季的出现次数）
+                if config.TEAM_MAPPING.get("SEASON_COUNTS"):
+                    if season_roster is None:
+                        season_roster = build_roster_matrix(config.DATA_INPUT["FILENAME"],
+                                                            config.DATA_INPUT["USEFUL_TEST"])
+                    auto_team_players, auto_player_team = generate_auto_mapping(
+                        possession_phases, season_roster["season_counts"])
+                    print(f"3.1 按赛季累计出现次数自动生成球队-球员映射：")
+                else:
+                    auto_team_players, auto_player_team = generate_auto_mapping(possession_phases)
+                    print(f"3.1 自动生成球队-球员映射：")
                 for team, players in auto_team_players.items():
                     print(f"   - {team}（{len(players)}人）")
 
@@ -102,13 +141,17 @@ if __name__ == "__main__":
 
         # 4. 数据清理（生成单场有效数据）
         try:
-            output_file_path = clean_data(
+            output_file_path, cleaned_df = clean_data(
                 output_df=output_df,
                 possession_phases=possession_phases,
                 custom_team_players=final_team_players,
                 filename=config.DATA_INPUT["FILENAME"],
                 sheet_idx=config.DATA_INPUT["CURRENT_SHEET"],
-                output_dir=config.DATA_OUTPUT["OUTPUT_DIR"]
+                output_dir=config.DATA_OUTPUT["OUTPUT_DIR"],
+                writer=writer,
+                persist=persist,
+                return_df=True,
+                reconcile_config=config.TEAM_MAPPING["RECONCILE"] if config.TEAM_MAPPING["RECONCILE"]["ENABLE"] else None
             )
             print(f"\n4. 数据清理完成：{output_file_path}")
         except Exception as e:
@@ -117,11 +160,19 @@ if __name__ == "__main__":
 
         # 5. 传球总结（按球队拆分）
         try:
-            summarize_team_pass_players(
+            team_files = summarize_team_pass_players(
                 output_file_path=output_file_path,
                 sheet_idx=config.DATA_INPUT["CURRENT_SHEET"],
-                cut_output_dir=config.DATA_OUTPUT["CUT_DIR"]
+                cut_output_dir=config.DATA_OUTPUT["CUT_DIR"],
+                event_store=event_store,
+                season=season,
+                cleaned_df=cleaned_df if in_memory else None,
+                writer=writer,
+                persist=persist,
+                workbook=workbook
             )
+            if in_memory:
+                stage_frames.setdefault(os.path.abspath(config.DATA_OUTPUT["CUT_DIR"]), {}).update(team_files)
         except Exception as e:
             print(f"5. 传球总结失败：{str(e)}")
             exit(1)
@@ -131,16 +182,23 @@ if __name__ == "__main__":
     if config.MATCH_OPERATION_ENABLED:
         print("\n===== 比赛操作阶段开始 =====")
         try:
-            # 检查输入目录是否存在
-            if not os.path.exists(config.MATCH_SUMMARY["INPUT_DIR"]):
+            # 检查输入目录是否存在（事件库模式不读取目录）
+            if event_store is None and not os.path.exists(config.MATCH_SUMMARY["INPUT_DIR"]):
                 raise FileNotFoundError(f"输入目录不存在：{config.MATCH_SUMMARY['INPUT_DIR']}")
 
             # 汇总多场数据
-            summarize_combined_matches(
+            combined_files = summarize_combined_matches(
                 input_dir=config.MATCH_SUMMARY["INPUT_DIR"],
                 output_dir=config.MATCH_SUMMARY["OUTPUT_DIR"],
-                team_name=config.MATCH_SUMMARY["TEAM_NAME"]
+                team_name=config.MATCH_SUMMARY["TEAM_NAME"],
+                event_store=event_store,
+                season=season,
+                memory_frames=stage_frames.get(os.path.abspath(config.MATCH_SUMMARY["INPUT_DIR"])),
+                writer=writer,
+                persist=persist
             )
+            if in_memory:
+                stage_frames.setdefault(os.path.abspath(config.MATCH_SUMMARY["OUTPUT_DIR"]), {}).update(combined_files)
             print(f"1. 多场数据汇总完成，保存至：{config.MATCH_SUMMARY['OUTPUT_DIR']}")
         except Exception as e:
             print(f"比赛操作失败：{str(e)}")
@@ -154,23 +212,46 @@ if __name__ == "__main__":
         if config.NETWORK_PLOT["DRAW_SINGLE"]:
             try:
                 cut_output_dir = config.NETWORK_PLOT["SINGLE_INPUT_DIR"]
-                if not os.path.exists(cut_output_dir):
+                if event_store is not None:
+                    # 事件库模式：按场次查询球队，无需匹配文件名后缀
+                    for match_season, match, team_name in event_store.list_matches(season=season):
+                        if config.DATA_OPERATION_ENABLED and match != str(config.DATA_INPUT["CURRENT_SHEET"]):
+                            continue
+                        print(f"1.1 正在绘制 {team_name} 场次{match} 单场传球网络...")
+                        draw_single_pass_network(
+                            input_file_path=None,
+                            team_name=team_name,
+                            sheet_idx=match,
+                            save_img=config.NETWORK_PLOT["SAVE_IMG"],
+                            save_dir=config.NETWORK_PLOT["SINGLE_SAVE_DIR"],
+                            event_store=event_store,
+                            season=match_season
+                        )
+                elif not os.path.exists(cut_output_dir):
                     print(f"1. 未找到单场数据文件夹：{cut_output_dir}，跳过单场网络绘制")
                 else:
-                    target_suffix = f"_sheet{config.DATA_INPUT['CURRENT_SHEET']}.xlsx" if config.DATA_OPERATION_ENABLED else ".xlsx"
-                    for file_name in os.listdir(cut_output_dir):
-                        if file_name.endswith(target_suffix):
-                            team_name = file_name.replace(target_suffix, "")
-                            file_path = os.path.join(cut_output_dir, file_name)
-                            print(f"1.1 正在绘制 {team_name} 单场传球网络...")
-
-                            draw_single_pass_network(
-                                input_file_path=file_path,
-                                team_name=team_name,
-                                sheet_idx=config.DATA_INPUT["CURRENT_SHEET"] if config.DATA_OPERATION_ENABLED else None,
-                                save_img=config.NETWORK_PLOT["SAVE_IMG"],
-                                save_dir=config.NETWORK_PLOT["SINGLE_SAVE_DIR"]
-                            )
+                    cut_frames = stage_frames.get(os.path.abspath(cut_output_dir), {})
+                    for file_name in list_excel_files(cut_output_dir, memory_frames=cut_frames):
+                        parts = MATCH_FILE_PATTERN.match(file_name)
+                        if not parts:
+                            continue
+                        # 数据阶段开启时只绘制本次处理的工作簿与sheet
+                        if config.DATA_OPERATION_ENABLED and (
+                                parts.group("workbook") != workbook or
+                                int(parts.group("match")) != config.DATA_INPUT["CURRENT_SHEET"]):
+                            continue
+                        team_name = parts.group("team")
+                        print(f"1.1 正在绘制 {team_name} 单场传球网络...")
+
+                        draw_single_pass_network(
+                            input_file_path=os.path.join(cut_output_dir, file_name),
+                            team_name=team_name,
+                            sheet_idx=int(parts.group("match")),
+                            save_img=config.NETWORK_PLOT["SAVE_IMG"],
+                            save_dir=config.NETWORK_PLOT["SINGLE_SAVE_DIR"],
+                            df=cut_frames.get(file_name),
+                            workbook=parts.group("workbook")
+                        )
 
                 if config.NETWORK_PLOT["SAVE_IMG"] and os.path.exists(config.NETWORK_PLOT["SINGLE_SAVE_DIR"]):
                     print(f"1.2 单场传球网络图片保存目录：{config.NETWORK_PLOT['SINGLE_SAVE_DIR']}")
@@ -181,10 +262,22 @@ if __name__ == "__main__":
         if config.NETWORK_PLOT["DRAW_COMBINED"]:
             try:
                 combined_data_folder = os.path.abspath(config.NETWORK_PLOT["COMBINED_INPUT_DIR"])
-                if not os.path.exists(combined_data_folder):
+                if event_store is not None:
+                    draw_combined_pass_network(
+                        data_folder=None,
+                        team_name=config.NETWORK_PLOT["TEAM_NAME"],
+                        save_img=config.NETWORK_PLOT["SAVE_IMG"],
+                        save_dir=config.NETWORK_PLOT["COMBINED_SAVE_DIR"],
+                        event_store=event_store,
+                        season=season,
+                        query_team=config.MATCH_SUMMARY["TEAM_NAME"]
+                    )
+                elif not os.path.exists(combined_data_folder):
                     print(f"2. 多场数据文件夹不存在：{combined_data_folder}")
                 else:
-                    excel_files = [f for f in os.listdir(combined_data_folder) if f.endswith(".xlsx")]
+                    combined_frames = stage_frames.get(combined_data_folder)
+                    excel_files = set(f for f in os.listdir(combined_data_folder) if f.endswith(".xlsx"))
+                    excel_files |= set(combined_frames or {})
                     if not excel_files:
                         print(f"2. 文件夹内无Excel文件！")
                     else:
@@ -194,7 +287,8 @@ if __name__ == "__main__":
                             data_folder=combined_data_folder,
                             team_name=config.NETWORK_PLOT["TEAM_NAME"],
                             save_img=config.NETWORK_PLOT["SAVE_IMG"],
-                            save_dir=config.NETWORK_PLOT["COMBINED_SAVE_DIR"]
+                            save_dir=config.NETWORK_PLOT["COMBINED_SAVE_DIR"],
+                            memory_frames=combined_frames
                         )
 
                 if config.NETWORK_PLOT["SAVE_IMG"] and os.path.exists(config.NETWORK_PLOT["COMBINED_SAVE_DIR"]):
@@ -208,13 +302,205 @@ if __name__ == "__main__":
                 from network_analysis import calculate_network_metrics
 
                 print("\n3. 开始计算网络指标...")
+                metric_cache = None
+                cache_config = config.NETWORK_METRICS.get("CACHE", {})
+                if cache_config.get("ENABLE"):
+                    from metric_cache import MetricCache
+                    metric_cache = MetricCache(cache_config["PATH"], cache_config["MAX_ENTRIES"])
+                metrics_input = os.path.abspath(config.NETWORK_METRICS["INPUT_PATH"])
                 metrics_result = calculate_network_metrics(
                     input_path=config.NETWORK_METRICS["INPUT_PATH"],
                     output_path=config.NETWORK_METRICS["OUTPUT_PATH"],
                     target_metrics=config.NETWORK_METRICS["TARGET_METRICS"],
-                    team_name=config.NETWORK_PLOT["TEAM_NAME"]
+                    team_name=config.NETWORK_PLOT["TEAM_NAME"],
+                    event_store=event_store,
+                    season=season,
+                    approx_config=config.NETWORK_METRICS.get("APPROXIMATE"),
+                    metric_cache=metric_cache,
+                    memory_frames=stage_frames.get(metrics_input, stage_frames.get(os.path.dirname(metrics_input)))
                 )
                 print("3. 网络指标计算完成！")
             except Exception as e:
                 print(f"3. 网络指标计算失败：{str(e)}")
-        print("===== 网络操作阶段完成 =====")
\ No newline at end of file
+
+            # 逐场逐队的谱中心性（批量幂迭代）
+            per_match = config.NETWORK_METRICS.get("PER_MATCH", {})
+            if per_match.get("ENABLE"):
+                try:
+                    from network_analysis import calculate_match_metrics
+
+                    print("\n3.1 开始批量计算逐场中心性...")
+                    calculate_match_metrics(
+                        input_dir=per_match["INPUT_DIR"],
+                        output_path=per_match["OUTPUT_PATH"],
+                        target_metrics=per_match["METRICS"],
+                        event_store=event_store,
+                        season=season,
+                        memory_frames=stage_frames.get(os.path.abspath(per_match["INPUT_DIR"]))
+                    )
+                    print("3.1 逐场中心性计算完成！")
+                except Exception as e:
+                    print(f"3.1 逐场中心性计算失败：{str(e)}")
+
+        # 接球链挖掘
+        if config.PASS_CHAINS["ENABLE"]:
+            try:
+                from Util.pass_chains import analyze_pass_chains
+
+                if writer is not None and event_store is None:
+                    writer.flush()  # 接球链读取OutputData目录，等待后台写出完成
+                print("\n4. 开始挖掘接球链...")
+                analyze_pass_chains(
+                    input_dir=config.PASS_CHAINS["INPUT_DIR"],
+                    output_path=config.PASS_CHAINS["OUTPUT_PATH"],
+                    lengths=config.PASS_CHAINS["LENGTHS"],
+                    top_k=config.PASS_CHAINS["TOP_K"],
+                    event_store=event_store,
+                    season=season
+                )
+                print("4. 接球链挖掘完成！")
+            except Exception as e:
+                print(f"4. 接球链挖掘失败：{str(e)}")
+
+        # 时间区间查询与控球节奏
+        if config.TIME_INDEX["ENABLE"]:
+            try:
+                from Util.time_index import analyze_time_window
+
+                if writer is not None and event_store is None:
+                    writer.flush()
+                print("\n5. 开始时间区间统计...")
+                minute_from, minute_to = config.TIME_INDEX["WINDOW_MINUTES"]
+                analyze_time_window(
+                    input_dir=config.TIME_INDEX["INPUT_DIR"],
+                    minute_from=minute_from,
+                    minute_to=minute_to,
+                    output_path=config.TIME_INDEX["OUTPUT_PATH"],
+                    event_store=event_store,
+                    season=season
+                )
+                print("5. 时间区间统计完成！")
+            except Exception as e:
+                print(f"5. 时间区间统计失败：{str(e)}")
+
+        # 组间网络差异检验
+        if config.PERMUTATION_TEST["ENABLE"]:
+            try:
+                from Util.permutation_test import analyze_group_difference
+
+                print("\n6. 开始组间网络差异检验...")
+                analyze_group_difference(
+                    input_dir=config.PERMUTATION_TEST["INPUT_DIR"],
+                    team_name=config.PERMUTATION_TEST["TEAM_NAME"],
+                    group_a=config.PERMUTATION_TEST["GROUP_A"],
+                    group_b=config.PERMUTATION_TEST["GROUP_B"],
+                    metrics=config.PERMUTATION_TEST["METRICS"],
+                    n_permutations=config.PERMUTATION_TEST["PERMUTATIONS"],
+                    n_bootstrap=config.PERMUTATION_TEST["BOOTSTRAP"],
+                    confidence=config.PERMUTATION_TEST["CONFIDENCE"],
+                    seed=config.PERMUTATION_TEST["SEED"],
+                    workers=config.PERMUTATION_TEST["WORKERS"],
+                    output_path=config.PERMUTATION_TEST["OUTPUT_PATH"],
+                    memory_frames=stage_frames.get(os.path.abspath(config.PERMUTATION_TEST["INPUT_DIR"])),
+                    event_store=event_store,
+                    season=season
+                )
+                print("6. 组间网络差异检验完成！")
+            except Exception as e:
+                print(f"6. 组间网络差异检验失败：{str(e)}")
+
+        # 控球马尔可夫模型
+        if config.POSSESSION_MARKOV["ENABLE"]:
+            try:
+                from Util.possession_markov import analyze_possession_markov, default_output_path
+
+                if writer is not None and event_store is None:
+                    writer.flush()  # 读取OutputData目录，等待后台写出完成
+                print("\n7. 开始求解控球马尔可夫模型...")
+                analyze_possession_markov(
+                    input_dir=config.POSSESSION_MARKOV["INPUT_DIR"],
+                    output_path=config.POSSESSION_MARKOV["OUTPUT_PATH"]
+                                or default_output_path(config.NETWORK_METRICS["OUTPUT_PATH"]),
+                    team_name=config.POSSESSION_MARKOV["TEAM_NAME"],
+                    event_store=event_store,
+                    season=season
+                )
+                print("7. 控球马尔可夫模型求解完成！")
+            except Exception as e:
+                print(f"7. 控球马尔可夫模型求解失败：{str(e)}")
+
+        # 单场传球网络动画
+        if config.NETWORK_ANIMATION["ENABLE"]:
+            try:
+                from Util.network_animation import animate_pass_network
+
+                animation_config = config.NETWORK_ANIMATION
+                file_name = cut_file_name(animation_config["TEAM_NAME"], animation_config["SHEET_IDX"], workbook)
+                print(f"\n8. 开始生成传球网络动画：{file_name}")
+                animate_pass_network(
+                    input_file_path=os.path.join(animation_config["INPUT_DIR"], file_name),
+                    team_name=animation_config["TEAM_NAME"],
+                    sheet_idx=animation_config["SHEET_IDX"],
+                    save_dir=animation_config["SAVE_DIR"],
+                    mode=animation_config["MODE"],
+                    step_seconds=animation_config["STEP_SECONDS"],
+                    window_seconds=animation_config["WINDOW_SECONDS"],
+                    fmt=animation_config["FORMAT"],
+                    fps=animation_config["FPS"],
+                    workers=animation_config["WORKERS"],
+                    df=stage_frames.get(os.path.abspath(animation_config["INPUT_DIR"]), {}).get(file_name),
+                    workbook=workbook
+                )
+                print("8. 传球网络动画生成完成！")
+            except Exception as e:
+                print(f"8. 传球网络动画生成失败：{str(e)}")
+
+        # 球员赛季账本
+        if config.PLAYER_LEDGER["ENABLE"]:
+            try:
+                from Util.excel_export import write_excel
+
+                if event_store is None:
+                    raise ValueError("球员账本需要开启事件库（EVENT_STORE.ENABLE）")
+                print("\n9. 查询球员赛季账本...")
+                ledger = event_store.player_ledger(season=season, team=config.PLAYER_LEDGER["TEAM_NAME"])
+                for team_name, team_ledger in ledger.groupby("所属队伍", sort=False):
+                    top = team_ledger.iloc[0]
+                    print(f"   - {team_name}：{len(team_ledger)}名球员，接球最多：{top['球员']}（{top['接球次数']}次）")
+                write_excel(ledger, config.PLAYER_LEDGER["OUTPUT_PATH"], sheet_name="player_ledger")
+                print(f"9. 球员赛季账本已保存到：{config.PLAYER_LEDGER['OUTPUT_PATH']}")
+            except Exception as e:
+                print(f"9. 球员赛季账本查询失败：{str(e)}")
+        print("===== 网络操作阶段完成 =====")
+
+    # ==================== 交付导出阶段 ====================
+    if config.EXPORT["ENABLE"]:
+        print("\n===== 交付导出阶段开始 =====")
+        try:
+            from Util.excel_export import export_deliverables
+
+            if writer is not None:
+                writer.flush()
+            outputs = export_deliverables(
+                input_dir=config.EXPORT["INPUT_DIR"],
+                output_dir=config.EXPORT["OUTPUT_DIR"],
+                mode=config.EXPORT["MODE"],
+                team_name=config.EXPORT["TEAM_NAME"],
+                event_store=event_store,
+                season=season,
+                engine=config.EXPORT.get("ENGINE")
+            )
+            print(f"1. 共导出{len(outputs)}个工作簿，保存至：{config.EXPORT['OUTPUT_DIR']}")
+        except Exception as e:
+            print(f"交付导出失败：{str(e)}")
+        print("===== 交付导出阶段完成 =====")
+
+    # 等待后台写出完成
+    if writer is not None:
+        errors = writer.close()
+        if errors:
+            print(f"\n后台写出完成：{writer.completed}个文件，失败{len(errors)}个")
+            for description, message in errors:
+                print(f"   - {description}：{message}")
+        else:
+            print(f"\n后台写出完成：{writer.completed}个文件")
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict
+
+import networkx as nx
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_cache (
+    cache_key TEXT PRIMARY KEY,
+    graph_hash TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metric_cache_access ON metric_cache(last_access);
+"""
+
+
+def graph_fingerprint(G: nx.DiGraph) -> str:
+    """传球图的规范哈希：排序后的节点列表 + 带权边列表（与节点/边插入顺序无关）"""
+    digest = hashlib.sha256()
+    for node in sorted(map(str, G.nodes())):
+        digest.update(f"n\t{node}\n".encode("utf-8"))
+    for u, v, w in sorted((str(u), str(v), data.get("weight", 1)) for u, v, data in G.edges(data=True)):
+        digest.update(f"e\t{u}\t{v}\t{w}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MetricCache:
+    """
+    持久化的网络指标缓存（SQLite）：键为 图哈希 + 指标名 + 指标版本 + 参数
+    超过max_entries时按最近访问时间淘汰，hits/misses记录本进程内的命中情况
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 2000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def make_key(graph_hash: str, metric: str, version: int, params: Dict = None) -> str:
+        params_text = json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{graph_hash}|{metric}|v{version}|{params_text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """命中返回 (True, 值)，未命中返回 (False, None)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM metric_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            with self._conn:
+                self._conn.execute("UPDATE metric_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+            self.hits += 1
+        return True, json.loads(row[0])
+
+    def put(self, key: str, graph_hash: str, metric: str, value) -> None:
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metric_cache (cache_key, graph_hash, metric, value, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, graph_hash, metric, text, time.time()))
+                # 超出容量时淘汰最久未访问的条目
+                count = self._conn.execute("SELECT COUNT(*) FROM metric_cache").fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM metric_cache WHERE cache_key IN "
+                        "(SELECT cache_key FROM metric_cache ORDER BY last_access LIMIT ?)", (overflow,))
+                    self.evictions += overflow
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM metric_cache").fetchone()[0]
+        return {"size": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,69 +1,242 @@
 import pandas as pd
 import networkx as nx
+import numpy as np
+import random
 import os
-from typing import List, Dict, Union
+from typing import List, Dict, Tuple, Union
 import json
+from metric_cache import MetricCache, graph_fingerprint
+from Util.atomic_io import write_json_atomic, write_text_atomic
+from Util.file_loader import list_excel_files, load_excel_files
+from Util.pass_pairs import build_pass_graph, concat_pass_sequences
 
+# 指标算法版本：修改某个指标的计算方式时提升其版本号，使指标缓存中的旧结果失效
+METRIC_VERSIONS = {}
 
-def _build_graph_from_sequence(pass_sequence: List[str]) -> nx.DiGraph:
+
+def _build_graph_from_sequence(pass_sequence: List[str], possession_ids=None) -> nx.DiGraph:
     """
-    从传球序列构建有向图
+    从传球序列构建有向图（possession_ids为控球段键时，只在同一控球段内的相邻接球之间连边）
     """
-    G = nx.DiGraph()
-    for i in range(len(pass_sequence) - 1):
-        source = pass_sequence[i].strip()
-        target = pass_sequence[i + 1].strip()
-        if source == target:
-            continue
-        if G.has_edge(source, target):
-            G[source][target]['weight'] += 1
-        else:
-            G.add_edge(source, target, weight=1)
-    return G
+    return build_pass_graph(pass_sequence, possession_ids)
 
 
-def _get_pass_sequence(input_path: str) -> List[str]:
+def _get_pass_sequence(input_path: str, event_store=None, season: str = None, query_team: str = None,
+                       memory_frames: Dict = None) -> Tuple[List[str], np.ndarray]:
     """
-    从输入路径（文件或文件夹）提取传球序列
+    从输入路径（文件或文件夹）提取传球序列及其控球段键；传入event_store时改为查询事件库
+    memory_frames：已在内存的数据 {文件名: DataFrame}，优先于磁盘文件使用
     """
-    pass_sequence = []
-    if os.path.isfile(input_path) and input_path.endswith(".xlsx"):
+    memory_frames = memory_frames or {}
+    if event_store is not None:
+        return event_store.pass_sequence(season=season, team=query_team, with_possessions=True)
+    elif os.path.basename(input_path) in memory_frames or (os.path.isfile(input_path) and input_path.endswith(".xlsx")):
         # 单场数据
-        df = pd.read_excel(input_path)
-        if "接球球员" in df.columns:
-            pass_sequence = df["接球球员"].dropna().tolist()
+        df = memory_frames.get(os.path.basename(input_path))
+        if df is None:
+            df = pd.read_excel(input_path)
+        return concat_pass_sequences([df])
     elif os.path.isdir(input_path):
-        # 多场数据
-        excel_files = [f for f in os.listdir(input_path) if f.endswith(".xlsx")]
-        for file_name in excel_files:
-            file_path = os.path.join(input_path, file_name)
-            try:
-                df = pd.read_excel(file_path)
-                if "接球球员" in df.columns:
-                    file_pass = df["接球球员"].dropna().tolist()
-                    pass_sequence.extend(file_pass)
-            except Exception as e:
-                print(f"警告：读取文件{file_name}失败 - {str(e)}")
+        # 多场数据（并发读取）
+        frames, errors = load_excel_files(input_path, memory_frames=memory_frames)
+        for file_name, message in errors.items():
+            print(f"警告：读取文件{file_name}失败 - {message}")
+        return concat_pass_sequences(frames.values())
     else:
         raise ValueError(f"输入路径无效：{input_path}（必须是Excel文件或文件夹）")
-    return pass_sequence
+
+
+# 近似中心性默认参数（采样枢纽点总数、随机种子、分批数；分批用于估计标准误）
+DEFAULT_APPROX_CONFIG = {"SAMPLE_SIZE": 256, "SEED": 42, "BATCHES": 8}
+
+
+def _approx_batches(G: nx.DiGraph, approx_config: Dict = None):
+    """把采样枢纽点拆成若干独立批次，返回 (每批枢纽点数, 批次种子列表, 是否退化为精确计算)"""
+    approx_config = {**DEFAULT_APPROX_CONFIG, **(approx_config or {})}
+    n = G.number_of_nodes()
+    batches = max(1, int(approx_config["BATCHES"]))
+    batch_size = max(1, int(approx_config["SAMPLE_SIZE"]) // batches)
+    if batch_size * batches >= n:
+        # 采样数不少于节点数时直接精确计算
+        return n, [approx_config["SEED"]], True
+    return batch_size, [approx_config["SEED"] + b for b in range(batches)], False
+
+
+def _summarize_batches(keys: List, batch_values: np.ndarray, batch_size: int, seeds: List[int], exact: bool) -> Dict:
+    """合并各批次估计：均值作为结果，批次间标准差/√批次数作为标准误"""
+    values = batch_values.mean(axis=0)
+    if len(seeds) > 1:
+        std_error = batch_values.std(axis=0, ddof=1) / np.sqrt(len(seeds))
+    else:
+        std_error = np.zeros(len(keys))
+    return {
+        "values": {k: float(v) for k, v in zip(keys, values)},
+        "std_error": {k: float(e) for k, e in zip(keys, std_error)},
+        "max_ci95_half_width": float(1.96 * std_error.max()) if len(keys) else 0.0,
+        "sample_size": batch_size * len(seeds),
+        "batches": len(seeds),
+        "seed": seeds[0],
+        "exact": exact
+    }
+
+
+def approx_betweenness_centrality(G: nx.DiGraph, approx_config: Dict = None) -> Dict:
+    """采样枢纽点的近似介数中心性（Brandes采样），附带标准误估计"""
+    batch_size, seeds, exact = _approx_batches(G, approx_config)
+    nodes = list(G.nodes())
+    batch_values = np.array([
+        [estimate[v] for v in nodes]
+        for estimate in (nx.betweenness_centrality(G, k=None if exact else batch_size, seed=seed) for seed in seeds)
+    ])
+    return _summarize_batches(nodes, batch_values, batch_size, seeds, exact)
+
+
+def approx_edge_betweenness_centrality(G: nx.DiGraph, approx_config: Dict = None) -> Dict:
+    """采样枢纽点的近似边介数中心性，附带标准误估计"""
+    batch_size, seeds, exact = _approx_batches(G, approx_config)
+    edges = list(G.edges())
+    batch_values = np.array([
+        [estimate[e] for e in edges]
+        for estimate in (nx.edge_betweenness_centrality(G, k=None if exact else batch_size, seed=seed)
+                         for seed in seeds)
+    ])
+    return _summarize_batches([f"{u}→{v}" for u, v in edges], batch_values, batch_size, seeds, exact)
+
+
+def approx_closeness_centrality(G: nx.DiGraph, approx_config: Dict = None) -> Dict:
+    """
+    采样枢纽点的近似接近中心性（Eppstein-Wang）：
+    从枢纽点出发做BFS，按采样比例放大到达距离和与可达节点数，口径与nx.closeness_centrality一致（入向距离、WF修正）
+    """
+    batch_size, seeds, exact = _approx_batches(G, approx_config)
+    nodes = list(G.nodes())
+    n = len(nodes)
+    index = {v: i for i, v in enumerate(nodes)}
+    batch_values = []
+    for seed in seeds:
+        pivots = nodes if exact else random.Random(seed).sample(nodes, batch_size)
+        dist_sum = np.zeros(n)
+        reach = np.zeros(n)
+        is_pivot = np.zeros(n, dtype=bool)
+        for s in pivots:
+            is_pivot[index[s]] = True
+            lengths = nx.single_source_shortest_path_length(G, s)
+            idx = np.fromiter((index[v] for v in lengths), dtype=np.int64, count=len(lengths))
+            dist = np.fromiter(lengths.values(), dtype=np.float64, count=len(lengths))
+            dist_sum[idx] += dist
+            reach[idx] += dist > 0
+        # 每个节点的有效枢纽点数（自身作为枢纽点时不计入）
+        effective = np.maximum(len(pivots) - is_pivot, 1)
+        est_reach = np.minimum(reach * (n - 1) / effective, n - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            closeness = np.where(dist_sum > 0, (reach / dist_sum) * est_reach / max(n - 1, 1), 0.0)
+        batch_values.append(closeness)
+    return _summarize_batches(nodes, np.array(batch_values), batch_size, seeds, exact)
+
+
+def calculate_match_metrics(
+        input_dir: str,
+        output_path: str = None,
+        target_metrics: List[str] = ("node_pagerank", "node_eigenvector"),
+        event_store=None,
+        season: str = None,
+        query_team: str = None,
+        memory_frames: Dict = None
+) -> Dict[str, Dict[str, Dict]]:
+    """
+    逐场、逐队的谱中心性（PageRank / 特征向量中心性）：全部单场传球图补齐成一个邻接矩阵栈，批量幂迭代一次算完
+    数据来源为单场拆分数据（{工作簿}__{球队}_sheet{场次}.xlsx）；传入event_store时改为查询事件库（以赛季作为工作簿）
+    返回 {球队: {场次标识: {指标名: {球员: 值}}}}，场次标识见match_label（如Port24_sheet1）
+    """
+    from event_store import MATCH_FILE_PATTERN, match_label, match_sort_key
+    from Util.spectral_batch import batched_spectral_centralities
+
+    frames = {}
+    if event_store is not None:
+        for (match_season, match, team), df in event_store.iter_match_frames(season=season, team=query_team):
+            frames[(team, match_label(match_season, match))] = df
+    else:
+        files = {}
+        for file_name in list_excel_files(input_dir, memory_frames=memory_frames):
+            match = MATCH_FILE_PATTERN.match(file_name)
+            if match and (query_team is None or match.group("team") == query_team):
+                files[file_name] = (match.group("team"), match_label(match.group("workbook"), match.group("match")))
+        loaded, errors = load_excel_files(input_dir, list(files), memory_frames=memory_frames)
+        for file_name, message in errors.items():
+            print(f"警告：读取文件{file_name}失败 - {message}")
+        frames = {files[file_name]: df for file_name, df in loaded.items() if "接球球员" in df.columns}
+    if not frames:
+        raise ValueError(f"在{input_dir}中未找到单场拆分数据")
+
+    keys = sorted(frames, key=lambda key: (key[0], match_sort_key(key[1])))
+    graphs = [build_pass_graph(*concat_pass_sequences([frames[key]])) for key in keys]
+    values = batched_spectral_centralities(graphs, list(target_metrics))
+    results = {}
+    for (team, match), metrics in zip(keys, values):
+        results.setdefault(team, {})[match] = metrics
+    print(f"✓ 已批量计算{len(graphs)}个单场传球图的{', '.join(target_metrics)}")
+
+    if output_path:
+        write_json_atomic(output_path, results)
+        print(f"逐场指标已保存到：{output_path}")
+    return results
 
 
 def calculate_network_metrics(
         input_path: str,
         output_path: str = None,
         target_metrics: List[str] = None,
-        team_name: str = "Unknown Team"
+        team_name: str = "Unknown Team",
+        event_store=None,
+        season: str = None,
+        query_team: str = None,
+        approx_config: Dict = None,
+        metric_cache: MetricCache = None,
+        memory_frames: Dict = None
 ) -> Dict[str, Union[Dict, float]]:
     """
-    计算传球网络的所有指标（支持指定输出指标）
+    计算传球网络的所有指标（支持指定输出指标；传入event_store时从事件库查询，query_team为None表示全部球队）
+    approx_config：近似中心性参数（SAMPLE_SIZE/SEED/BATCHES），仅在TARGET_METRICS包含*_approx指标时生效
+    metric_cache：指标缓存，传球图未变化的指标直接复用；结果与已有输出文件相同时不重写文件
+    memory_frames：上一阶段在内存中的数据 {文件名: DataFrame}，避免重新读取刚写出的文件
     """
     # 提取传球序列并构建图
-    pass_sequence = _get_pass_sequence(input_path)
+    pass_sequence, possession_ids = _get_pass_sequence(input_path, event_store, season, query_team, memory_frames)
     if not pass_sequence:
         raise ValueError("未提取到有效传球序列，无法计算指标")
-    G = _build_graph_from_sequence(pass_sequence)
+    G = _build_graph_from_sequence(pass_sequence, possession_ids)
+
+    # 计算指标
+    results = {
+        "team_name": team_name,
+        "input_path": input_path,
+        "metrics": compute_graph_metrics(G, target_metrics, approx_config, metric_cache)
+    }
+
+    # 保存结果（内容未变化时跳过重写）
+    if output_path:
+        content = json.dumps(results, ensure_ascii=False, indent=2)
+        existing = None
+        if os.path.exists(output_path):
+            with open(output_path, "r", encoding="utf-8") as f:
+                existing = f.read()
+        if existing == content:
+            print(f"结果未变化，跳过写入：{output_path}")
+        else:
+            write_text_atomic(output_path, content)
+            print(f"结果已保存到：{output_path}")
+    if metric_cache is not None:
+        print(f"指标缓存统计：{metric_cache.stats()}")
 
+    return results
+
+
+def compute_graph_metrics(G: nx.DiGraph, target_metrics: List[str] = None,
+                          approx_config: Dict = None, metric_cache: MetricCache = None) -> Dict[str, Union[Dict, float]]:
+    """
+    对已构建的传球图计算指标（供文件流程与查询服务共用）
+    近似指标（*_approx）只在target_metrics中显式指定时计算；传入metric_cache时按图哈希复用已计算的指标
+    """
     # 定义所有支持的指标及计算方法
     all_metrics = {
         # 节点中心性指标
@@ -95,31 +268,52 @@ def calculate_network_metrics(
             dict(G.degree()).values()) / G.number_of_nodes() if G.number_of_nodes() > 0 else 0,  # 平均度
     }
 
+    # 近似指标（大规模多队/多赛季网络使用，采样枢纽点 + 标准误）
+    approx_metrics = {
+        "node_betweenness_approx": lambda: approx_betweenness_centrality(G, approx_config),
+        "node_closeness_approx": lambda: approx_closeness_centrality(G, approx_config),
+        "edge_betweenness_approx": lambda: approx_edge_betweenness_centrality(G, approx_config),
+    }
+
     # 筛选需要计算的指标
-    metrics_to_calculate = all_metrics.keys() if target_metrics is None else [m for m in target_metrics if
-                                                                              m in all_metrics]
+    metrics_to_calculate = list(all_metrics.keys()) if target_metrics is None else [m for m in target_metrics if
+                                                                              m in all_metrics or m in approx_metrics]
     if not metrics_to_calculate:
-        raise ValueError(f"指定的指标不存在，请从以下指标中选择：{list(all_metrics.keys())}")
+        raise ValueError(
+            f"指定的指标不存在，请从以下指标中选择：{list(all_metrics.keys()) + list(approx_metrics.keys())}")
+    all_metrics.update(approx_metrics)
 
     # 计算指标
-    results = {
-        "team_name": team_name,
-        "input_path": input_path,
-        "metrics": {}
-    }
+    graph_hash = graph_fingerprint(G) if metric_cache is not None else None
+    metrics = {}
     for metric in metrics_to_calculate:
+        if metric_cache is not None:
+            params = {**DEFAULT_APPROX_CONFIG, **(approx_config or {})} if metric in approx_metrics else None
+            cache_key = metric_cache.make_key(graph_hash, metric, METRIC_VERSIONS.get(metric, 1), params)
+            # 缓存读取失败（数据库被锁、损坏、缓存值无法解析等）时当作未命中，照常计算
+            try:
+                hit, value = metric_cache.get(cache_key)
+            except Exception as e:
+                hit, value = False, None
+                print(f"   × 指标{metric}读取缓存失败：{str(e)}")
+            if hit:
+                metrics[metric] = value
+                print(f"✓ 已复用缓存指标：{metric}")
+                continue
         try:
-            results["metrics"][metric] = all_metrics[metric]()
+            metrics[metric] = all_metrics[metric]()
             print(f"✓ 已计算指标：{metric}")
         except Exception as e:
-            results["metrics"][metric] = f"计算失败：{str(e)}"
+            metrics[metric] = f"计算失败：{str(e)}"
             print(f"✗ 指标{metric}计算失败：{str(e)}")
+            continue
+        if metric_cache is not None:
+            # 缓存写入失败（数据库被锁、磁盘已满、无法序列化等）只记录，保留已计算的结果
+            try:
+                metric_cache.put(cache_key, graph_hash, metric, metrics[metric])
+                # 与缓存命中时的取值保持一致（JSON往返）
+                metrics[metric] = json.loads(json.dumps(metrics[metric], ensure_ascii=False))
+            except Exception as e:
+                print(f"   × 指标{metric}写入缓存失败：{str(e)}")
 
-    # 保存结果
-    if output_path:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        print(f"结果已保存到：{output_path}")
-
-    return results
\ No newline at end of file
+    return metrics
\ No newline at end of file
@@ -0,0 +1,330 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")  # 服务进程无界面，固定使用非交互后端
+
+import numpy as np
+import pandas as pd
+import config
+from network_analysis import _build_graph_from_sequence, compute_graph_metrics
+from Util.draw_pass_network import _draw_network_core
+from Util.file_loader import list_excel_files
+from Util.pass_pairs import chain_sequences, frame_sequence
+from event_store import (
+    EventStore, MATCH_FILE_PATTERN, season_from_filename, match_label, match_sort_key, resolve_matches
+)
+
+
+class LRUCache:
+    """线程安全的有界LRU缓存（按查询键缓存结果）"""
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class MatchRepository:
+    """常驻内存的单场传球数据（启动时读取一次，之后只在reload时刷新）"""
+
+    def __init__(self, data_dir: str, event_store: EventStore = None, season: str = None):
+        self.data_dir = data_dir
+        self.event_store = event_store
+        self.season = season
+        self.sequences = {}  # (球队, 场次标识) → (接球球员序列, 控球段键)，场次标识含工作簿/赛季，见match_label
+        self._lock = threading.Lock()
+
+    def reload(self) -> int:
+        """重新加载数据（事件库或数据目录），返回加载的单场数"""
+        if self.event_store is not None:
+            sequences = {
+                (team, match_label(match_season, match)): frame_sequence(df)
+                for (match_season, match, team), df in self.event_store.iter_match_frames(season=self.season)
+            }
+            with self._lock:
+                self.sequences = sequences
+            print(f"查询服务已从事件库加载{len(sequences)}个单场数据（{self.event_store.db_path}）")
+            return len(sequences)
+
+        sequences = {}
+        for file_name in list_excel_files(self.data_dir):
+            match = MATCH_FILE_PATTERN.match(file_name)
+            if not match:
+                continue
+            file_path = os.path.join(self.data_dir, file_name)
+            try:
+                df = pd.read_excel(file_path)
+                if "接球球员" not in df.columns:
+                    print(f"   × 跳过无效文件{file_name}：缺少'接球球员'列")
+                    continue
+                key = (match.group("team"), match_label(match.group("workbook"), match.group("match")))
+                sequences[key] = frame_sequence(df)
+            except Exception as e:
+                print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+        with self._lock:
+            self.sequences = sequences
+        print(f"查询服务已加载{len(sequences)}个单场文件（{self.data_dir}）")
+        return len(sequences)
+
+    def teams(self) -> Dict[str, List[str]]:
+        """球队 → 可查询的场次标识列表"""
+        result = {}
+        with self._lock:
+            for team, match in self.sequences:
+                result.setdefault(team, []).append(match)
+        return {team: sorted(matches, key=match_sort_key) for team, matches in sorted(result.items())}
+
+    def labels(self, team: str = None) -> List[str]:
+        """球队（None为全部球队）的场次标识，按工作簿、场次号排序"""
+        with self._lock:
+            return sorted({m for t, m in self.sequences if team is None or t == team}, key=match_sort_key)
+
+    def select(self, team: str, matches: List[str] = None) -> List[str]:
+        """
+        把请求的场次（完整标识或唯一的场次号）解析为场次标识列表，matches为None时取球队全部场次
+        结果有序且去重，可直接作为缓存键
+        """
+        available = self.labels(team)
+        if not available:
+            raise KeyError(f"未找到球队{team}的数据")
+        if matches is None:
+            return available
+        try:
+            return resolve_matches(matches, available)
+        except KeyError as e:
+            raise KeyError(f"球队{team}{e.args[0]}")
+
+    def get_sequence(self, team: str, matches: List[str] = None) -> Tuple[List[str], np.ndarray, List[str]]:
+        """合并指定球队若干场次的传球序列，matches为None时取全部场次；返回 (传球序列, 控球段键, 场次标识列表)"""
+        selected = self.select(team, matches)
+        with self._lock:
+            pass_sequence, possession_ids = chain_sequences(self.sequences[(team, m)] for m in selected)
+        return pass_sequence, possession_ids, selected
+
+
+class QueryService:
+    """传球网络查询服务：数据与图常驻内存，结果进入LRU缓存"""
+
+    def __init__(self, data_dir: str, render_dir: str, cache_size: int = 128, event_store: EventStore = None,
+                 season: str = None):
+        self.repository = MatchRepository(data_dir, event_store, season)
+        self.render_dir = render_dir
+        self.cache = LRUCache(cache_size)
+        self._graphs = LRUCache(cache_size)
+        self._render_lock = threading.Lock()  # pyplot非线程安全，渲染串行
+        self.repository.reload()
+
+    def _graph(self, team: str, matches: List[str]):
+        pass_sequence, possession_ids, selected = self.repository.get_sequence(team, matches)
+        key = (team, tuple(selected))
+        G = self._graphs.get(key)
+        if G is None:
+            G = _build_graph_from_sequence(pass_sequence, possession_ids)
+            self._graphs.put(key, G)
+        return G, selected
+
+    def metrics(self, team: str, matches: List[str] = None, target_metrics: List[str] = None) -> Dict:
+        """球队在指定场次上的网络指标"""
+        key = ("metrics", team, tuple(self.repository.select(team, matches)),
+               tuple(target_metrics) if target_metrics else None)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        G, selected = self._graph(team, matches)
+        result = {
+            "team_name": team,
+            "matches": selected,
+            "metrics": compute_graph_metrics(G, target_metrics)
+        }
+        self.cache.put(key, result)
+        return result
+
+    def players(self, team: str = None, matches: List[str] = None) -> Dict:
+        """球员赛季账本（直接查询事件库的账本表，毫秒级，不经缓存）"""
+        store = self.repository.event_store
+        if store is None:
+            raise ValueError("球员账本需要开启事件库（EVENT_STORE.ENABLE）")
+        season = self.repository.season
+        match_ids = None
+        if matches is not None:
+            # 场次标识 → (赛季, 场次号)；账本按单个赛季查询
+            matches = resolve_matches(matches, self.repository.labels(team))
+            seasons = {match_sort_key(m)[0] for m in matches}
+            if len(seasons) > 1:
+                raise ValueError(f"账本查询的场次需属于同一赛季：{', '.join(sorted(seasons))}")
+            season = seasons.pop() or season
+            match_ids = [m.rpartition("_sheet")[2] for m in matches]
+        ledger = store.player_ledger(season=season, match=match_ids, team=team)
+        return {"team_name": team, "matches": matches, "players": ledger.to_dict(orient="records")}
+
+    def render(self, team: str, matches: List[str] = None) -> bytes:
+        """渲染球队在指定场次上的传球网络，返回PNG字节"""
+        key = ("render", team, tuple(self.repository.select(team, matches)))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        pass_sequence, possession_ids, selected = self.repository.get_sequence(team, matches)
+        subtitle = "Matches " + "-".join(selected)
+        with self._render_lock:
+            save_path = _draw_network_core(
+                pass_sequence=pass_sequence,
+                team_name=team,
+                subtitle=subtitle,
+                save_img=True,
+                save_dir=self.render_dir,
+                fig_size=(12, 10),
+                node_size=800,
+                node_color="lightblue",
+                possession_ids=possession_ids
+            )
+        with open(save_path, "rb") as f:
+            image = f.read()
+        self.cache.put(key, image)
+        return image
+
+    def reload(self) -> int:
+        """刷新数据并清空缓存"""
+        count = self.repository.reload()
+        self.cache.clear()
+        self._graphs.clear()
+        return count
+
+
+def _split_param(params: Dict[str, List[str]], name: str) -> List[str]:
+    """解析逗号分隔的查询参数，缺省或'all'时返回None"""
+    value = params.get(name, [""])[0].strip()
+    if not value or value.lower() == "all":
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _make_handler(service: QueryService):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self._send(status, body, "application/json; charset=utf-8")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path == "/teams":
+                    self._send_json(200, service.repository.teams())
+                elif url.path == "/metrics":
+                    team = params.get("team", [None])[0]
+                    if not team:
+                        raise ValueError("缺少参数team")
+                    result = service.metrics(team, _split_param(params, "matches"), _split_param(params, "metrics"))
+                    self._send_json(200, result)
+                elif url.path == "/network":
+                    team = params.get("team", [None])[0]
+                    if not team:
+                        raise ValueError("缺少参数team")
+                    self._send(200, service.render(team, _split_param(params, "matches")), "image/png")
+                elif url.path == "/players":
+                    self._send_json(200, service.players(params.get("team", [None])[0], _split_param(params, "matches")))
+                elif url.path == "/stats":
+                    self._send_json(200, {"cache": service.cache.stats(), "graphs": service._graphs.stats()})
+                elif url.path == "/reload":
+                    self._send_json(200, {"loaded_files": service.reload()})
+                else:
+                    self._send_json(404, {"error": f"未知接口：{url.path}"})
+            except KeyError as e:
+                self._send_json(404, {"error": str(e.args[0])})
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            print(f"[查询服务] {self.address_string()} {format % args}")
+
+    return QueryHandler
+
+
+def run_query_service(
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        data_dir: str = "./CutOutput",
+        render_dir: str = "./ServiceOutput",
+        cache_size: int = 128,
+        event_store: EventStore = None,
+        season: str = None
+) -> None:
+    """
+    启动本地查询服务（阻塞运行，Ctrl+C退出）
+    接口：
+      /teams                                    球队及可查询场次
+      /metrics?team=X&matches=1,2&metrics=a,b   网络指标（JSON；场次为完整标识如Port24_sheet1，或唯一的场次号）
+      /network?team=X&matches=1,2               传球网络图（PNG）
+      /players?team=X&matches=1,2               球员赛季账本（JSON，需开启事件库）
+      /stats                                    缓存命中统计
+      /reload                                   重新加载数据并清空缓存
+    """
+    service = QueryService(data_dir, render_dir, cache_size, event_store, season)
+    server = ThreadingHTTPServer((host, port), _make_handler(service))
+    print(f"查询服务已启动：http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("查询服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    store = None
+    season = None
+    if config.EVENT_STORE["ENABLE"]:
+        store = EventStore(config.EVENT_STORE["DB_PATH"], config.EVENT_STORE["BATCH_SIZE"])
+        # 与main.py相同：未指定赛季时取数据输入文件名，避免不同赛季的同号场次互相覆盖
+        season = config.EVENT_STORE["SEASON"] or season_from_filename(config.DATA_INPUT["FILENAME"])
+    run_query_service(
+        host=config.QUERY_SERVICE["HOST"],
+        port=config.QUERY_SERVICE["PORT"],
+        data_dir=config.QUERY_SERVICE["DATA_DIR"],
+        render_dir=config.QUERY_SERVICE["RENDER_DIR"],
+        cache_size=config.QUERY_SERVICE["CACHE_SIZE"],
+        event_store=store,
+        season=season
+    )
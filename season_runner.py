@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import datetime
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+import config
+from DataProcessor import filter_sheet_data, extract_possession_phases, sheet_team_mapping, clean_data
+from Util.atomic_io import write_json_atomic
+from Util.pass_summary import summarize_team_pass_players, summarize_combined_matches
+from Util.xlsx_digest import sheet_digests
+from event_store import season_from_filename
+
+
+def _digest(payload) -> str:
+    """可JSON序列化的内容 → SHA-256（键排序，与字典顺序无关）"""
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sheet_config_signature() -> str:
+    """影响清洗/拆分结果的配置：筛选条件、球队映射（含手动映射文件内容）、姓名模糊匹配"""
+    mapping = config.TEAM_MAPPING
+    manual = None
+    if not mapping["AUTO_GENERATE"] and os.path.exists(mapping["MANUAL_PATH"]):
+        with open(mapping["MANUAL_PATH"], "rb") as f:
+            manual = hashlib.sha256(f.read()).hexdigest()
+    return _digest({
+        "USEFUL_TEST": config.DATA_INPUT["USEFUL_TEST"],
+        "AUTO_GENERATE": mapping["AUTO_GENERATE"],
+        "MANUAL_MAPPING": manual,
+        "CUSTOM_PLAYERS": mapping["CUSTOM_PLAYERS"],
+        "RECONCILE": mapping["RECONCILE"]
+    })
+
+
+class CheckpointStore:
+    """
+    检查点记录：{单元键: {"status", "attempts", "signature", "outputs", "error", "finished_at"}}
+    每次状态变化后原子写出，进程在任何时刻中断，记录文件都是完整的上一个状态
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.units = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.units = json.load(f).get("units", {})
+
+    def is_done(self, key: str, signature: str) -> bool:
+        """单元已完成、输入未变化且输出文件都还在"""
+        record = self.units.get(key)
+        return bool(record) and record["status"] == "done" and record["signature"] == signature \
+            and all(os.path.exists(path) for path in record.get("outputs", []))
+
+    def outputs(self, key: str) -> List[str]:
+        return self.units.get(key, {}).get("outputs", [])
+
+    def mark(self, key: str, **fields) -> None:
+        self.units.setdefault(key, {}).update(fields)
+        write_json_atomic(self.path, {"units": self.units})
+
+
+class SeasonRunner:
+    """
+    整季批处理：按 工作簿 → sheet → 阶段 拆成独立单元，每个单元完成后写检查点
+    - 逐sheet单元：clean（清洗，写OutputData）→ cut（按球队拆分，写CutOutput，文件名带工作簿前缀）
+    - 赛季单元：combine（GameSum汇总）→ metrics（网络指标），在全部sheet单元之后执行
+    重新运行时跳过输入（sheet内容 + 相关配置）未变化的已完成单元，只重试失败/中断的单元；失败单元按指数退避重试
+    所有输出先写临时文件再替换，中断不会留下写了一半的文件
+    只覆盖以上四个阶段：绘图、接球链、马尔可夫模型、动画、交付导出等仍由main.py按需运行，没有检查点
+    """
+
+    def __init__(self, workbooks: List[str], checkpoint_path: str, sheets: List[int] = None,
+                 max_retries: int = 3, backoff_seconds: float = 1.0, force: bool = False):
+        self.workbooks = workbooks
+        self.sheets = sheets
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.force = force
+        self.store = CheckpointStore(checkpoint_path)
+        self.config_signature = sheet_config_signature()
+        self.failed = []
+        self.skipped = 0
+
+    def run_unit(self, key: str, signature: str, action: Callable[[], List[str]]) -> bool:
+        """执行一个单元：已完成则跳过；失败时等待 backoff·2^(n-1) 秒后重试，最多max_retries次"""
+        if not self.force and self.store.is_done(key, signature):
+            self.skipped += 1
+            return True
+        for attempt in range(1, self.max_retries + 1):
+            self.store.mark(key, status="running", attempts=attempt, signature=signature)
+            try:
+                outputs = action()
+            except Exception as e:
+                self.store.mark(key, status="failed", error=str(e))
+                print(f"   × {key}第{attempt}次执行失败：{str(e)}")
+                if attempt < self.max_retries:
+                    delay = self.backoff_seconds * 2 ** (attempt - 1)
+                    print(f"     {delay:.1f}秒后重试")
+                    time.sleep(delay)
+            else:
+                self.store.mark(key, status="done", outputs=outputs, error=None,
+                                finished_at=datetime.datetime.now().isoformat(timespec="seconds"))
+                print(f"   √ {key}完成")
+                return True
+        self.failed.append(key)
+        return False
+
+    # ---------- 逐sheet单元 ----------
+    def _clean_sheet(self, workbook: pd.ExcelFile, path: str, sheet_idx: int, memory: Dict) -> List[str]:
+        """清洗单个sheet（球队映射同监听模式：逐sheet自动生成或手动映射 + 自定义补充）"""
+        raw_df = workbook.parse(sheet_idx)
+        if raw_df.empty:  # 工作簿末尾的备注/空白sheet，没有输出，记为完成
+            print(f"   sheet{sheet_idx}没有数据，已跳过")
+            return []
+        output_df = filter_sheet_data(raw_df, config.DATA_INPUT["USEFUL_TEST"])
+        possession_phases = extract_possession_phases(output_df)
+        team_players = sheet_team_mapping(possession_phases, config.TEAM_MAPPING)
+        reconcile = config.TEAM_MAPPING["RECONCILE"]
+        output_file_path, cleaned_df = clean_data(
+            output_df, possession_phases, team_players, path, sheet_idx, config.DATA_OUTPUT["OUTPUT_DIR"],
+            return_df=True, reconcile_config=reconcile if reconcile["ENABLE"] else None)
+        memory[sheet_idx] = cleaned_df
+        return [output_file_path]
+
+    def _cut_sheet(self, path: str, clean_key: str, sheet_idx: int, memory: Dict) -> List[str]:
+        """按球队拆分：本次刚清洗的sheet直接用内存数据，续跑时读取已完成的清洗输出"""
+        clean_outputs = self.store.outputs(clean_key)
+        if not clean_outputs:
+            return []
+        team_files = summarize_team_pass_players(
+            clean_outputs[0], sheet_idx, config.DATA_OUTPUT["CUT_DIR"],
+            cleaned_df=memory.pop(sheet_idx, None), workbook=season_from_filename(path))
+        return [os.path.join(config.DATA_OUTPUT["CUT_DIR"], name) for name in team_files]
+
+    def run_workbook(self, path: str) -> List[str]:
+        """处理一个工作簿的各sheet，返回已完成sheet的「sheet键:内容哈希」"""
+        file_name = os.path.basename(path)
+        digests = [digest for _, digest in sheet_digests(path)]
+        sheet_ids = self.sheets if self.sheets is not None else range(len(digests))
+        workbook = pd.ExcelFile(path)  # sheet按需解析，已完成的sheet不读取
+        memory, completed = {}, []
+        try:
+            for sheet_idx in sheet_ids:
+                sheet_key = f"{file_name}#sheet{sheet_idx}"
+                if sheet_idx >= len(digests):
+                    print(f"   × {sheet_key}不存在，已跳过")
+                    self.failed.append(sheet_key)
+                    continue
+                signature = _digest([digests[sheet_idx], self.config_signature])
+                clean_key, cut_key = f"{sheet_key}/clean", f"{sheet_key}/cut"
+                if self.run_unit(clean_key, signature,
+                                 lambda: self._clean_sheet(workbook, path, sheet_idx, memory)) and \
+                        self.run_unit(cut_key, signature, lambda: self._cut_sheet(path, clean_key, sheet_idx, memory)):
+                    completed.append(f"{sheet_key}:{signature}")
+                memory.pop(sheet_idx, None)
+        finally:
+            workbook.close()
+        return completed
+
+    # ---------- 赛季单元 ----------
+    def _combine(self) -> List[str]:
+        frames = summarize_combined_matches(
+            input_dir=config.MATCH_SUMMARY["INPUT_DIR"],
+            output_dir=config.MATCH_SUMMARY["OUTPUT_DIR"],
+            team_name=config.MATCH_SUMMARY["TEAM_NAME"])
+        return [os.path.join(config.MATCH_SUMMARY["OUTPUT_DIR"], name) for name in frames]
+
+    def _metrics(self) -> List[str]:
+        from network_analysis import calculate_network_metrics
+
+        calculate_network_metrics(
+            input_path=config.NETWORK_METRICS["INPUT_PATH"],
+            output_path=config.NETWORK_METRICS["OUTPUT_PATH"],
+            target_metrics=config.NETWORK_METRICS["TARGET_METRICS"],
+            team_name=config.NETWORK_PLOT["TEAM_NAME"],
+            approx_config=config.NETWORK_METRICS.get("APPROXIMATE"))
+        return [config.NETWORK_METRICS["OUTPUT_PATH"]]
+
+    def run(self) -> bool:
+        start = time.perf_counter()
+        completed = []
+        for path in self.workbooks:
+            print(f"\n===== 工作簿：{path} =====")
+            try:
+                completed.extend(self.run_workbook(path))
+            except Exception as e:
+                print(f"   × 读取工作簿失败：{str(e)}")
+                self.failed.append(os.path.basename(path))
+
+        # 赛季单元的签名 = 已完成sheet的签名 + 本阶段配置，有sheet新完成、内容或配置变化时重新汇总
+        if completed:
+            sheets = sorted(completed)
+            combine_signature = _digest([sheets, config.MATCH_SUMMARY])
+            metrics_signature = _digest([sheets, config.NETWORK_METRICS["INPUT_PATH"],
+                                         config.NETWORK_METRICS["TARGET_METRICS"],
+                                         config.NETWORK_METRICS.get("APPROXIMATE"), config.NETWORK_PLOT["TEAM_NAME"]])
+            print("\n===== 赛季汇总 =====")
+            if self.run_unit("season/combine", combine_signature, self._combine) and \
+                    config.NETWORK_METRICS["CALCULATE"]:
+                self.run_unit("season/metrics", metrics_signature, self._metrics)
+
+        print(f"\n===== 整季运行结束，耗时{time.perf_counter() - start:.1f}秒：{len(completed)}个sheet完成，"
+              f"{self.skipped}个单元沿用检查点，{len(self.failed)}个单元失败 =====")
+        for key in self.failed:
+            print(f"   × {key}：{self.store.units.get(key, {}).get('error')}")
+        return not self.failed
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use("Agg")
+
+    settings = config.SEASON_RUN
+    runner = SeasonRunner(
+        workbooks=settings["WORKBOOKS"],
+        checkpoint_path=settings["CHECKPOINT_PATH"],
+        sheets=settings["SHEETS"],
+        max_retries=settings["MAX_RETRIES"],
+        backoff_seconds=settings["BACKOFF_SECONDS"],
+        force=settings["FORCE"]
+    )
+    sys.exit(0 if runner.run() else 1)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from DataProcessor import (EVENT_COLUMNS, clean_data, extract_possession_phases, generate_auto_mapping,
+                           load_and_filter_data, merge_consecutive_players)
+
+INPUT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "InputData", "Port24.xlsx")
+USEFUL_TEST = ["Successful passes", "Possessions"]
+
+
+# ---------- 向量化之前的逐行实现（对照基准） ----------
+def _is_player_code(code):
+    return "-" in code and any(c.isdigit() for c in code.split("-")[0].strip()) and "Possessions" not in code
+
+
+def _reference_phases(output_df):
+    phases, current_team, current_players, current_start = [], None, [], None
+    for idx, code in enumerate(output_df["code"].astype(str)):
+        if "- Possessions" in code:
+            if current_team:
+                phases.append({"team": current_team, "players": current_players,
+                               "start_idx": current_start, "end_idx": idx - 1})
+            current_team, current_players, current_start = code.split(" - ")[0].strip(), [], idx
+        elif current_team and "-" in code and any(c.isdigit() for c in code.split("-")[0].strip()):
+            current_players.append(code.strip())
+    if current_team:
+        phases.append({"team": current_team, "players": current_players,
+                       "start_idx": current_start, "end_idx": len(output_df) - 1})
+    return phases
+
+
+def _reference_merge(cleaned_df):
+    merged_df = cleaned_df.copy().reset_index(drop=True)
+    keep = [True] * len(merged_df)
+    for i in range(len(merged_df) - 1, 0, -1):
+        current_row, prev_row = merged_df.iloc[i], merged_df.iloc[i - 1]
+        is_current = pd.isna(current_row["text"]) and "-" in str(current_row["code"]) \
+            and "Possessions" not in str(current_row["code"])
+        is_prev = pd.isna(prev_row["text"]) and "-" in str(prev_row["code"]) and "Possessions" not in str(prev_row["code"])
+        if is_current and is_prev and current_row["code"].strip() == prev_row["code"].strip():
+            merged_df.loc[i - 1, "end"] = current_row["end"]
+            keep[i] = False
+    return merged_df[keep].reset_index(drop=True)
+
+
+def _reference_clean(output_df, phases, team_players):
+    player_team = {p.strip(): team for team, players in team_players.items() for p in players}
+    keep = [False] * len(output_df)
+    for phase in phases:
+        rows = [idx for idx in range(phase["start_idx"], phase["end_idx"] + 1)
+                if _is_player_code(str(output_df["code"].iloc[idx]))
+                and player_team.get(str(output_df["code"].iloc[idx]).strip()) == phase["team"]]
+        if len(rows) >= 2:
+            keep[phase["start_idx"]] = True
+            for idx in rows:
+                keep[idx] = True
+    return _reference_merge(output_df[keep].reset_index(drop=True))
+
+
+def _events(frame):
+    return frame[EVENT_COLUMNS].astype({"code": object, "text": object}).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module", params=[1, 2])
+def sheet(request):
+    output_df = load_and_filter_data(INPUT_FILE, request.param, USEFUL_TEST)
+    return request.param, output_df
+
+
+def test_possession_phases_match_reference(sheet):
+    _, output_df = sheet
+    raw = _events(output_df)
+    assert extract_possession_phases(output_df) == _reference_phases(raw)
+
+
+def test_clean_data_matches_reference(sheet, tmp_path):
+    sheet_idx, output_df = sheet
+    phases = extract_possession_phases(output_df)
+    team_players, _ = generate_auto_mapping(phases)
+    # 去掉一名球员，检验映射外球员所在控球阶段的处理
+    dropped_team = next(iter(team_players))
+    team_players = {team: players[1:] if team == dropped_team else players for team, players in team_players.items()}
+
+    _, cleaned_df = clean_data(output_df, phases, team_players, INPUT_FILE, sheet_idx, str(tmp_path),
+                               persist=False, return_df=True)
+    expected = _reference_clean(_events(output_df), _reference_phases(_events(output_df)), team_players)
+    pd.testing.assert_frame_equal(_events(cleaned_df), _events(expected))
+    assert not os.listdir(tmp_path)
+
+
+def test_merge_consecutive_players_matches_reference():
+    events = pd.DataFrame({
+        "start": np.arange(8, dtype=float),
+        "end": np.arange(8, dtype=float) + 0.5,
+        "code": ["Henan - Possessions", "7 - A", " 7 - A", "7 - A", "9 - B", "Henan - Possessions", "9 - B", "9 - B"],
+        "text": ["Possessions", None, None, None, None, "Possessions", None, None]
+    })
+    merged = merge_consecutive_players(events)
+    pd.testing.assert_frame_equal(_events(merged), _events(_reference_merge(events)))
+    assert merged["end"].tolist() == [0.5, 3.5, 4.5, 5.5, 7.5]
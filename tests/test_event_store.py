@@ -0,0 +1,42 @@
+import pytest
+
+from event_store import (MATCH_FILE_PATTERN, cut_file_name, dedupe_cut_files, match_label, match_sort_key,
+                         resolve_matches)
+
+
+@pytest.mark.parametrize("team, sheet_idx, workbook", [
+    ("Henan", 1, "Port24"),
+    ("Shanghai Port", 12, "Port24"),
+    ("Beijing_Guoan", 3, "BJ24"),  # 球队名含下划线
+    ("Henan", 1, None),  # 旧命名：没有工作簿前缀
+    ("Shanghai Port", 30, None),
+])
+def test_cut_file_name_round_trip(team, sheet_idx, workbook):
+    name = cut_file_name(team, sheet_idx, workbook)
+    parsed = MATCH_FILE_PATTERN.match(name)
+    assert parsed is not None
+    assert parsed.group("workbook") == workbook
+    assert parsed.group("team") == team
+    assert int(parsed.group("match")) == sheet_idx
+
+
+def test_match_labels_sort_by_workbook_then_number():
+    labels = [match_label("Port24", 10), match_label("BJ24", 2), match_label("Port24", 2), match_label(None, 3)]
+    assert labels == ["Port24_sheet10", "BJ24_sheet2", "Port24_sheet2", "3"]
+    assert sorted(labels[:3], key=match_sort_key) == ["BJ24_sheet2", "Port24_sheet2", "Port24_sheet10"]
+
+
+def test_resolve_matches():
+    available = ["BJ24_sheet1", "BJ24_sheet2", "Port24_sheet1"]
+    assert resolve_matches(["Port24_sheet1", 2], available) == ["BJ24_sheet2", "Port24_sheet1"]
+    with pytest.raises(ValueError):
+        resolve_matches([1], available)  # 两个工作簿都有sheet1
+    with pytest.raises(KeyError):
+        resolve_matches(["Port24_sheet9"], available)
+
+
+def test_dedupe_drops_legacy_duplicates_only():
+    files = [cut_file_name("Henan", 1), cut_file_name("Henan", 1, "Port24"), cut_file_name("Henan", 2),
+             cut_file_name("Shanghai Port", 1, "Port24")]
+    assert dedupe_cut_files(files) == ["Port24__Henan_sheet1.xlsx", "Henan_sheet2.xlsx",
+                                       "Port24__Shanghai Port_sheet1.xlsx"]
@@ -0,0 +1,75 @@
+import pandas as pd
+
+from DataProcessor import reconcile_player_codes
+from Util.name_reconciliation import PlayerNameIndex, normalize_name, split_code
+
+TEAM_PLAYERS = {
+    "Henan": ["20 - N. Čović", "8 - Đ. Denić", "24 - Li Songyi"],
+    "Shanghai Port": ["4 - Wang Shenchao", "9 - Zhang Wei", "19 - Zhang Wei"]
+}
+
+
+def _resolve(code):
+    return PlayerNameIndex(TEAM_PLAYERS).resolve([code]).iloc[0]
+
+
+def test_normalize_strips_accents_and_punctuation():
+    assert normalize_name("N. Čović") == "n covic"
+    assert normalize_name("Đ.  Denić") == "d denic"
+    assert split_code(" 8 - Đ. Denić ") == ("8", "d denic")
+    assert split_code("Oscar") == ("", "oscar")
+
+
+def test_accented_and_plain_names_match():
+    for code, expected in (("20 - N. Covic", "20 - N. Čović"), ("8 - D. Denic", "8 - Đ. Denić")):
+        row = _resolve(code)
+        assert row["matched"]
+        assert row["candidate"] == expected
+        assert row["team"] == "Henan"
+        assert row["confidence"] == 1.0
+
+
+def test_jersey_alone_is_not_enough():
+    # 号码相同但姓名完全不同：号码只是辅助证据，不能单独促成匹配
+    row = _resolve("24 - Someone Else")
+    assert row["candidate"] == "24 - Li Songyi"
+    assert not row["matched"]
+
+
+def test_name_without_jersey_matches():
+    row = _resolve("N. Covic")
+    assert row["matched"]
+    assert row["candidate"] == "20 - N. Čović"
+
+
+def test_tie_below_margin_is_rejected():
+    # 两名同名球员、号码都不同：置信度达标但与第二候选没有拉开差距
+    row = _resolve("30 - Zhang Wei")
+    assert row["confidence"] >= 0.75
+    assert row["margin"] < 0.05
+    assert not row["matched"]
+
+
+def test_new_player_is_not_merged():
+    row = _resolve("11 - Gustavo Sauer")
+    assert not row["matched"]
+    assert pd.isna(row["candidate"])
+
+
+def test_reconcile_player_codes_rewrites_only_accepted_codes():
+    events = pd.DataFrame({
+        "start": [0.0, 1.0, 2.0, 3.0, 4.0],
+        "end": [10.0, 2.0, 3.0, 4.0, 5.0],
+        "code": ["Henan - Possessions", "20 - N. Covic", "8 - D. Denic", "11 - Gustavo Sauer", "20 - N. Čović"],
+        "text": ["Possessions", None, None, None, None]
+    })
+    reconciled, report = reconcile_player_codes(events, TEAM_PLAYERS)
+
+    assert set(report["code"]) == {"20 - N. Covic", "8 - D. Denic", "11 - Gustavo Sauer"}
+    assert report.set_index("code")["matched"].to_dict() == {
+        "20 - N. Covic": True, "8 - D. Denic": True, "11 - Gustavo Sauer": False}
+    players = reconciled["player"].astype(object).tolist()
+    assert pd.isna(players[0])
+    assert players[1:] == ["20 - N. Čović", "8 - Đ. Denić", "11 - Gustavo Sauer", "20 - N. Čović"]
+    # 改写后同一球员共享一个编号
+    assert reconciled["player_id"].iloc[1] == reconciled["player_id"].iloc[4]
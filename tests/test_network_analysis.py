@@ -0,0 +1,73 @@
+import networkx as nx
+import pytest
+
+from metric_cache import MetricCache, graph_fingerprint
+from network_analysis import approx_betweenness_centrality, approx_closeness_centrality, compute_graph_metrics
+
+
+def _graph(edges):
+    G = nx.DiGraph()
+    G.add_weighted_edges_from(edges)
+    return G
+
+
+# 不是强连通：E只传出，F孤立于主环之外（检验接近中心性的WF修正）
+EDGES = [("A", "B", 3), ("B", "C", 1), ("C", "A", 2), ("C", "D", 4), ("D", "B", 1), ("E", "A", 1), ("D", "F", 2)]
+
+
+def test_approximations_are_exact_when_sample_covers_all_nodes():
+    G = _graph(EDGES)
+    config = {"SAMPLE_SIZE": 64, "SEED": 7, "BATCHES": 4}
+
+    betweenness = approx_betweenness_centrality(G, config)
+    closeness = approx_closeness_centrality(G, config)
+
+    for result, expected in ((betweenness, nx.betweenness_centrality(G)), (closeness, nx.closeness_centrality(G))):
+        assert result["exact"]
+        assert result["batches"] == 1
+        assert result["max_ci95_half_width"] == 0.0
+        assert result["values"] == pytest.approx(expected)
+
+
+def test_sampled_approximation_reports_error():
+    G = nx.relabel_nodes(nx.gnp_random_graph(40, 0.15, seed=3, directed=True), str)
+    result = approx_betweenness_centrality(G, {"SAMPLE_SIZE": 16, "SEED": 1, "BATCHES": 4})
+    assert not result["exact"]
+    assert result["sample_size"] == 16
+    assert set(result["values"]) == set(G)
+
+
+def test_fingerprint_ignores_insertion_order():
+    assert graph_fingerprint(_graph(EDGES)) == graph_fingerprint(_graph(list(reversed(EDGES))))
+
+
+def test_metric_cache_invalidated_by_graph_change(tmp_path):
+    cache = MetricCache(str(tmp_path / "metrics.db"))
+    metrics = ["node_pagerank", "network_density"]
+    G = _graph(EDGES)
+
+    first = compute_graph_metrics(G, metrics, metric_cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert compute_graph_metrics(_graph(list(reversed(EDGES))), metrics, metric_cache=cache) == first
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # 只改一条边的权重：图哈希变化，重新计算
+    changed = _graph(EDGES)
+    changed["C"]["A"]["weight"] = 5
+    assert graph_fingerprint(changed) != graph_fingerprint(G)
+    result = compute_graph_metrics(changed, metrics, metric_cache=cache)
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert result["node_pagerank"] == pytest.approx(nx.pagerank(changed))
+    assert result["node_pagerank"] != pytest.approx(first["node_pagerank"])
+    cache.close()
+
+
+def test_approximation_cache_key_includes_config(tmp_path):
+    cache = MetricCache(str(tmp_path / "metrics.db"))
+    G = _graph(EDGES)
+    compute_graph_metrics(G, ["node_betweenness_approx"], {"SEED": 1}, metric_cache=cache)
+    compute_graph_metrics(G, ["node_betweenness_approx"], {"SEED": 2}, metric_cache=cache)
+    assert cache.hits == 0
+    compute_graph_metrics(G, ["node_betweenness_approx"], {"SEED": 2}, metric_cache=cache)
+    assert cache.hits == 1
+    cache.close()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Util.possession_markov import possession_markov_model
+
+
+def _events(possessions, match="Port24_sheet1", team="Henan"):
+    rows = [(match, team, pid, player) for pid, players in enumerate(possessions) for player in players]
+    return pd.DataFrame(rows, columns=["场次", "所属队伍", "控球编号", "接球球员"])
+
+
+def test_absorbing_chain_on_hand_built_possessions():
+    # 控球段 A→B→A→B（丢失）与 B（丢失）：
+    # Q = [[0, 1], [1/3, 0]]，N = (I - Q)^-1 = [[1.5, 1.5], [0.5, 1.5]]，起始分布 s = [0.5, 0.5]
+    result = possession_markov_model(_events([["A", "B", "A", "B"], ["B"]]))
+    model = result["Port24_sheet1"]["Henan"]
+
+    assert model["possessions"] == 2
+    assert model["expected_chain_length"] == pytest.approx(2.5)  # s·N·1，等于实际平均接球次数5/2
+    players = model["players"]
+    assert list(players) == ["B", "A"]  # 按参与概率降序
+    assert players["A"]["expected_touches"] == pytest.approx(1.0)
+    assert players["B"]["expected_touches"] == pytest.approx(1.5)
+    assert players["A"]["involvement"] == pytest.approx(2 / 3)
+    assert players["B"]["involvement"] == pytest.approx(1.0)
+    assert players["A"]["chain_from"] == pytest.approx(3.0)
+    assert players["B"]["chain_from"] == pytest.approx(2.0)
+    assert players["A"]["exit_probability"] == pytest.approx(0.0)
+    assert players["B"]["exit_probability"] == pytest.approx(2 / 3)
+
+
+def test_graphs_are_solved_independently():
+    single = possession_markov_model(_events([["A", "B", "A", "B"], ["B"]]))
+    other = _events([["X", "Y", "Z"], ["Z", "X"], ["Y"]], team="Shanghai Port")
+    batched = possession_markov_model(pd.concat([_events([["A", "B", "A", "B"], ["B"]]), other], ignore_index=True))
+
+    assert batched["Port24_sheet1"]["Henan"] == single["Port24_sheet1"]["Henan"]
+    shanghai = batched["Port24_sheet1"]["Shanghai Port"]
+    assert shanghai["possessions"] == 3
+    assert shanghai["expected_chain_length"] == pytest.approx(2.0)
+    assert np.isclose(sum(p["expected_touches"] for p in shanghai["players"].values()), 2.0)
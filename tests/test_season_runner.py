@@ -0,0 +1,61 @@
+import json
+
+from season_runner import CheckpointStore, SeasonRunner
+
+
+def _runner(tmp_path, **kwargs):
+    return SeasonRunner(workbooks=[], checkpoint_path=str(tmp_path / "checkpoint.json"),
+                        max_retries=2, backoff_seconds=0, **kwargs)
+
+
+def _action(calls, key, outputs, fail_times=0):
+    def run():
+        calls.append(key)
+        if calls.count(key) <= fail_times:
+            raise RuntimeError("写出失败")
+        for path in outputs:
+            with open(path, "w") as f:
+                f.write(key)
+        return outputs
+    return run
+
+
+def test_checkpoint_resume_skips_done_units_and_retries_failed(tmp_path):
+    done_output, failed_output = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    calls = []
+    runner = _runner(tmp_path)
+    assert runner.run_unit("a", "sig-a", _action(calls, "a", [done_output]))
+    assert not runner.run_unit("b", "sig-b", _action(calls, "b", [failed_output], fail_times=5))
+    assert calls == ["a", "b", "b"]
+    assert runner.failed == ["b"]
+
+    # 检查点文件在每次状态变化后完整写出
+    with open(tmp_path / "checkpoint.json", encoding="utf-8") as f:
+        units = json.load(f)["units"]
+    assert units["a"]["status"] == "done" and units["a"]["outputs"] == [done_output]
+    assert units["b"]["status"] == "failed" and units["b"]["attempts"] == 2
+
+    # 续跑：已完成的单元沿用检查点，失败的单元重新执行
+    calls = []
+    resumed = _runner(tmp_path)
+    assert resumed.run_unit("a", "sig-a", _action(calls, "a", [done_output]))
+    assert resumed.run_unit("b", "sig-b", _action(calls, "b", [failed_output]))
+    assert calls == ["b"]
+    assert resumed.skipped == 1
+    assert CheckpointStore(str(tmp_path / "checkpoint.json")).is_done("b", "sig-b")
+
+
+def test_changed_signature_or_missing_output_reruns(tmp_path):
+    output = tmp_path / "a.xlsx"
+    calls = []
+    _runner(tmp_path).run_unit("a", "sig-1", _action(calls, "a", [str(output)]))
+
+    runner = _runner(tmp_path)
+    runner.run_unit("a", "sig-2", _action(calls, "a", [str(output)]))  # 输入内容或配置变化
+    output.unlink()
+    runner.run_unit("a", "sig-2", _action(calls, "a", [str(output)]))  # 输出文件被删除
+    assert calls == ["a", "a", "a"]
+
+    forced = _runner(tmp_path, force=True)
+    forced.run_unit("a", "sig-2", _action(calls, "a", [str(output)]))
+    assert len(calls) == 4
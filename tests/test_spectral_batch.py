@@ -0,0 +1,38 @@
+import networkx as nx
+import pytest
+
+from Util.spectral_batch import batched_spectral_centralities
+
+
+def _pass_graph(n, p, seed):
+    """带传球次数权重的随机有向图（强连通，特征向量中心性可收敛）"""
+    G = nx.gnp_random_graph(n, p, seed=seed, directed=True)
+    for i, (u, v) in enumerate(G.edges()):
+        G[u][v]["weight"] = 1 + (i * 7 + seed) % 5
+    return nx.relabel_nodes(G, {i: f"{i + 1} - Player {i}" for i in G})
+
+
+def test_batched_centralities_match_networkx():
+    # 不同大小的图补齐到同一个矩阵栈
+    graphs = [_pass_graph(n, 0.5, seed) for n, seed in ((6, 1), (11, 2), (14, 3))]
+    results = batched_spectral_centralities(graphs)
+
+    for G, result in zip(graphs, results):
+        pagerank = nx.pagerank(G)
+        eigenvector = nx.eigenvector_centrality(G, max_iter=1000)
+        assert set(result["node_pagerank"]) == set(G)
+        for node in G:
+            assert result["node_pagerank"][node] == pytest.approx(pagerank[node], abs=1e-5)
+            assert result["node_eigenvector"][node] == pytest.approx(eigenvector[node], abs=1e-4)
+
+
+def test_empty_graph_matches_networkx_conventions():
+    results = batched_spectral_centralities([nx.DiGraph(), _pass_graph(5, 0.6, 4)])
+    assert results[0]["node_pagerank"] == {}
+    assert results[0]["node_eigenvector"].startswith("计算失败")
+    assert isinstance(results[1]["node_eigenvector"], dict)
+
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(ValueError):
+        batched_spectral_centralities([_pass_graph(4, 0.6, 5)], metrics=["node_betweenness"])
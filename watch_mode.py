@@ -0,0 +1,262 @@
+import os
+import json
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+import config
+from DataProcessor import filter_sheet_data, extract_possession_phases, sheet_team_mapping, clean_data
+from Util.pass_summary import summarize_team_pass_players, summarize_combined_matches
+from Util.background_writer import BackgroundWriter
+from Util.file_loader import list_excel_files
+from Util.atomic_io import write_json_atomic
+from Util.xlsx_digest import sheet_digests
+from event_store import EventStore, MATCH_FILE_PATTERN, season_from_filename
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class MatchdayWatcher:
+    """
+    比赛日监听：轮询原始数据目录，新文件或被修改的工作簿在大小/修改时间稳定debounce秒后处理
+    只对内容有变化的sheet执行 清洗 → 拆分 → 汇总 → 指标 → 绘图，
+    CutOutput数据常驻内存，GameSum汇总与网络指标按内存数据增量更新，无需重新读取整个目录
+    """
+
+    def __init__(self, input_dir: str, poll_seconds: float = 1.0, debounce_seconds: float = 2.0,
+                 state_path: str = "./WatchState/watch_state.json", process_existing: bool = False,
+                 event_store: EventStore = None):
+        self.input_dir = input_dir
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self.state_path = state_path
+        self.process_existing = process_existing
+        self.event_store = event_store
+        self.state = self._load_state()
+        self._pending = {}  # 路径 → (文件签名, 签名首次出现的时间)
+        self._cut_frames = None  # CutOutput文件名 → DataFrame（首次处理时加载）
+        self.writer = BackgroundWriter() if config.PIPELINE["ASYNC_WRITE"] else None
+        self.metric_cache = None
+        cache_config = config.NETWORK_METRICS.get("CACHE", {})
+        if cache_config.get("ENABLE"):
+            from metric_cache import MetricCache
+            self.metric_cache = MetricCache(cache_config["PATH"], cache_config["MAX_ENTRIES"])
+
+    # ---------- 状态 ----------
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self) -> None:
+        write_json_atomic(self.state_path, self.state)
+
+    # ---------- 轮询与防抖 ----------
+    def _ready_workbooks(self) -> List[str]:
+        """返回签名已稳定debounce秒、且与上次处理时不同的工作簿"""
+        now = time.monotonic()
+        ready = []
+        for file_name in sorted(os.listdir(self.input_dir)):
+            # 跳过Excel打开时产生的锁文件
+            if not file_name.endswith(".xlsx") or file_name.startswith("~$"):
+                continue
+            path = os.path.join(self.input_dir, file_name)
+            try:
+                signature = list(_file_signature(path))
+            except FileNotFoundError:
+                continue
+            if self.state.get(file_name, {}).get("signature") == signature:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.debounce_seconds:
+                ready.append(path)
+        return ready
+
+    def prime(self) -> None:
+        """启动时记录已有工作簿的sheet哈希（PROCESS_EXISTING=False时已有数据不重新处理）"""
+        for file_name in sorted(os.listdir(self.input_dir)):
+            if not file_name.endswith(".xlsx") or file_name.startswith("~$") or file_name in self.state:
+                continue
+            path = os.path.join(self.input_dir, file_name)
+            try:
+                signature = list(_file_signature(path))
+                digests = sheet_digests(path)
+            except Exception as e:
+                print(f"   × 读取{file_name}失败：{str(e)}，将在文件变化后重试")
+                continue
+            self.state[file_name] = {"signature": signature, "sheets": {str(idx): pair for idx, pair in enumerate(digests)}}
+            print(f"   - 已记录{file_name}（{len(digests)}个sheet）")
+        self._save_state()
+
+    def poll_once(self) -> List[str]:
+        """执行一次轮询，返回本次处理的工作簿"""
+        processed = []
+        for path in self._ready_workbooks():
+            file_name = os.path.basename(path)
+            try:
+                signature = list(_file_signature(path))
+                known = dict(self.state.get(file_name, {}).get("sheets", {}).values())
+                digests = sheet_digests(path, known)
+            except Exception as e:
+                # 文件仍在写入（如zip结构不完整），重新计时等待下一次稳定
+                print(f"   … {file_name}暂不可读（{str(e)}），等待写入完成")
+                self._pending.pop(path, None)
+                continue
+            self._pending.pop(path, None)
+            self.process_workbook(path, signature, digests)
+            processed.append(file_name)
+        return processed
+
+    # ---------- 处理 ----------
+    def _load_cut_frames(self) -> Dict[str, pd.DataFrame]:
+        if self._cut_frames is None:
+            cut_dir = config.DATA_OUTPUT["CUT_DIR"]
+            self._cut_frames = {}
+            for file_name in list_excel_files(cut_dir):
+                try:
+                    self._cut_frames[file_name] = pd.read_excel(os.path.join(cut_dir, file_name))
+                except Exception as e:
+                    print(f"   × 读取文件{file_name}失败：{str(e)}，已跳过")
+            print(f"   已加载{len(self._cut_frames)}个拆分数据文件到内存")
+        return self._cut_frames
+
+    def _process_sheet(self, path: str, sheet_idx: int, raw_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """单个sheet：清洗 → 按球队拆分，返回 {CutOutput文件名: DataFrame}"""
+        output_df = filter_sheet_data(raw_df, config.DATA_INPUT["USEFUL_TEST"])
+        possession_phases = extract_possession_phases(output_df)
+        team_players = sheet_team_mapping(possession_phases, config.TEAM_MAPPING)
+        output_file_path, cleaned_df = clean_data(
+            output_df, possession_phases, team_players, path, sheet_idx, config.DATA_OUTPUT["OUTPUT_DIR"],
+            writer=self.writer, persist=config.PIPELINE["PERSIST"], return_df=True)
+        return summarize_team_pass_players(
+            output_file_path, sheet_idx, config.DATA_OUTPUT["CUT_DIR"],
+            event_store=self.event_store, season=season_from_filename(path) if self.event_store else None,
+            cleaned_df=cleaned_df, writer=self.writer, persist=config.PIPELINE["PERSIST"],
+            workbook=season_from_filename(path))
+
+    def process_workbook(self, path: str, signature: List[int], sheet_hashes: List[List[str]]) -> None:
+        """处理一个新的/修改过的工作簿：只读取并处理内容变化的sheet，然后增量更新汇总、指标与网络图"""
+        from network_analysis import calculate_network_metrics
+        from Util.draw_pass_network import draw_single_pass_network, draw_combined_pass_network
+
+        file_name = os.path.basename(path)
+        start = time.perf_counter()
+        previous = self.state.get(file_name, {}).get("sheets", {})
+        digests = {str(idx): pair for idx, pair in enumerate(sheet_hashes)}
+        changed = [int(idx) for idx, (_, digest) in digests.items()
+                   if idx not in previous or previous[idx][1] != digest]
+        print(f"\n===== 检测到{file_name}变化：{len(changed)}/{len(digests)}个sheet需要处理 =====")
+        if not changed:
+            self.state[file_name] = {"signature": signature, "sheets": digests}
+            self._save_state()
+            return
+
+        try:
+            raw_frames = pd.read_excel(path, sheet_name=changed)
+        except Exception as e:
+            # 工作簿仍在写入或被其他程序锁定：不记录状态，下一次轮询重新检测并处理
+            print(f"   × 读取{file_name}失败（{str(e)}），下次轮询重试")
+            return
+        cut_frames = self._load_cut_frames()
+        new_frames = {}
+        for sheet_idx in changed:
+            try:
+                team_files = self._process_sheet(path, sheet_idx, raw_frames[sheet_idx])
+                new_frames.update(team_files)
+            except Exception as e:
+                print(f"   × sheet{sheet_idx}处理失败：{str(e)}")
+                digests.pop(str(sheet_idx))  # 失败的sheet下次文件变化时重试
+        cut_frames.update(new_frames)
+
+        # 汇总：CutOutput全部在内存，只重新拼接
+        combined_frames = {}
+        try:
+            combined_frames = summarize_combined_matches(
+                input_dir=config.MATCH_SUMMARY["INPUT_DIR"],
+                output_dir=config.MATCH_SUMMARY["OUTPUT_DIR"],
+                team_name=config.MATCH_SUMMARY["TEAM_NAME"],
+                memory_frames=cut_frames,
+                writer=self.writer,
+                persist=config.PIPELINE["PERSIST"]
+            )
+        except Exception as e:
+            print(f"   × 汇总失败：{str(e)}")
+
+        # 网络指标
+        if config.NETWORK_METRICS["CALCULATE"]:
+            try:
+                calculate_network_metrics(
+                    input_path=config.NETWORK_METRICS["INPUT_PATH"],
+                    output_path=config.NETWORK_METRICS["OUTPUT_PATH"],
+                    target_metrics=config.NETWORK_METRICS["TARGET_METRICS"],
+                    team_name=config.NETWORK_PLOT["TEAM_NAME"],
+                    approx_config=config.NETWORK_METRICS.get("APPROXIMATE"),
+                    metric_cache=self.metric_cache,
+                    memory_frames=cut_frames
+                )
+                print(f"   网络指标已更新（处理用时{time.perf_counter() - start:.1f}秒）")
+            except Exception as e:
+                print(f"   × 网络指标计算失败：{str(e)}")
+
+        # 网络图（监听模式只保存图片，不弹出窗口）
+        if config.WATCH["RENDER"]:
+            for cut_name, df in new_frames.items():
+                parts = MATCH_FILE_PATTERN.match(cut_name)
+                draw_single_pass_network(
+                    input_file_path=None, team_name=parts.group("team"), sheet_idx=int(parts.group("match")),
+                    save_img=True, save_dir=config.NETWORK_PLOT["SINGLE_SAVE_DIR"], df=df,
+                    workbook=parts.group("workbook"))
+            if combined_frames and os.path.abspath(config.MATCH_SUMMARY["OUTPUT_DIR"]) == \
+                    os.path.abspath(config.NETWORK_PLOT["COMBINED_INPUT_DIR"]):
+                draw_combined_pass_network(
+                    data_folder=os.path.abspath(config.NETWORK_PLOT["COMBINED_INPUT_DIR"]),
+                    team_name=config.NETWORK_PLOT["TEAM_NAME"], save_img=True,
+                    save_dir=config.NETWORK_PLOT["COMBINED_SAVE_DIR"], memory_frames=combined_frames)
+
+        self.state[file_name] = {"signature": signature, "sheets": digests}
+        self._save_state()
+        print(f"===== {file_name}处理完成，耗时{time.perf_counter() - start:.1f}秒 =====")
+
+    def run(self) -> None:
+        """阻塞运行，Ctrl+C退出"""
+        os.makedirs(self.input_dir, exist_ok=True)
+        if not self.process_existing:
+            print("记录已有工作簿（不重新处理）...")
+            self.prime()
+        print(f"正在监听：{self.input_dir}（每{self.poll_seconds}秒轮询，文件稳定{self.debounce_seconds}秒后处理）")
+        try:
+            while True:
+                self.poll_once()
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("监听已停止")
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+            if self.metric_cache is not None:
+                self.metric_cache.close()
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use("Agg")  # 后台运行，网络图只保存不显示
+
+    store = None
+    if config.EVENT_STORE["ENABLE"]:
+        store = EventStore(config.EVENT_STORE["DB_PATH"], config.EVENT_STORE["BATCH_SIZE"])
+    MatchdayWatcher(
+        input_dir=config.WATCH["INPUT_DIR"],
+        poll_seconds=config.WATCH["POLL_SECONDS"],
+        debounce_seconds=config.WATCH["DEBOUNCE_SECONDS"],
+        state_path=config.WATCH["STATE_PATH"],
+        process_existing=config.WATCH["PROCESS_EXISTING"],
+        event_store=store
+    ).run()